@@ -8,6 +8,8 @@ from dateutil.parser import parse
 import multiprocessing
 import ast
 import random
+import sqlite3
+from collections import deque
 
 # kafka
 from kafka import KafkaConsumer, KafkaProducer
@@ -42,6 +44,11 @@ def kafka_agent(config_path, **kwargs):
     kafka_broker_port = config.get('kafka_broker_port')
     kafka_producer_topic = config.get('kafka_producer_topic')
     kafka_consumer_topic = config.get('kafka_consumer_topic')
+    batch_size = config.get('batch_size', 100)
+    batch_linger = config.get('batch_linger', 1.0)
+    compression_type = config.get('compression_type', 'gzip')
+    max_queue_size = config.get('max_queue_size', 10000)
+    backlog_path = config.get('backlog_path', 'kafka_backlog.sqlite')
 
     if 'all' in services_topic_list:
         services_topic_list = [topics.DRIVER_TOPIC_BASE, topics.LOGGER_BASE,
@@ -52,8 +59,68 @@ def kafka_agent(config_path, **kwargs):
                       kafka_broker_port,
                       kafka_producer_topic,
                       kafka_consumer_topic,
+                      batch_size=batch_size,
+                      batch_linger=batch_linger,
+                      compression_type=compression_type,
+                      max_queue_size=max_queue_size,
+                      backlog_path=backlog_path,
                       **kwargs)
 
+
+class MessageBacklog(object):
+    '''
+        Function: SQLite cache for messages that did not fit in the
+                  in-memory send queue, read back oldest first.
+
+        Args:
+            path (str): SQLite database file
+    '''
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(path)
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS backlog '
+            '(id INTEGER PRIMARY KEY AUTOINCREMENT, message TEXT NOT NULL)')
+        self._connection.commit()
+        self.count = self._connection.execute(
+            'SELECT COUNT(*) FROM backlog').fetchone()[0]
+
+    def push(self, messages):
+        self._connection.executemany(
+            'INSERT INTO backlog (message) VALUES (?)',
+            [(json.dumps(message),) for message in messages])
+        self._connection.commit()
+        self.count += len(messages)
+
+    def push_front(self, messages):
+        '''Add messages ahead of the ones already in the backlog.'''
+        first_id = self._connection.execute(
+            'SELECT MIN(id) FROM backlog').fetchone()[0]
+        if first_id is None:
+            first_id = 1
+        first_id -= len(messages)
+        self._connection.executemany(
+            'INSERT INTO backlog (id, message) VALUES (?, ?)',
+            [(first_id + i, json.dumps(message))
+             for i, message in enumerate(messages)])
+        self._connection.commit()
+        self.count += len(messages)
+
+    def pop(self, limit):
+        rows = self._connection.execute(
+            'SELECT id, message FROM backlog ORDER BY id LIMIT ?',
+            (limit,)).fetchall()
+        if rows:
+            self._connection.execute('DELETE FROM backlog WHERE id <= ?',
+                                     (rows[-1][0],))
+            self._connection.commit()
+            self.count -= len(rows)
+        return [json.loads(message) for _, message in rows]
+
+    def close(self):
+        self._connection.close()
+
+
 class KafkaAgent(Agent):
     '''
     ----------------------------------------------------------------------------
@@ -75,6 +142,11 @@ class KafkaAgent(Agent):
             kafka_broker_port (str): Kafka Broker port
             kafka_producer_topic (str): Topic for messaging from kafka broker to VOLTTRON
             kafka_consumer_topic (str): Topic for messaging from VOLTTRON to Cloud
+            batch_size (int): Maximum number of messages sent in one Kafka record
+            batch_linger (float): Seconds to wait for a batch to fill before sending it
+            compression_type (str): Kafka producer compression (gzip, snappy, lz4 or None)
+            max_queue_size (int): Messages held in memory before spilling to backlog_path
+            backlog_path (str): SQLite file for messages that overflow the queue
 
         Returns:
             None
@@ -100,6 +172,11 @@ class KafkaAgent(Agent):
                  kafka_broker_port,
                  kafka_producer_topic,
                  kafka_consumer_topic,
+                 batch_size=100,
+                 batch_linger=1.0,
+                 compression_type='gzip',
+                 max_queue_size=10000,
+                 backlog_path='kafka_backlog.sqlite',
                  **kwargs):
         '''
             Function:
@@ -125,12 +202,31 @@ class KafkaAgent(Agent):
         self.kafka_broker_port = kafka_broker_port
         self.kafka_producer_topic = kafka_producer_topic
         self.kafka_consumer_topic = kafka_consumer_topic
+        self.batch_size = max(int(batch_size), 1)
+        self.batch_linger = batch_linger
+        self.compression_type = compression_type
+        self.max_queue_size = max(int(max_queue_size), self.batch_size)
+
+        # Messages waiting to be sent. Once the queue is full new messages
+        # go to the backlog, and keep going there until it is drained, so
+        # they are sent in the order they arrived.
+        self._queue = deque()
+        self._backlog = MessageBacklog(backlog_path)
+        # Delivery results appended by the producer's I/O thread and handled
+        # in the agent's greenlet.
+        self._acks = deque()
+        self._in_flight = 0
 
         self.default_config = {"services_topic_list": services_topic_list,
                                "kafka_broker_ip": kafka_broker_ip,
                                "kafka_broker_port": kafka_broker_port,
                                "kafka_producer_topic": kafka_producer_topic,
-                               "kafka_consumer_topic": kafka_consumer_topic
+                               "kafka_consumer_topic": kafka_consumer_topic,
+                               "batch_size": batch_size,
+                               "batch_linger": batch_linger,
+                               "compression_type": compression_type,
+                               "max_queue_size": max_queue_size,
+                               "backlog_path": backlog_path
                                }
 
         _log.info('default_config: {}'.format(self.default_config))
@@ -152,8 +248,13 @@ class KafkaAgent(Agent):
         # kafak producer - command volttron to kafka broker
         # produce json messages
         self.kafka_consumer_addr = '{0}:{1}'.format(self.kafka_broker_ip, self.kafka_broker_port)
+        # batches are built by the agent, so the producer sends each record
+        # straight away and never blocks the agent waiting for the broker.
         self.producer = KafkaProducer(bootstrap_servers=[self.kafka_consumer_addr],
-                        value_serializer=lambda v: json.dumps(v).encode('utf-8')
+                        value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                        compression_type=self.compression_type,
+                        linger_ms=0,
+                        max_block_ms=0
                          )
 
     # configuration callbacks
@@ -203,12 +304,96 @@ class KafkaAgent(Agent):
                 'description': 'message from VOLTTRON to KafkaBroker',
                 'message': message
                 }
-            # Send command to Consumer(in Cloud)
-            self.producer.send(self.kafka_consumer_topic, msg)
+            self._enqueue(msg)
+            # Send as soon as a batch is full rather than waiting for the
+            # next periodic flush, which also retries failed sends.
+            if len(self._queue) == self.batch_size:
+                self.flush_to_broker()
 
         except Exception as e:
             _log.error('Send_to_broker: {}'.format(e))
 
+    def _enqueue(self, msg):
+        if self._backlog.count or len(self._queue) >= self.max_queue_size:
+            self._backlog.push([msg])
+        else:
+            self._queue.append(msg)
+
+    def flush_to_broker(self):
+        '''
+            Function: Send queued messages to the Kafka broker in batches.
+
+            Args: None
+
+            Returns: None
+
+            Note:
+                Each batch of up to batch_size messages is sent as one record
+                whose value is a list of the messages. Delivery is confirmed
+                asynchronously; batches that fail are put back at the front
+                of the queue and sent again on the next flush.
+        '''
+        self._handle_acks()
+        while self._queue or self._backlog.count:
+            if len(self._queue) < self.batch_size and self._backlog.count:
+                self._queue.extend(self._backlog.pop(
+                    self.max_queue_size - len(self._queue)))
+            batch = [self._queue.popleft()
+                     for _ in xrange(min(self.batch_size, len(self._queue)))]
+            try:
+                future = self.producer.send(self.kafka_consumer_topic, batch)
+            except KafkaError as e:
+                # Typically no metadata for the topic yet or the producer's
+                # buffer is full; retry on the next flush.
+                _log.warning('Flush_to_broker: {}'.format(e))
+                self._queue.extendleft(reversed(batch))
+                return
+            self._in_flight += 1
+            future.add_callback(self._on_delivery, batch)
+            future.add_errback(self._on_delivery_error, batch)
+
+    def _on_delivery(self, batch, record_metadata):
+        # Called from the producer's I/O thread.
+        self._acks.append((batch, None))
+
+    def _on_delivery_error(self, batch, exception):
+        # Called from the producer's I/O thread.
+        self._acks.append((batch, exception))
+
+    def _handle_acks(self):
+        failed = []
+        while self._acks:
+            batch, exception = self._acks.popleft()
+            self._in_flight -= 1
+            if exception is not None:
+                _log.error('Flush_to_broker: delivery failed: {}'.format(
+                    exception))
+                failed.extend(batch)
+        if failed:
+            self._queue.extendleft(reversed(failed))
+
+    @Core.receiver("onstop")
+    def on_stop(self, sender, **kwargs):
+        '''
+            Function: Deliver what can be delivered and keep the rest in
+                      the backlog for the next start.
+        '''
+        self.flush_to_broker()
+        try:
+            self.producer.close(timeout=5)
+        except Exception as e:
+            _log.error('On_stop: {}'.format(e))
+        self._handle_acks()
+        if self._queue:
+            # Queued messages are older than the backlog so they go in
+            # front of it.
+            self._backlog.push_front(list(self._queue))
+            self._queue.clear()
+        if self._in_flight:
+            _log.warning('On_stop: {} batches not acknowledged by the '
+                         'broker'.format(self._in_flight))
+        self._backlog.close()
+
     @Core.receiver("onstart")
     def on_message_topic(self, sender, **kwargs):
         '''
@@ -246,6 +431,8 @@ class KafkaAgent(Agent):
         for topic_subscriptions in self.services_topic_list:
             subscriber(topic_subscriptions, self.send_to_broker)
 
+        self.core.periodic(self.batch_linger, self.flush_to_broker)
+
     @Core.periodic(1)
     def receive_from_broker(self):
         '''
@@ -0,0 +1,130 @@
+import os
+import sys
+
+import pytest
+
+pytest.importorskip('kafka')
+from kafka.errors import KafkaTimeoutError
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(test_dir + '/..')
+from kafkaagent import agent as kafka_agent
+from kafkaagent.agent import KafkaAgent, MessageBacklog
+
+
+class FakeFuture(object):
+    def __init__(self):
+        self.callbacks = []
+        self.errbacks = []
+
+    def add_callback(self, func, *args):
+        self.callbacks.append((func, args))
+
+    def add_errback(self, func, *args):
+        self.errbacks.append((func, args))
+
+    def success(self):
+        for func, args in self.callbacks:
+            func(*(args + (None,)))
+
+    def failure(self, exception):
+        for func, args in self.errbacks:
+            func(*(args + (exception,)))
+
+
+class FakeProducer(object):
+    def __init__(self, **kwargs):
+        self.sent = []
+        self.down = False
+
+    def send(self, topic, value):
+        if self.down:
+            raise KafkaTimeoutError('no broker')
+        future = FakeFuture()
+        self.sent.append((value, future))
+        return future
+
+    def close(self, timeout=None):
+        pass
+
+
+class FakeConsumer(object):
+    def __init__(self, **kwargs):
+        pass
+
+    def subscribe(self, topics):
+        pass
+
+
+@pytest.fixture
+def agent(monkeypatch, tmpdir):
+    monkeypatch.setattr(kafka_agent, 'KafkaProducer', FakeProducer)
+    monkeypatch.setattr(kafka_agent, 'KafkaConsumer', FakeConsumer)
+    return KafkaAgent(['devices'], '127.0.0.1', '9092', 'to-volttron',
+                      'from-volttron', batch_size=2, max_queue_size=4,
+                      backlog_path=str(tmpdir.join('backlog.sqlite')))
+
+
+def publish(agent, *values):
+    for value in values:
+        agent.send_to_broker('pubsub', 'sender', '', 'devices/all', {},
+                             value)
+
+
+def sent_values(agent):
+    return [[msg['message'] for msg in batch]
+            for batch, _ in agent.producer.sent]
+
+
+def test_message_backlog(tmpdir):
+    path = str(tmpdir.join('backlog.sqlite'))
+    backlog = MessageBacklog(path)
+    backlog.push([3, 4])
+    backlog.push_front([1, 2])
+    backlog.push_front([0])
+    backlog.close()
+
+    backlog = MessageBacklog(path)
+    assert backlog.count == 5
+    assert backlog.pop(2) == [0, 1]
+    assert backlog.pop(10) == [2, 3, 4]
+    assert backlog.count == 0
+    backlog.push_front([5])
+    assert backlog.pop(10) == [5]
+
+
+def test_batches_are_sent_and_failures_requeued(agent):
+    publish(agent, 1, 2, 3, 4, 5)
+    # Full batches are sent straight away.
+    assert sent_values(agent) == [[1, 2], [3, 4]]
+    assert agent._in_flight == 2
+
+    agent.producer.sent[0][1].failure(Exception('broker error'))
+    agent.producer.sent[1][1].success()
+    agent.flush_to_broker()
+    assert sent_values(agent)[2:] == [[1, 2], [5]]
+    assert agent._in_flight == 2
+
+
+def test_overflow_spills_to_backlog(agent):
+    agent.producer.down = True
+    publish(agent, *range(10))
+    assert list(agent._queue) == [
+        {'message_sender': 'sender', 'kafka_message_sender': 'KafkaAgent',
+         'description': 'message from VOLTTRON to KafkaBroker',
+         'message': value} for value in range(4)]
+    assert agent._backlog.count == 6
+
+    agent.producer.down = False
+    agent.flush_to_broker()
+    assert sent_values(agent) == [[0, 1], [2, 3], [4, 5], [6, 7], [8, 9]]
+    assert agent._backlog.count == 0
+
+
+def test_stop_keeps_queued_messages_ahead_of_backlog(agent):
+    agent.producer.down = True
+    publish(agent, *range(7))
+    agent.on_stop(None)
+
+    backlog = MessageBacklog(agent.default_config['backlog_path'])
+    assert [msg['message'] for msg in backlog.pop(10)] == range(7)
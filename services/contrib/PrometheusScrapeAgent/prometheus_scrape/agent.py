@@ -33,6 +33,16 @@ class PrometheusScrapeAgent(Agent):
         self._cache_time = self._config_dict.get('cache_timeout', 660)
         self._tag_delimiter_re = self._config_dict.get('tag_delimiter_re',
                                                        "\s+|:|_|\.|/")
+        self._compression_level = int(
+            self._config_dict.get('compression_level', 6))
+        self._cleanup_interval = self._config_dict.get('cleanup_interval', 60)
+        # Metric name and labels of each (device, topic), built the first
+        # time the topic is seen.
+        self._series = {}
+        # Last scrape response and the time it stops being valid because
+        # a value in it reaches the cache timeout.
+        self._response = None
+        self._response_expires = None
 
     @Core.receiver("onstart")
     def _starting(self, sender, **kwargs):
@@ -41,6 +51,7 @@ class PrometheusScrapeAgent(Agent):
         self.vip.pubsub.subscribe(peer='pubsub',
                                   prefix=topics.DRIVER_TOPIC_BASE,
                                   callback=self._capture_device_data)
+        self.core.periodic(self._cleanup_interval, self._expire_cache)
 
     @Core.receiver("onstop")
     def _stopping(self, sender, **kwargs):
@@ -51,42 +62,64 @@ class PrometheusScrapeAgent(Agent):
 
     def scrape(self, env, data):
         scrape_time = get_utc_seconds_from_epoch()
-        keys_to_delete = defaultdict(list)
+        if self._response is None or scrape_time >= self._response_expires:
+            self._response, self._response_expires = self._render(scrape_time)
+        return self._response
+
+    def _render(self, scrape_time):
+        """Build the scrape response from the values in the cache that have
+        not timed out. Returns the response and when it expires."""
+        expires = float('inf')
         if len(self._cache) > 0:
-            result = "# TYPE volttron_data gauge\n"
+            lines = ["# TYPE volttron_data gauge\n"]
             for device, device_topics in self._cache.iteritems():
-                device_tags = device.replace("-", "_").split('/')
-                for topic, value in device_topics.iteritems():
-                    if value[1] + self._cache_time > scrape_time:
-                        metric_props = re.split(self._tag_delimiter_re,
-                                                topic.lower())
-                        metric_tag_str = (
-                            "campus=\"{}\",building=\"{}\","
-                            "device=\"{}\",").format(*device_tags)
-                        for i, prop in enumerate(metric_props):
-                            metric_tag_str += "tag{}=\"{}\",".format(i, prop)
-                        result += "{}{{{}topic=\"{}\"}} {}\n".format(
-                            re.sub(" |/|-", "_", device), metric_tag_str,
-                            topic.replace(" ", "_"), value[0])
-                    else:
-                        try:
-                            keys_to_delete[device].append(topic)
-                        except Exception as e:
-                            _log.error("Could not delete stale topic")
-                            _log.exception(e)
-                        continue
+                for topic, (value, cached_time) in device_topics.iteritems():
+                    timeout = cached_time + self._cache_time
+                    if timeout > scrape_time:
+                        lines.append("{}{}\n".format(
+                            self._series_prefix(device, topic), value))
+                        expires = min(expires, timeout)
+            result = "".join(lines)
         else:
             result = "#No Data to Scrape"
-        for device, delete_topics in keys_to_delete.iteritems():
-            for topic in delete_topics:
-                del self._cache[device][topic]
-        gzip_compress = zlib.compressobj(9, zlib.DEFLATED,
-                                         zlib.MAX_WBITS | 16)
-        data = gzip_compress.compress(result) + gzip_compress.flush()
 
-        return "200 OK", base64.b64encode(data), [
-            ('Content-Type', 'text/plain'),
-            ('Content-Encoding', 'gzip')]
+        headers = [('Content-Type', 'text/plain')]
+        if self._compression_level > 0:
+            gzip_compress = zlib.compressobj(self._compression_level,
+                                             zlib.DEFLATED,
+                                             zlib.MAX_WBITS | 16)
+            result = gzip_compress.compress(result) + gzip_compress.flush()
+            headers.append(('Content-Encoding', 'gzip'))
+
+        return ("200 OK", base64.b64encode(result), headers), expires
+
+    def _series_prefix(self, device, topic):
+        try:
+            return self._series[device, topic]
+        except KeyError:
+            pass
+        device_tags = device.replace("-", "_").split('/')
+        metric_props = re.split(self._tag_delimiter_re, topic.lower())
+        metric_tags = [("campus=\"{}\",building=\"{}\","
+                        "device=\"{}\",").format(*device_tags)]
+        for i, prop in enumerate(metric_props):
+            metric_tags.append("tag{}=\"{}\",".format(i, prop))
+        prefix = "{}{{{}topic=\"{}\"}} ".format(
+            re.sub(" |/|-", "_", device), "".join(metric_tags),
+            topic.replace(" ", "_"))
+        self._series[device, topic] = prefix
+        return prefix
+
+    def _expire_cache(self):
+        """Periodically remove values that have reached the cache timeout."""
+        expire_time = get_utc_seconds_from_epoch() - self._cache_time
+        for device, device_topics in self._cache.items():
+            for topic, (_, cached_time) in device_topics.items():
+                if cached_time <= expire_time:
+                    del device_topics[topic]
+                    self._series.pop((device, topic), None)
+            if not device_topics:
+                del self._cache[device]
 
     def _clean_compat(self, sender, topic, headers, message):
         try:
@@ -195,6 +228,7 @@ class PrometheusScrapeAgent(Agent):
         cached_time = get_utc_seconds_from_epoch()
         try:
             self._cache[device][topic] = (float(value), cached_time)
+            self._response = None
         except:
             _log.error(
                 "Topic \"{}\" on device \"{}\" contained value that was not "
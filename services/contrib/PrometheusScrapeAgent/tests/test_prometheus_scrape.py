@@ -0,0 +1,101 @@
+import base64
+import os
+import sys
+import zlib
+
+import pytest
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(test_dir + '/..')
+from prometheus_scrape import agent as scrape_agent
+from prometheus_scrape.agent import PrometheusScrapeAgent
+
+DEVICE = 'campus/building/rtu1'
+HEADER = '# TYPE volttron_data gauge\n'
+ZONE_TEMP = ('campus_building_rtu1{campus="campus",building="building",'
+             'device="rtu1",tag0="zone",tag1="temp",topic="Zone_Temp"} '
+             '72.0\n')
+HUMIDITY = ('campus_building_rtu1{campus="campus",building="building",'
+            'device="rtu1",tag0="humidity",topic="Humidity"} 40.5\n')
+
+
+class Clock(object):
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(1000.0)
+    monkeypatch.setattr(scrape_agent, 'get_utc_seconds_from_epoch', clock)
+    return clock
+
+
+def scraped_text(response):
+    status, body, headers = response
+    assert status == '200 OK'
+    assert headers == [('Content-Type', 'text/plain')]
+    return base64.b64decode(body)
+
+
+def test_scrape_response_cached(clock):
+    agent = PrometheusScrapeAgent({'cache_timeout': 100,
+                                   'compression_level': 0})
+    agent._add_to_cache(DEVICE, 'Zone Temp', 72)
+    response = agent.scrape({}, None)
+    assert scraped_text(response) == HEADER + ZONE_TEMP
+
+    # Reused while nothing changes and no value times out.
+    clock.now = 1050.0
+    assert agent.scrape({}, None) is response
+
+    # Rendered again for new data.
+    agent._add_to_cache(DEVICE, 'Humidity', '40.5')
+    response = agent.scrape({}, None)
+    assert sorted(scraped_text(response).splitlines(True)) == \
+        sorted([HEADER, ZONE_TEMP, HUMIDITY])
+    clock.now = 1099.0
+    assert agent.scrape({}, None) is response
+
+    # Rendered again when a value times out.
+    clock.now = 1100.0
+    response = agent.scrape({}, None)
+    assert scraped_text(response) == HEADER + HUMIDITY
+    clock.now = 1150.0
+    assert scraped_text(agent.scrape({}, None)) == HEADER
+
+
+def test_scrape_gzip(clock):
+    agent = PrometheusScrapeAgent({})
+    status, body, headers = agent.scrape({}, None)
+    assert headers == [('Content-Type', 'text/plain'),
+                       ('Content-Encoding', 'gzip')]
+    assert zlib.decompress(base64.b64decode(body), 16 + zlib.MAX_WBITS) == \
+        '#No Data to Scrape'
+
+    agent._add_to_cache(DEVICE, 'Zone Temp', 72)
+    status, body, headers = agent.scrape({}, None)
+    assert zlib.decompress(base64.b64decode(body), 16 + zlib.MAX_WBITS) == \
+        HEADER + ZONE_TEMP
+
+
+def test_expire_cache(clock):
+    agent = PrometheusScrapeAgent({'cache_timeout': 100})
+    agent._add_to_cache(DEVICE, 'Zone Temp', 72)
+    clock.now = 1050.0
+    agent._add_to_cache(DEVICE, 'Humidity', 40.5)
+    agent.scrape({}, None)
+    assert len(agent._series) == 2
+
+    clock.now = 1100.0
+    agent._expire_cache()
+    assert agent._cache == {DEVICE: {'Humidity': (40.5, 1050.0)}}
+    assert list(agent._series) == [(DEVICE, 'Humidity')]
+
+    clock.now = 1150.0
+    agent._expire_cache()
+    assert agent._cache == {}
+    assert agent._series == {}
@@ -67,6 +67,15 @@ ActuatorAgent Configuration
     "heartbeat_interval"
         How often to send a heartbeat signal to all devices in seconds.
         Defaults to 60.
+    "announce_changes_only"
+        Only announce devices whose reservation changed since the last
+        announcement. Defaults to false. See `Schedule State Publishes`_.
+    "batch_announcements"
+        Publish all device announcements as a single message.
+        Defaults to false. See `Schedule State Publishes`_.
+    "multiple_points_fan_out"
+        Maximum number of devices get_multiple_points and set_multiple_points
+        will call the master driver for concurrently. Defaults to 10.
         
 
 Sample configuration file
@@ -440,6 +449,30 @@ With the following header:
 
 The frequency of the updates is configurable with the
 "schedule_publish_interval" setting in the configuration.
+
+With a large number of reserved devices these publishes can put a
+considerable load on the message bus. When "announce_changes_only" is set
+the ActuatorAgent only announces a device when the agent or Task holding
+it has changed since it was last announced. Agents relying on this
+setting should track the "window" of their own time slots.
+
+When "batch_announcements" is set the announcements are published as a single
+message to
+
+    ``devices/actuators/schedule/states``
+
+The message is a dictionary keyed by device with an entry for each announced
+device:
+
+.. code-block:: python
+
+    {
+        <full device path>: {
+            'requesterID': <VIP identity of Agent with access>,
+            'taskID': <Task associated with the time slot>,
+            'window': <Seconds remaining in the time slot>
+        }
+    }
 """
 
 __docformat__ = 'reStructuredText'
@@ -514,12 +547,18 @@ def actuator_agent(config_path, **kwargs):
     driver_vip_identity = config.get('driver_vip_identity', PLATFORM_DRIVER)
 
     allow_no_lock_write = bool(config.get('allow_no_lock_write', True))
+    announce_changes_only = bool(config.get('announce_changes_only', False))
+    batch_announcements = bool(config.get('batch_announcements', False))
+    multiple_points_fan_out = int(config.get('multiple_points_fan_out', 10))
 
     return ActuatorAgent(heartbeat_interval,
                          schedule_publish_interval,
                          preempt_grace_time,
                          driver_vip_identity,
                          allow_no_lock_write,
+                         announce_changes_only,
+                         batch_announcements,
+                         multiple_points_fan_out,
                          **kwargs)
 
 
@@ -541,11 +580,20 @@ class ActuatorAgent(Agent):
     :param preempt_grace_time: Time in seconds after a schedule is preemted
         before it is actually cancelled. 
     :param driver_vip_identity: VIP identity of the Master Driver Agent. 
+    :param announce_changes_only: Only announce devices whose reservation
+        changed since they were last announced.
+    :param batch_announcements: Publish all schedule announcements as
+        a single message.
+    :param multiple_points_fan_out: Maximum number of devices to call the
+        master driver for at once when getting or setting multiple points.
 
     :type heartbeat_interval: float
     :type schedule_publish_interval: float
     :type preempt_grace_time: float
     :type driver_vip_identity: str
+    :type announce_changes_only: bool
+    :type batch_announcements: bool
+    :type multiple_points_fan_out: int
     """
 
     def __init__(self, heartbeat_interval=60,
@@ -553,6 +601,9 @@ class ActuatorAgent(Agent):
                  preempt_grace_time=60,
                  driver_vip_identity=PLATFORM_DRIVER,
                  allow_no_lock_write=True,
+                 announce_changes_only=False,
+                 batch_announcements=False,
+                 multiple_points_fan_out=10,
                  **kwargs):
 
         super(ActuatorAgent, self).__init__(**kwargs)
@@ -560,11 +611,17 @@ class ActuatorAgent(Agent):
 
         self._update_event = None
         self._device_states = {}
+        # (agent_id, task_id) last announced for each device.
+        self._announced_states = {}
+        self.announce_changes_only = announce_changes_only
+        self.batch_announcements = batch_announcements
+        self.multiple_points_fan_out = multiple_points_fan_out
 
         self.schedule_state_file = "_schedule_state"
         self.heartbeat_greenlet = None
         self.heartbeat_interval = heartbeat_interval
         self._schedule_manager = None
+        self._legacy_schedule_state = False
         self.schedule_publish_interval = schedule_publish_interval
         self.subscriptions_setup = False
         #Only turn this on once we have confirmation from the config store.
@@ -575,7 +632,10 @@ class ActuatorAgent(Agent):
                               "schedule_publish_interval": schedule_publish_interval,
                               "preempt_grace_time": preempt_grace_time,
                               "driver_vip_identity": driver_vip_identity,
-                               "allow_no_lock_write": allow_no_lock_write}
+                               "allow_no_lock_write": allow_no_lock_write,
+                               "announce_changes_only": announce_changes_only,
+                               "batch_announcements": batch_announcements,
+                               "multiple_points_fan_out": multiple_points_fan_out}
 
 
         self.vip.config.set_default("config", self.default_config)
@@ -594,6 +654,9 @@ class ActuatorAgent(Agent):
             heartbeat_interval = float(config["heartbeat_interval"])
             preempt_grace_time = float(config["preempt_grace_time"])
             allow_no_lock_write = bool(config["allow_no_lock_write"])
+            announce_changes_only = bool(config["announce_changes_only"])
+            batch_announcements = bool(config["batch_announcements"])
+            multiple_points_fan_out = max(1, int(config["multiple_points_fan_out"]))
         except ValueError as e:
             _log.error("ERROR PROCESSING CONFIGURATION: {}".format(e))
             #TODO: set a health status for the agent
@@ -602,6 +665,9 @@ class ActuatorAgent(Agent):
         self.driver_vip_identity = driver_vip_identity
         self.schedule_publish_interval = schedule_publish_interval
         self.allow_no_lock_write = allow_no_lock_write
+        self.announce_changes_only = announce_changes_only
+        self.batch_announcements = batch_announcements
+        self.multiple_points_fan_out = multiple_points_fan_out
 
         _log.debug("MasterDriver VIP IDENTITY: {}".format(self.driver_vip_identity))
         _log.debug("Schedule publish interval: {}".format(self.schedule_publish_interval))
@@ -621,11 +687,7 @@ class ActuatorAgent(Agent):
         _log.debug("Preemption grace period: {}".format(preempt_grace_time))
 
         if self._schedule_manager is None:
-            try:
-                state_string = self.vip.config.get(self.schedule_state_file)
-            except KeyError:
-                state_string = None
-            self._setup_schedule(preempt_grace_time, state_string)
+            self._load_schedule(preempt_grace_time)
         else:
             self._schedule_manager.set_grace_period(preempt_grace_time)
 
@@ -666,21 +728,63 @@ class ActuatorAgent(Agent):
             _log.warning(''.join([e.__class__.__name__, '(', e.message, ')']))
 
 
-    def _schedule_save_callback(self, state_file_contents):
+    def _load_schedule(self, preempt_grace_time):
+        try:
+            state_string = self.vip.config.get(self.schedule_state_file)
+        except KeyError:
+            state_string = None
+        self._legacy_schedule_state = state_string is not None
+        prefix = self.schedule_state_file + '/'
+        task_strings = {}
+        for name in self.vip.config.list():
+            if name.startswith(prefix):
+                # Task ids are byte strings (UTF-8 if they were unicode).
+                task_id = name[len(prefix):].decode('hex')
+                task_strings[task_id] = self.vip.config.get(name)
+        self._setup_schedule(preempt_grace_time, state_string, task_strings)
+
+    def _task_config_name(self, task_id):
+        if isinstance(task_id, unicode):
+            task_id = task_id.encode('utf-8')
+        return self.schedule_state_file + '/' + task_id.encode('hex')
+
+    def _schedule_save_callback(self, changed, removed):
+        # Each task is saved in a configuration of its own, named after
+        # the hex encoded task id as configuration names are not case
+        # sensitive, so only changed tasks need to be written.
         _log.debug("Saving schedule state")
-        self.vip.config.set(self.schedule_state_file, state_file_contents, send_update=False)
+        for task_id, task_string in changed.iteritems():
+            self.vip.config.set(self._task_config_name(task_id),
+                                task_string, send_update=False)
+        for task_id in removed:
+            self.vip.config.delete(self._task_config_name(task_id),
+                                   send_update=False)
 
 
-    def _setup_schedule(self, preempt_grace_time, initial_state=None):
+    def _setup_schedule(self, preempt_grace_time, initial_state=None, initial_task_states=None):
         now = utils.get_aware_utc_now()
         self._schedule_manager = ScheduleManager(
             preempt_grace_time,
             now=now,
-            save_state_callback=self._schedule_save_callback,
-            initial_state_string=initial_state)
+            save_changes_callback=self._schedule_save_callback,
+            initial_state_string=initial_state,
+            initial_task_strings=initial_task_states)
+
+        if self._legacy_schedule_state:
+            # The config store cannot be changed from the configuration
+            # callback this is called from.
+            self.core.spawn(self._migrate_legacy_schedule_state)
 
         self._update_device_state_and_schedule(now)
 
+    def _migrate_legacy_schedule_state(self):
+        now = utils.get_aware_utc_now()
+        if self._legacy_schedule_state and self._schedule_manager.save_state(now):
+            # The tasks from a state saved as a whole that are still active
+            # have now been saved on their own.
+            self.vip.config.delete(self.schedule_state_file, send_update=False)
+            self._legacy_schedule_state = False
+
     def _update_device_state_and_schedule(self, now, device_only=None, publish=True):
         _log.debug("_update_device_state_and_schedule")
         # Sanity check now.
@@ -716,23 +820,28 @@ class ActuatorAgent(Agent):
         _log.debug("new_update_event_time is {}".format(
             new_update_event_time))
 
+        # Forget devices that are no longer reserved so they are
+        # announced again when they are next reserved.
+        for device in self._announced_states.keys():
+            if device not in self._device_states:
+                del self._announced_states[device]
+
         if publish:
             device_states = []
             if device_only is not None:
                 if device_only in self._device_states:
                     device_states.append((device_only, self._device_states[device_only]))
+            elif self.announce_changes_only:
+                for device, state in self._device_states.iteritems():
+                    holder = (state.agent_id, state.task_id)
+                    if self._announced_states.get(device) != holder:
+                        device_states.append((device, state))
             else:
-                device_states = self._device_states.iteritems()
+                device_states = self._device_states.items()
 
             for device, state in device_states:
-                _log.debug("device, state -  {}, {}".format(device, state))
-                header = self._get_headers(state.agent_id,
-                                           time=utils.format_timestamp(now),
-                                           task_id=state.task_id)
-                header['window'] = state.time_remaining
-                topic = topics.ACTUATOR_SCHEDULE_ANNOUNCE_RAW.replace('{device}',
-                                                                      device)
-                self.vip.pubsub.publish('pubsub', topic, headers=header)
+                self._announced_states[device] = (state.agent_id, state.task_id)
+            self._announce_device_states(now, device_states)
 
         if self._update_event is not None:
             # This won't hurt anything if we are canceling ourselves.
@@ -742,6 +851,34 @@ class ActuatorAgent(Agent):
                                                 self._update_schedule_state,
                                                 new_update_event_time)
 
+    def _announce_device_states(self, now, device_states):
+        if not device_states:
+            return
+        timestamp = utils.format_timestamp(now)
+
+        if self.batch_announcements:
+            message = {}
+            for device, state in device_states:
+                message[device] = {'requesterID': state.agent_id,
+                                   'taskID': state.task_id,
+                                   'window': state.time_remaining}
+            _log.debug("Announcing {} device states".format(len(message)))
+            self.vip.pubsub.publish('pubsub',
+                                    topics.ACTUATOR_SCHEDULE_STATES(),
+                                    headers={'time': timestamp},
+                                    message=message)
+            return
+
+        for device, state in device_states:
+            _log.debug("device, state -  {}, {}".format(device, state))
+            header = self._get_headers(state.agent_id,
+                                       time=timestamp,
+                                       task_id=state.task_id)
+            header['window'] = state.time_remaining
+            topic = topics.ACTUATOR_SCHEDULE_ANNOUNCE_RAW.replace('{device}',
+                                                                  device)
+            self.vip.pubsub.publish('pubsub', topic, headers=header)
+
     def _get_adjusted_next_event_time(self, now, next_event_time, previously_scheduled_time):
         _log.debug("_get_adjusted_next_event_time")
         latest_next = now + datetime.timedelta(
@@ -976,7 +1113,8 @@ class ActuatorAgent(Agent):
         """RPC method
 
         Get multiple points on multiple devices. Makes a single
-        RPC call to the master driver per device.
+        RPC call to the master driver per device. Up to
+        "multiple_points_fan_out" devices are read concurrently.
 
         :param topics: List of topics or list of [device, point] pairs.
         :param \*\*kwargs: Any driver specific parameters
@@ -1004,12 +1142,8 @@ class ActuatorAgent(Agent):
                 e = ValueError("Invalid topic: {}".format(topic))
                 errors[repr(topic)] = repr(e)
 
-        for device, point_names in devices.iteritems():
-            r, e = self.vip.rpc.call(self.driver_vip_identity,
-                                     'get_multiple_points',
-                                     device,
-                                     point_names,
-                                     **kwargs).get()
+        for r, e in self._call_per_device('get_multiple_points', devices,
+                                          **kwargs):
             results.update(r)
             errors.update(e)
 
@@ -1020,7 +1154,8 @@ class ActuatorAgent(Agent):
         """RPC method
 
         Set multiple points on multiple devices. Makes a single
-        RPC call to the master driver per device.
+        RPC call to the master driver per device. Up to
+        "multiple_points_fan_out" devices are set concurrently.
 
         :param requester_id: Ignored, VIP Identity used internally
         :param topics_values: List of (topic, value) tuples
@@ -1053,15 +1188,26 @@ class ActuatorAgent(Agent):
             if not self._check_lock(device, requester_id):
                 raise LockError("caller ({}) does not lock for device {}".format(requester_id, device))
 
-        for device, point_names_values in devices.iteritems():
-            r = self.vip.rpc.call(self.driver_vip_identity,
-                                  'set_multiple_points',
-                                  device,
-                                  point_names_values,
-                                  **kwargs).get()
+        for r in self._call_per_device('set_multiple_points', devices,
+                                       **kwargs):
             results.update(r)
 
         return results
+
+    def _call_per_device(self, method, device_args, **kwargs):
+        """Call method on the master driver once for each device keeping
+        at most multiple_points_fan_out calls outstanding. Returns the
+        results in the order the devices were iterated."""
+        results = []
+        pending = collections.deque()
+        for device, args in device_args.iteritems():
+            if len(pending) >= self.multiple_points_fan_out:
+                results.append(pending.popleft().get())
+            pending.append(self.vip.rpc.call(self.driver_vip_identity,
+                                             method, device, args, **kwargs))
+        while pending:
+            results.append(pending.popleft().get())
+        return results
     
     def handle_revert_point(self, peer, sender, bus, topic, headers, message):
         """
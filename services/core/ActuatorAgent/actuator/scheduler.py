@@ -327,40 +327,143 @@ class Schedule(object):
         pass
 
 
+class DeviceIndex(object):
+    """Time slices reserved on one device, sorted by start time.
+
+    Used to find the tasks that may conflict with a request without
+    looking at every task. Entries are never updated when a task is
+    preempted or canceled, so they cover at least the task's current
+    time slots and the tasks found must still be checked.
+    """
+    def __init__(self):
+        self.entries = []
+        self.max_duration = timedelta(0)
+
+    def add(self, time_slice, task_id):
+        bisect.insort(self.entries,
+                      (time_slice.start, time_slice.end, task_id))
+        self.max_duration = max(self.max_duration,
+                                time_slice.end - time_slice.start)
+
+    def find_overlapping(self, time_slice):
+        """Returns the ids of tasks with a slot overlapping time_slice"""
+        entries = self.entries
+        # Only slots starting less than max_duration before the time
+        # slice can still be running when it starts.
+        first = bisect.bisect_left(entries,
+                                   (time_slice.start - self.max_duration,))
+        last = bisect.bisect_left(entries, (time_slice.end,), first)
+        return set(task_id for _, end, task_id in entries[first:last]
+                   if end > time_slice.start)
+
+    def prune(self, now):
+        """Removes slots that have certainly ended."""
+        del self.entries[:bisect.bisect_left(self.entries,
+                                             (now - self.max_duration,))]
+
+    def __len__(self):
+        return len(self.entries)
+
+
 class ScheduleManager(object):
-    def __init__(self, grace_time, now=None, save_state_callback=None, initial_state_string=None):
+    """Manages device reservations.
+
+    State is saved after each change either by passing the pickled tasks
+    to save_state_callback or, if save_changes_callback is given, by
+    passing it a dict of the pickled tasks that changed, keyed by task id,
+    and a set of the ids of tasks that no longer need to be saved. The
+    latter can be loaded again as initial_task_strings.
+    """
+    def __init__(self, grace_time, now=None, save_state_callback=None, initial_state_string=None,
+                 save_changes_callback=None, initial_task_strings=None):
         self.tasks = {}
         self.running_tasks = set()
         self.preempted_tasks = set()
         self.set_grace_period(grace_time)
         self.save_state_callback = save_state_callback
+        self.save_changes_callback = save_changes_callback
+        self._device_index = defaultdict(DeviceIndex)
+        # Ids of tasks changed or removed since the last save_state, and
+        # of the tasks in the saved state.
+        self._changed = set()
+        self._removed = set()
+        self._saved = set()
         if now is None:
             now = utils.get_aware_utc_now()
-        self.load_state(now, initial_state_string)
+        self.load_state(now, initial_state_string, initial_task_strings)
 
     def set_grace_period(self, seconds):
         self.grace_time = timedelta(seconds=seconds)
 
-    def load_state(self, now, initial_state_string):
-        if initial_state_string is None:
+    def load_state(self, now, initial_state_string, initial_task_strings=None):
+        if initial_state_string is None and not initial_task_strings:
             return
 
         try:
-            self.tasks = loads(initial_state_string)
-            self._cleanup(now)
+            if initial_state_string is not None:
+                self.tasks = loads(initial_state_string)
+                # Save every task the first time changes are saved.
+                self._changed.update(self.tasks)
         except StandardError:
             self.tasks = {}
             _log.error ('Scheduler state file corrupted!')
 
+        for task_id, task_string in (initial_task_strings or {}).iteritems():
+            try:
+                self.tasks[task_id] = loads(task_string)
+                self._saved.add(task_id)
+            except StandardError:
+                self._removed.add(task_id)
+                self._saved.add(task_id)
+                _log.error('Scheduler state for task {} corrupted!'.format(task_id))
+
+        self._cleanup(now)
+        for task_id, task in self.tasks.iteritems():
+            self._index_task(task_id, task)
+
     def save_state(self, now):
-        if self.save_state_callback is None:
-            return
+        """Save the tasks, returning False if saving failed."""
+        if self.save_changes_callback is None:
+            self._changed.clear()
+            self._removed.clear()
+            if self.save_state_callback is None:
+                return True
 
         try:
             self._cleanup(now)
-            self.save_state_callback(dumps(self.tasks))
+            if self.save_changes_callback is None:
+                self.save_state_callback(dumps(self.tasks))
+                return True
+            changed = dict((task_id, dumps(self.tasks[task_id]))
+                           for task_id in self._changed if task_id in self.tasks)
+            removed = self._removed & self._saved
+            if changed or removed:
+                self.save_changes_callback(changed, removed)
+            self._saved.difference_update(removed)
+            self._saved.update(changed)
+            self._changed.clear()
+            self._removed.clear()
         except StandardError:
             _log.error('Failed to save scheduler state!')
+            return False
+        return True
+
+    def _index_task(self, task_id, task):
+        for device, schedule in task.devices.iteritems():
+            index = self._device_index[device]
+            for time_slot in schedule.time_slots:
+                index.add(time_slot, task_id)
+
+    def _find_candidates(self, task):
+        """Returns the ids of existing tasks that may conflict with task"""
+        candidates = set()
+        for device, schedule in task.devices.iteritems():
+            index = self._device_index.get(device)
+            if index is None:
+                continue
+            for time_slot in schedule.time_slots:
+                candidates |= index.find_overlapping(time_slot)
+        return candidates
 
     def request_slots(self, agent_id, id_, requests, priority, now=None):
         if now is None:
@@ -405,7 +508,10 @@ class ScheduleManager(object):
         conflicts = defaultdict(dict)
         preempted_tasks = set()
 
-        for task_id, task in self.tasks.iteritems():
+        for task_id in self._find_candidates(new_task):
+            task = self.tasks.get(task_id)
+            if task is None:
+                continue
             conflict_list = new_task.get_conflicts(task)
             agent_id = task.agent_id
             if conflict_list:
@@ -422,10 +528,14 @@ class ScheduleManager(object):
             # preempted
         # and the request will succeed.
         self.tasks[id_] = new_task
+        self._index_task(id_, new_task)
+        self._changed.add(id_)
+        self._removed.discard(id_)
 
         for _, task_id in preempted_tasks:
             task = self.tasks[task_id]
             task.preempt(self.grace_time, now)
+            self._changed.add(task_id)
 
         self.save_state(now)
 
@@ -441,6 +551,7 @@ class ScheduleManager(object):
             return RequestResult(False, {}, 'AGENT_ID_TASK_ID_MISMATCH')
 
         del self.tasks[task_id]
+        self._removed.add(task_id)
 
         self.save_state(now)
 
@@ -499,6 +610,7 @@ class ScheduleManager(object):
             task.make_current(now)
             if task.state == Task.STATE_FINISHED:
                 del self.tasks[task_id]
+                self._removed.add(task_id)
 
             elif task.state == Task.STATE_RUNNING:
                 self.running_tasks.add(task_id)
@@ -506,5 +618,10 @@ class ScheduleManager(object):
             elif task.state == Task.STATE_PREEMPTED:
                 self.preempted_tasks.add(task_id)
 
+        for device, index in self._device_index.items():
+            index.prune(now)
+            if not index:
+                del self._device_index[device]
+
     def __repr__(self):
         pass
@@ -0,0 +1,200 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2017, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+from datetime import timedelta
+import os
+import sys
+
+import gevent
+
+test_dir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(test_dir + '/..')
+from actuator.agent import ActuatorAgent
+from actuator.scheduler import ScheduleManager, PRIORITY_LOW
+from volttron.platform.agent import utils
+from volttron.platform.messaging import topics
+from volttron.platform.vip.agent.core import ScheduledEvent
+
+
+class FakeConfigStore(object):
+    """Config store that, like the real one, refuses changes requested
+    from a configuration callback."""
+    def __init__(self, configs=None):
+        self.configs = dict(configs or {})
+        self.in_callback = False
+
+    def _check_call_from_process_callbacks(self):
+        if self.in_callback:
+            raise RuntimeError("Cannot request changes to the config store "
+                               "from a configuration callback.")
+
+    def get(self, name):
+        return self.configs[name]
+
+    def set(self, name, contents, send_update=True):
+        self._check_call_from_process_callbacks()
+        self.configs[name] = contents
+
+    def delete(self, name, send_update=True):
+        self._check_call_from_process_callbacks()
+        del self.configs[name]
+
+    def list(self):
+        return list(self.configs)
+
+
+def build_agent(store, **kwargs):
+    agent = ActuatorAgent(**kwargs)
+    agent.vip.config = store
+    # The agent is not running, so scheduled updates are never run.
+    agent.core.spawn = gevent.spawn
+    agent.core.schedule = lambda deadline, func, *args, **kwargs: \
+        ScheduledEvent(func, args, kwargs)
+    published = []
+    agent.vip.pubsub.publish = \
+        lambda *args, **kwargs: published.append((args, kwargs))
+    return agent, published
+
+
+def request(manager, agent_id, task_id, device, now, hours=1):
+    return manager.request_slots(agent_id, task_id,
+                                 ([device, now + timedelta(hours=hours),
+                                   now + timedelta(hours=hours + 1)],),
+                                 PRIORITY_LOW, now)
+
+
+def test_tasks_saved_with_non_ascii_ids():
+    now = utils.get_aware_utc_now()
+    store = FakeConfigStore()
+    agent, _ = build_agent(store)
+    agent._load_schedule(60)
+    task_id = u'T\xe2che'.encode('utf-8')
+    result = request(agent._schedule_manager, 'Agent1', task_id,
+                     'campus/building/rtu1', now)
+    assert result.success
+    assert len(store.configs) == 1
+    assert agent._task_config_name(u'T\xe2che') in store.configs
+
+    reloaded, _ = build_agent(store)
+    reloaded._load_schedule(60)
+    assert set(reloaded._schedule_manager.tasks) == {task_id}
+
+
+def load_from_callback(agent, store):
+    """Load the schedule as configure does, from a configuration callback,
+    and let the greenlets it spawns run."""
+    store.in_callback = True
+    try:
+        agent._load_schedule(60)
+    finally:
+        store.in_callback = False
+    gevent.sleep(0)
+
+
+def test_legacy_state_deleted_after_migration():
+    now = utils.get_aware_utc_now()
+    saved = []
+    legacy = ScheduleManager(60, now=now, save_state_callback=saved.append)
+    request(legacy, 'Agent1', 'Active', 'campus/building/rtu1', now)
+    store = FakeConfigStore({'_schedule_state': saved[-1]})
+    agent, _ = build_agent(store)
+    load_from_callback(agent, store)
+    assert '_schedule_state' not in store.configs
+    assert len(store.configs) == 1
+
+    # A legacy state holding only finished tasks is deleted as well.
+    legacy = ScheduleManager(60, now=now, save_state_callback=saved.append)
+    request(legacy, 'Agent1', 'Done', 'campus/building/rtu1',
+            now - timedelta(hours=4))
+    store = FakeConfigStore({'_schedule_state': saved[-1]})
+    agent, _ = build_agent(store)
+    load_from_callback(agent, store)
+    assert store.configs == {}
+
+
+def announced_devices(published):
+    devices = []
+    for args, kwargs in published:
+        topic = args[1]
+        devices.append(topic.split('/', 4)[-1])
+    return sorted(devices)
+
+
+def test_announce_changes_only():
+    now = utils.get_aware_utc_now()
+    agent, published = build_agent(FakeConfigStore(),
+                                   announce_changes_only=True)
+    agent._load_schedule(60)
+    manager = agent._schedule_manager
+    request(manager, 'Agent1', 'Task1', 'campus/building/rtu1', now, hours=0)
+    request(manager, 'Agent1', 'Task2', 'campus/building/rtu2', now, hours=0)
+    now += timedelta(minutes=1)
+
+    agent._update_schedule_state(now)
+    assert announced_devices(published) == ['campus/building/rtu1',
+                                            'campus/building/rtu2']
+    # Unchanged reservations are not announced again.
+    del published[:]
+    agent._update_schedule_state(now + timedelta(seconds=30))
+    assert published == []
+
+    manager.cancel_task('Agent1', 'Task2', now)
+    request(manager, 'Agent2', 'Task3', 'campus/building/rtu2', now, hours=0)
+    agent._update_schedule_state(now + timedelta(seconds=40))
+    assert announced_devices(published) == ['campus/building/rtu2']
+
+
+def test_batch_announcements():
+    now = utils.get_aware_utc_now()
+    agent, published = build_agent(FakeConfigStore(),
+                                   batch_announcements=True)
+    agent._load_schedule(60)
+    manager = agent._schedule_manager
+    request(manager, 'Agent1', 'Task1', 'campus/building/rtu1', now, hours=0)
+    request(manager, 'Agent2', 'Task2', 'campus/building/rtu2', now, hours=0)
+    del published[:]
+
+    agent._update_schedule_state(now + timedelta(minutes=1))
+    assert len(published) == 1
+    args, kwargs = published[0]
+    assert args == ('pubsub', topics.ACTUATOR_SCHEDULE_STATES())
+    message = kwargs['message']
+    assert sorted(message) == ['campus/building/rtu1', 'campus/building/rtu2']
+    assert message['campus/building/rtu2']['requesterID'] == 'Agent2'
+    assert message['campus/building/rtu2']['taskID'] == 'Task2'
+    assert message['campus/building/rtu2']['window'] > 0
@@ -438,3 +438,90 @@ def test_conflict_override_success_running_agent2():
     assert data2 == {('Agent1', 'Task1')}
     assert info_string2 == ''
     assert event_time2 == parse('2013-11-27 12:26:00')
+
+
+def test_many_short_reservations():
+    print('Test conflicts among many short reservations', now)
+    sch_man = ScheduleManager(60, now=now)
+    start = parse('2013-11-27 12:00:00')
+    for i in range(500):
+        device = 'campus/building/charger{}'.format(i % 10)
+        slot_start = start + timedelta(minutes=5 * (i // 10))
+        result = sch_man.request_slots(
+            'Agent1', 'Task{}'.format(i),
+            ([device, slot_start, slot_start + timedelta(minutes=5)],),
+            PRIORITY_LOW, now)
+        assert result.success
+
+    # overlaps the end of Task11 and the start of Task21 only
+    result = sch_man.request_slots(
+        'Agent2', 'Conflict',
+        (['campus/building/charger1', parse('2013-11-27 12:09:00'),
+          parse('2013-11-27 12:11:00')],),
+        PRIORITY_LOW, now)
+    assert not result.success
+    assert result.data == {'Agent1': {
+        'Task11': [['campus/building/charger1', '2013-11-27 12:05:00',
+                    '2013-11-27 12:10:00']],
+        'Task21': [['campus/building/charger1', '2013-11-27 12:10:00',
+                    '2013-11-27 12:15:00']]}}
+
+    # touching slots do not conflict
+    result = sch_man.request_slots(
+        'Agent2', 'Touching',
+        (['campus/building/charger1', parse('2013-11-27 11:55:00'),
+          parse('2013-11-27 12:00:00')],),
+        PRIORITY_LOW, now)
+    assert result.success
+
+    result = sch_man.request_slots(
+        'Agent2', 'Preempt',
+        (['campus/building/charger1', parse('2013-11-27 12:09:00'),
+          parse('2013-11-27 12:11:00')],),
+        PRIORITY_HIGH, now)
+    assert result.success
+    assert result.data == {('Agent1', 'Task11'), ('Agent1', 'Task21')}
+
+
+def test_save_changes():
+    print('Test saving schedule changes', now)
+    saved = {}
+
+    def save(changed, removed):
+        saved.update(changed)
+        for task_id in removed:
+            del saved[task_id]
+
+    sch_man = ScheduleManager(60, now=now, save_changes_callback=save)
+    sch_man.request_slots('Agent1', 'Task1',
+                          (['campus/building/rtu1',
+                            parse('2013-11-27 12:00:00'),
+                            parse('2013-11-27 12:30:00')],),
+                          PRIORITY_LOW, now)
+    sch_man.request_slots('Agent1', 'Task2',
+                          (['campus/building/rtu2',
+                            parse('2013-11-27 12:00:00'),
+                            parse('2013-11-27 13:00:00')],),
+                          PRIORITY_LOW, now)
+    assert set(saved) == {'Task1', 'Task2'}
+    sch_man.cancel_task('Agent1', 'Task2', now)
+    assert set(saved) == {'Task1'}
+
+    reloaded = ScheduleManager(60, now=now, save_changes_callback=save,
+                               initial_task_strings=dict(saved))
+    assert set(reloaded.tasks) == {'Task1'}
+    result = reloaded.request_slots('Agent2', 'Task3',
+                                    (['campus/building/rtu1',
+                                      parse('2013-11-27 12:15:00'),
+                                      parse('2013-11-27 12:45:00')],),
+                                    PRIORITY_LOW, now)
+    assert not result.success
+    assert set(result.data['Agent1']) == {'Task1'}
+
+    # finished tasks are removed from the saved state
+    later = now + timedelta(hours=2)
+    reloaded.request_slots('Agent2', 'Task4',
+                           (['campus/building/rtu1', later,
+                             later + timedelta(minutes=30)],),
+                           PRIORITY_LOW, later)
+    assert set(saved) == {'Task4'}
@@ -72,6 +72,8 @@ from bacpypes.object import get_datatype
 
 from bacpypes.apdu import (ReadPropertyRequest,
                            WritePropertyRequest,
+                           WritePropertyMultipleRequest,
+                           WriteAccessSpecification,
                            Error,
                            AbortPDU,
                            RejectPDU,
@@ -90,7 +92,7 @@ from bacpypes.apdu import (ReadPropertyRequest,
 from bacpypes.primitivedata import (Null, Atomic, Enumerated, Integer,
                                     Unsigned, Real)
 from bacpypes.constructeddata import Array, Any, Choice
-from bacpypes.basetypes import ServicesSupported
+from bacpypes.basetypes import ServicesSupported, PropertyValue
 from bacpypes.task import TaskManager
 from gevent.event import AsyncResult
 
@@ -290,6 +292,14 @@ class BACnet_application(BIPSimpleApplication, RecurringTask):
             working_iocb.set(apdu)
             return
 
+        elif isinstance(working_iocb.ioRequest, WritePropertyMultipleRequest):
+            if isinstance(apdu, SimpleAckPDU):
+                working_iocb.set(apdu)
+            else:
+                working_iocb.set_exception(RuntimeError(
+                    "Error during device communication: " + str(apdu)))
+            return
+
         elif (isinstance(working_iocb.ioRequest, SubscribeCOVRequest) and
                 isinstance(apdu, SimpleAckPDU)):
             _log.debug("COV subscription established for {} on {}"
@@ -614,6 +624,31 @@ class BACnetProxyAgent(Agent):
             objectIdentifier=(object_type, instance_number),
             propertyIdentifier=property_name)
 
+        bac_value = self._get_bacnet_value(value, object_type, property_name,
+                                           index)
+
+        request.propertyValue = Any()
+        request.propertyValue.cast_in(bac_value)
+
+        request.pduDestination = Address(target_address)
+
+        # Optional index
+        if index is not None:
+            request.propertyArrayIndex = index
+
+        # Optional priority
+        if priority is not None:
+            request.priority = priority
+
+        iocb = self.iocb_class(request)
+        self.this_application.submit_request(iocb)
+        result = iocb.ioResult.get(10)
+        if isinstance(result, SimpleAckPDU):
+            return value
+        raise RuntimeError("Failed to set value: " + str(result))
+
+    def _get_bacnet_value(self, value, object_type, property_name,
+                          index=None):
         datatype = get_datatype(object_type, property_name)
         if (value is None or value == 'null'):
             bac_value = Null()
@@ -630,26 +665,49 @@ class BACnetProxyAgent(Agent):
         elif not isinstance(value, datatype):
             raise TypeError("invalid result datatype, expecting %s".format(
                 datatype.__name__,))
+        return bac_value
 
-        request.propertyValue = Any()
-        request.propertyValue.cast_in(bac_value)
-
+    @RPC.export
+    def write_properties(self, target_address, point_values):
+        """Write to several properties with a single WritePropertyMultiple
+        request.
+
+        :param target_address: Address of the device.
+        :param point_values: List of [object_type, instance_number,
+            property_name, priority, index, value] lists.
+        """
+        _log.debug("Writing {count} properties on {target}".format(
+            count=len(point_values), target=target_address))
+
+        object_properties = defaultdict(list)
+        for (object_type, instance_number, property_name, priority,
+             index, value) in point_values:
+            property_value = PropertyValue(propertyIdentifier=property_name)
+            property_value.value = Any()
+            property_value.value.cast_in(self._get_bacnet_value(
+                value, object_type, property_name, index))
+            if index is not None:
+                property_value.propertyArrayIndex = index
+            if priority is not None:
+                property_value.priority = priority
+            object_properties[object_type, instance_number].append(
+                property_value)
+
+        write_access_specs = [
+            WriteAccessSpecification(objectIdentifier=object_id,
+                                     listOfProperties=properties)
+            for object_id, properties in object_properties.iteritems()]
+
+        request = WritePropertyMultipleRequest(
+            listOfwriteAccessSpecs=write_access_specs)
         request.pduDestination = Address(target_address)
 
-        # Optional index
-        if index is not None:
-            request.propertyArrayIndex = index
-
-        # Optional priority
-        if priority is not None:
-            request.priority = priority
-
         iocb = self.iocb_class(request)
         self.this_application.submit_request(iocb)
         result = iocb.ioResult.get(10)
         if isinstance(result, SimpleAckPDU):
-            return value
-        raise RuntimeError("Failed to set value: " + str(result))
+            return [value for _, _, _, _, _, value in point_values]
+        raise RuntimeError("Failed to set values: " + str(result))
 
     def read_using_single_request(self, target_address, point_map):
         results = {}
@@ -61,7 +61,8 @@ from requests.exceptions import ConnectionError
 from influxdb.exceptions import InfluxDBClientError
 
 from volttron.platform.agent import utils
-from volttron.platform.agent.base_historian import BaseHistorian
+from volttron.platform.agent.base_historian import (BaseHistorian,
+                                                    TopicRegistry)
 from volttron.platform.dbutils import influxdbutils
 from volttron.utils.docs import doc_inherit
 
@@ -143,9 +144,9 @@ class InfluxdbHistorian(BaseHistorian):
 
         self.update_default_config(config)
 
-        # meta_dicts to keep track of meta dictionary for all topics.
-        self._meta_dicts = {}
-        self._topic_id_map = {}
+        # keeps track of topic names and meta dictionary for all topics.
+        # Topic ids are the lowercase topic names.
+        self._topic_registry = TopicRegistry()
 
     def configure(self, configuration):
         """
@@ -234,6 +235,8 @@ class InfluxdbHistorian(BaseHistorian):
         _log.debug("publish_to_historian number of items: {}".format(
             len(to_publish_list)))
 
+        # topic_id: (topic, time) of topics whose meta row must be written
+        meta_updates = {}
         try:
             for stored_index, row in enumerate(to_publish_list):
                 ts = utils.format_timestamp(row['timestamp'])
@@ -255,38 +258,44 @@ class InfluxdbHistorian(BaseHistorian):
                                  "value={} is type {}".format(value_type, value, type(value)))
 
                 topic_id = topic.lower()
+                db_topic_name = self._topic_registry.get_name(topic)
 
                 # If the topic is not in the list
-                if topic_id not in self._topic_id_map:
-                    self._topic_id_map[topic_id] = topic
-                    self._meta_dicts[topic_id] = {}
+                if db_topic_name is None:
+                    self._topic_registry.add(topic, topic_id)
 
                 # If topic's metadata changes, update its metadata.
-                if topic_id in self._topic_id_map and meta != self._meta_dicts[topic_id]:
-
+                if self._topic_registry.update_meta(topic_id, meta):
                     _log.info("Updating meta for topic {} at {}".format(topic_id, ts))
-                    self._meta_dicts[topic_id] = meta
-
-                    # Insert the meta into the database
-                    influxdbutils.insert_meta(self._client, topic_id, topic, meta, ts)
+                    meta_updates[topic_id] = (topic, ts)
                 # Else if topic name in database changes, update.
-                elif topic_id in self._topic_id_map and self._topic_id_map[topic_id] != topic:
+                elif db_topic_name is not None and db_topic_name != topic:
                     _log.info("Updating actual topic name {} in database for topic id {}".format(topic, topic_id))
-                    self._topic_id_map[topic_id] = topic
-
-                    # Update topic name in the database
-                    influxdbutils.insert_meta(self._client, topic_id, topic, meta, ts)
+                    self._topic_registry.add(topic, topic_id)
+                    meta_updates[topic_id] = (topic, ts)
 
                 # Insert data point
                 influxdbutils.insert_data_point(self._client, ts, topic_id, source, value, value_string)
 
+            # Insert changed meta and topic names into the database
+            self._topic_registry.pop_pending_meta()
+            if meta_updates:
+                influxdbutils.insert_meta_many(
+                    self._client,
+                    [(topic_id, topic, self._topic_registry.get_meta(topic_id), ts)
+                     for topic_id, (topic, ts) in meta_updates.iteritems()])
+
             # After all data points are published
             self.report_all_handled()
             _log.info("Store ALL data in to_publish_list to InfluxDB client")
 
         except ConnectionError, err:
+            self._topic_registry.discard_pending_meta(
+                [(topic_id, None) for topic_id in meta_updates])
             raise err
         except InfluxDBClientError, err:
+            self._topic_registry.discard_pending_meta(
+                [(topic_id, None) for topic_id in meta_updates])
             _log.error("Stored [:{}] data in to_publish_list to InfluxDB client".format(stored_index-1))
             self.report_handled(to_publish_list[:stored_index-1])
             raise err
@@ -294,7 +303,7 @@ class InfluxdbHistorian(BaseHistorian):
     @doc_inherit
     def query_topic_list(self):
         _log.debug("Querying topic list")
-        return self._topic_id_map.values()
+        return self._topic_registry.topic_names()
 
     @doc_inherit
     def query_historian(self, topic, start=None, end=None, agg_type=None,
@@ -325,7 +334,7 @@ class InfluxdbHistorian(BaseHistorian):
                 values = {}
                 for topic_name in topic:
                     topic_id = topic_name.lower()
-                    if topic_id in self._topic_id_map:
+                    if self._topic_registry.get_id(topic_name) is not None:
                         value = influxdbutils.get_topic_values(self._client, topic_id, start, end,
                                                                agg_type, agg_period, skip, count, order,
                                                                self._use_calendar_time_periods)
@@ -359,16 +368,16 @@ class InfluxdbHistorian(BaseHistorian):
     def query_topics_metadata(self, topics):
         meta = {}
         if isinstance(topics, str):
-            topic_id = topics.lower()
-            if topic_id in self._topic_id_map:
-                meta = {topics: self._meta_dicts[topic_id]}
+            topic_id = self._topic_registry.get_id(topics)
+            if topic_id is not None:
+                meta = {topics: self._topic_registry.get_meta(topic_id)}
             else:
                 _log.warning("Topic {} doesn't exist".format(topics))
         elif isinstance(topics, list):
             for topic in topics:
-                topic_id = topic.lower()
-                if topic_id in self._topic_id_map:
-                    meta[topic] = self._meta_dicts[topic_id]
+                topic_id = self._topic_registry.get_id(topic)
+                if topic_id is not None:
+                    meta[topic] = self._topic_registry.get_meta(topic_id)
                 else:
                     _log.warning("Topic {} doesn't exist".format(topic))
         return meta
@@ -380,9 +389,11 @@ class InfluxdbHistorian(BaseHistorian):
             raise InfluxDBClientError("Cannot connect to InfluxDB client")
 
         # Get meta_dicts for all topics if they are already stored
-        self._topic_id_map, self._meta_dicts = influxdbutils.get_all_topic_id_and_meta(self._client)
-        _log.info("_meta_dicts is {}".format(self._meta_dicts))
-        _log.info("_topic_id_map is {}".format(self._topic_id_map))
+        topic_id_map, meta_dicts = influxdbutils.get_all_topic_id_and_meta(self._client)
+        _log.info("_meta_dicts is {}".format(meta_dicts))
+        _log.info("_topic_id_map is {}".format(topic_id_map))
+        self._topic_registry.load({topic_id: topic_id for topic_id in topic_id_map},
+                                  topic_id_map, meta_dicts)
 
     @doc_inherit
     def record_table_definitions(self, meta_table_name):
@@ -61,6 +61,15 @@ MarketServiceAgent Configuration
     "verbose_logging"
         If True this enables verbose logging.  If False, there is little or no logging.
         Defaults to True.
+    "clearing_processes"
+        Number of processes used to clear markets. When greater than 0 markets that receive
+        all of their offers at about the same time are cleared in parallel and a summary of each
+        batch is published to market/clearing_report. Defaults to 0, which clears each market
+        in the agent as soon as its last offer arrives.
+    "clearing_deadline"
+        The time in seconds a batch of markets may take to clear when using clearing processes.
+        Markets not cleared in time fail with a 'clearing deadline missed' error, and the
+        clearing processes are restarted so they do not delay the next batch. Defaults to 60.
 
 
 Sample configuration file
@@ -72,14 +81,22 @@ Sample configuration file
         "market_period": 300,
         "reservation_delay": 0,
         "offer_delay": 120,
-        "verbose_logging": True
+        "verbose_logging": True,
+        "clearing_processes": 4,
+        "clearing_deadline": 60
     }
 
+The clearing report message is a list of the time of the report, a dictionary of market names
+to the cleared [quantity, price], the time taken to clear the batch, a dictionary of market names
+to the time taken to settle each market and a list of the markets that missed the deadline.
+
 """
 
 __docformat__ = 'reStructuredText'
 
+import functools
 import logging
+import multiprocessing
 import sys
 
 from transitions import Machine
@@ -126,8 +143,11 @@ def market_service_agent(config_path, **kwargs):
     reservation_delay = int(config.get('reservation_delay', 0))
     offer_delay = int(config.get('offer_delay', 120))
     verbose_logging = int(config.get('verbose_logging', True))
+    clearing_processes = int(config.get('clearing_processes', 0))
+    clearing_deadline = float(config.get('clearing_deadline', 60))
 
-    return MarketServiceAgent(market_period, reservation_delay, offer_delay, verbose_logging, **kwargs)
+    return MarketServiceAgent(market_period, reservation_delay, offer_delay, verbose_logging,
+                              clearing_processes, clearing_deadline, **kwargs)
 
 
 class MarketServiceAgent(Agent):
@@ -140,7 +160,8 @@ class MarketServiceAgent(Agent):
         {'trigger': 'start_reservations', 'source': NO_MARKETS, 'dest': COLLECT_RESERVATIONS},
     ]
 
-    def __init__(self, market_period=300, reservation_delay=0, offer_delay=120, verbose_logging = True, **kwargs):
+    def __init__(self, market_period=300, reservation_delay=0, offer_delay=120, verbose_logging = True,
+                 clearing_processes=0, clearing_deadline=60, **kwargs):
         super(MarketServiceAgent, self).__init__(**kwargs)
 
         _log.debug("vip_identity: {}".format(self.core.identity))
@@ -148,18 +169,34 @@ class MarketServiceAgent(Agent):
         _log.debug("reservation_delay: {}".format(reservation_delay))
         _log.debug("offer_delay: {}".format(offer_delay))
         _log.debug("verbose_logging: {}".format(verbose_logging))
+        _log.debug("clearing_processes: {}".format(clearing_processes))
+        _log.debug("clearing_deadline: {}".format(clearing_deadline))
 
         self.state_machine = Machine(model=self, states=MarketServiceAgent.states,
                                      transitions= MarketServiceAgent.transitions, initial=INITIAL_WAIT)
         self.market_list = None
         self.verbose_logging = verbose_logging
+        self.clearing_processes = clearing_processes
+        self.clearing_deadline = clearing_deadline
         self.director = Director(market_period, reservation_delay, offer_delay)
 
     @Core.receiver("onstart")
     def onstart(self, sender, **kwargs):
-        self.market_list = MarketList(self.vip.pubsub.publish, self.verbose_logging)
+        clearing_pool = None
+        make_clearing_pool = None
+        if self.clearing_processes > 0:
+            make_clearing_pool = functools.partial(multiprocessing.Pool, self.clearing_processes)
+            clearing_pool = make_clearing_pool()
+        self.market_list = MarketList(self.vip.pubsub.publish, self.verbose_logging,
+                                      clearing_pool, self.clearing_deadline, make_clearing_pool)
         self.director.start(self)
 
+    @Core.receiver("onstop")
+    def onstop(self, sender, **kwargs):
+        if self.market_list is not None and self.market_list.clearing_pool is not None:
+            self.market_list.clearing_pool.terminate()
+            self.market_list.clearing_pool = None
+
     def send_collect_reservations_request(self, timestamp):
         _log.debug("send_collect_reservations_request at {}".format(timestamp))
         self.start_reservations()
@@ -100,12 +100,14 @@ class Market(object):
         {'trigger': 'receive_buy_offer', 'source': MARKET_DONE, 'dest': MARKET_DONE},
     ]
 
-    def __init__(self, market_name, participant, publish, verbose_logging = True):
+    def __init__(self, market_name, participant, publish, verbose_logging = True, market_done_callback = None):
         self.reservations = ReservationManager()
         self.offers = OfferManager()
         self.market_name = market_name
         self.publish = publish
         self.verbose_logging = verbose_logging
+        # When set the callback clears the market instead of clear_market.
+        self.market_done_callback = market_done_callback
         _log.debug("Initializing Market: {} {} verbose logging is {}.".format(self.market_name,
                    participant.buyer_seller, self.verbose_logging))
         self.state_machine = Machine(model=self, states=Market.states,
@@ -174,7 +176,10 @@ class Market(object):
                              message=[timestamp_string, self.market_name,
                                       participant.buyer_seller, aggregate_curve.tuppleize()])
             if self.is_market_done():
-                self.clear_market()
+                if self.market_done_callback is not None:
+                    self.market_done_callback(self)
+                else:
+                    self.clear_market()
         if self.verbose_logging:
             _log.debug("Make offer Market: {} {} exited in state {}".format(self.market_name,
                                                                              participant.buyer_seller,
@@ -186,24 +191,34 @@ class Market(object):
     def clear_market(self):
         price = None
         quantity = None
+        aux = {}
+        error_code, error_message = self.clearing_error()
+        if error_code is None:
+            quantity, price, aux = self.offers.settle()
+        self.publish_clearing(quantity, price, aux, error_code, error_message)
+
+    def clearing_error(self):
+        """
+        Returns the error code and message that prevent the market from
+        being settled or (None, None) if the market can be settled.
+        """
         error_code = None
         error_message = None
-        aux = {}
         if (self.state in [ACCEPT_ALL_OFFERS, ACCEPT_BUY_OFFERS, ACCEPT_SELL_OFFERS]):
             error_code = SHORT_OFFERS
             error_message = 'The market {} failed to recieve all the expected offers. The state is {}.'.format(self.market_name, self.state)
         elif (self.state != MARKET_DONE):
             error_code = BAD_STATE
             error_message = 'Programming error in Market class. State of {} and clear market signal arrived. This represents a logic error.'.format(self.state)
-        else:
-            if not self.has_market_formed():
-                error_code = NOT_FORMED
-                error_message = 'The market {} has not received a buy and a sell reservation.'.format(self.market_name)
-            else:
-                quantity, price, aux = self.offers.settle()
-                if price is None:
-                    error_code = NO_INTERSECT
-                    error_message = "Error: The supply and demand curves do not intersect. The market {} failed to clear.".format(self.market_name)
+        elif not self.has_market_formed():
+            error_code = NOT_FORMED
+            error_message = 'The market {} has not received a buy and a sell reservation.'.format(self.market_name)
+        return error_code, error_message
+
+    def publish_clearing(self, quantity, price, aux, error_code=None, error_message=None):
+        if error_code is None and price is None:
+            error_code = NO_INTERSECT
+            error_message = "Error: The supply and demand curves do not intersect. The market {} failed to clear.".format(self.market_name)
         _log.info("Clearing price for Market: {} Price: {} Qty: {}".format(self.market_name, price, quantity))
         timestamp = self._get_time()
         timestamp_string = utils.format_timestamp(timestamp)
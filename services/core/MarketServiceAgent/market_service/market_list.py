@@ -37,9 +37,15 @@
 # }}}
 
 import logging
+import time
+
+import gevent
 
 from volttron.platform.agent import utils
+from volttron.platform.agent.base_market_agent.error_codes import CLEARING_TIMEOUT, CLEARING_FAILED
+from volttron.platform.messaging.topics import MARKET_CLEARING_REPORT
 from market_service.market import Market
+from market_service.offer_manager import settle_offers
 
 _log = logging.getLogger(__name__)
 utils.setup_logging()
@@ -49,17 +55,27 @@ class NoSuchMarketError(StandardError):
     pass
 
 class MarketList(object):
-    def __init__(self, publish = None, verbose_logging = True):
+    def __init__(self, publish = None, verbose_logging = True, clearing_pool = None, clearing_deadline = 60,
+                 make_clearing_pool = None):
         self.markets = {}
         self.publish = publish
         self.verbose_logging = verbose_logging
+        # When a process pool is given markets are settled in it in batches.
+        self.clearing_pool = clearing_pool
+        self.clearing_deadline = clearing_deadline
+        # Creates a pool to replace one whose workers are still busy with
+        # markets that missed the deadline.
+        self.make_clearing_pool = make_clearing_pool
+        self._pending_markets = []
+        self._clearing = None
 
     def make_reservation(self, market_name, participant):
         if self.has_market(market_name):
             market = self.markets[market_name]
             market.make_reservation(participant)
         else:
-            market = Market(market_name, participant, self.publish, self.verbose_logging)
+            market_done_callback = self._market_done if self.clearing_pool is not None else None
+            market = Market(market_name, participant, self.publish, self.verbose_logging, market_done_callback)
             self.markets[market_name] = market
 
     def make_offer(self, market_name, participant, curve):
@@ -98,6 +114,80 @@ class MarketList(object):
                if not market.is_market_done():
                    market.clear_market()
 
+    def _market_done(self, market):
+        # Markets finishing in the same pass of the event loop are
+        # cleared together.
+        self._pending_markets.append(market)
+        if self._clearing is None:
+            self._clearing = gevent.spawn(self._clear_pending_markets)
+
+    def _clear_pending_markets(self):
+        try:
+            while self._pending_markets:
+                markets, self._pending_markets = self._pending_markets, []
+                self.clear_markets(markets)
+        finally:
+            self._clearing = None
+
+    def clear_markets(self, markets):
+        """
+        Settle markets in the clearing pool and publish the results together.
+        Markets that are not settled before the clearing deadline are
+        published as failed to clear. Their jobs would keep the workers
+        busy and delay the next batch, so the pool is then replaced if
+        make_clearing_pool was given.
+        """
+        start = time.time()
+        deadline = start + self.clearing_deadline
+        jobs = []
+        for market in markets:
+            error_code, _ = market.clearing_error()
+            if error_code is None:
+                job = self.clearing_pool.apply_async(settle_offers, market.offers.settle_args())
+            else:
+                job = None
+            jobs.append((market, job))
+
+        while time.time() < deadline and not all(job is None or job.ready() for _, job in jobs):
+            gevent.sleep(0.01)
+
+        results = {}
+        clearing_times = {}
+        missed_markets = []
+        for market, job in jobs:
+            if job is None:
+                market.clear_market()
+            elif not job.ready():
+                missed_markets.append(market.market_name)
+                market.publish_clearing(None, None, {}, CLEARING_TIMEOUT,
+                                        'The market {} was not cleared within {} seconds.'.format(
+                                            market.market_name, self.clearing_deadline))
+            elif not job.successful():
+                try:
+                    job.get()
+                except Exception as e:
+                    _log.exception("Error clearing market {}".format(market.market_name))
+                    market.publish_clearing(None, None, {}, CLEARING_FAILED,
+                                            'The market {} failed to clear: {}'.format(market.market_name, e))
+            else:
+                quantity, price, aux, clearing_times[market.market_name] = job.get()
+                results[market.market_name] = [quantity, price]
+                market.publish_clearing(quantity, price, aux)
+
+        if missed_markets and self.make_clearing_pool is not None:
+            _log.warning("Replacing the clearing pool after missing the deadline.")
+            self.clearing_pool.terminate()
+            self.clearing_pool = self.make_clearing_pool()
+
+        elapsed = time.time() - start
+        _log.info("Cleared {} markets in {:.3f} seconds, {} missed the deadline.".format(len(markets), elapsed,
+                                                                                         len(missed_markets)))
+        if self.publish is not None:
+            timestamp_string = utils.format_timestamp(utils.get_aware_utc_now())
+            self.publish(peer='pubsub',
+                         topic=MARKET_CLEARING_REPORT,
+                         message=[timestamp_string, results, elapsed, clearing_times, missed_markets])
+
     def market_count(self):
         return len(self.markets)
 
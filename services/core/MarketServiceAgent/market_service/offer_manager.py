@@ -37,6 +37,7 @@
 # }}}
 
 import logging
+import time
 
 from volttron.platform.agent import utils
 from volttron.platform.agent.base_market_agent.buy_sell import BUYER
@@ -46,6 +47,37 @@ from volttron.platform.agent.base_market_agent.poly_line_factory import PolyLine
 _log = logging.getLogger(__name__)
 utils.setup_logging()
 
+def settle_offers(buy_offers, sell_offers, increment):
+    """
+    Find the clearing quantity and price of a market from its offer curves.
+    This is a plain function so that it can be run in a clearing process.
+
+    :returns: quantity, price, aux and the time taken in seconds
+    """
+    start = time.time()
+    enough_buys = len(buy_offers) > 0
+    enough_sells = len(sell_offers) > 0
+    if enough_buys:
+        demand_curve = PolyLineFactory.combine(buy_offers, increment)
+    else:
+        _log.debug("There are no buy offers.")
+    if enough_sells:
+        supply_curve = PolyLineFactory.combine(sell_offers, increment)
+    else:
+        _log.debug("There are no sell offers.")
+
+    if enough_buys and enough_sells:
+        intersection = PolyLine.intersection(demand_curve, supply_curve)
+    else:
+        intersection = None, None, {}
+
+    quantity = intersection[0]
+    price = intersection[1]
+    aux = PolyLine.compare(demand_curve, supply_curve)
+
+    return quantity, price, aux, time.time() - start
+
+
 class OfferManager(object):
 
     def __init__(self):
@@ -71,28 +103,12 @@ class OfferManager(object):
         return curve
 
     def settle(self):
-        enough_buys = len(self._buy_offers) > 0
-        enough_sells = len(self._sell_offers) > 0
-        if enough_buys:
-            demand_curve = self._aggregate(self._buy_offers)
-        else:
-            _log.debug("There are no buy offers.")
-        if enough_sells:
-            supply_curve = self._aggregate(self._sell_offers)
-        else:
-            _log.debug("There are no sell offers.")
-
-        if enough_buys and enough_sells:
-            intersection = PolyLine.intersection(demand_curve, supply_curve)
-        else:
-            intersection = None, None, {}
-
-        quantity = intersection[0]
-        price = intersection[1]
-        aux = PolyLine.compare(demand_curve, supply_curve)
-
+        quantity, price, aux, _ = settle_offers(*self.settle_args())
         return quantity, price, aux
 
+    def settle_args(self):
+        return self._buy_offers, self._sell_offers, self.increment
+
     def buyer_count(self):
         return len(self._buy_offers)
 
@@ -59,12 +59,18 @@
 Pytest test cases for testing market service agent.
 """
 
+import multiprocessing
+import multiprocessing.pool
+
+import gevent
 import pytest
 
 try:
     from market_service.market_list import MarketList
     from market_service.market_participant import MarketParticipant
     from volttron.platform.agent.base_market_agent.buy_sell import BUYER, SELLER
+    from volttron.platform.agent.base_market_agent.poly_line_factory import PolyLineFactory
+    from volttron.platform.messaging.topics import MARKET_CLEAR, MARKET_CLEARING_REPORT
 except ImportError:
     pytest.skip("Market service requirements not installed.", allow_module_level=True)
 
@@ -147,3 +153,79 @@ def test_market_unformed_market_list():
     unformed_markets = market_list.unformed_market_list()
     assert len(unformed_markets) > 0
 
+
+@pytest.mark.market
+def test_market_list_clears_in_pool():
+    published = []
+
+    def publish(peer, topic, message):
+        published.append((topic, message))
+
+    pool = multiprocessing.Pool(2)
+    try:
+        market_list = MarketList(publish, False, pool, 10)
+        market_names = ['market{}'.format(i) for i in range(5)]
+        buyer = MarketParticipant(BUYER, 'buyer')
+        seller = MarketParticipant(SELLER, 'seller')
+        for market_name in market_names:
+            market_list.make_reservation(market_name, buyer)
+            market_list.make_reservation(market_name, seller)
+        market_list.collect_offers()
+        demand = PolyLineFactory.fromTupples([(0, 100), (100, 0)])
+        supply = PolyLineFactory.fromTupples([(0, 0), (100, 100)])
+        for market_name in market_names:
+            market_list.make_offer(market_name, buyer, demand)
+            market_list.make_offer(market_name, seller, supply)
+
+        gevent.sleep(0.01)
+        with gevent.Timeout(10):
+            while market_list._clearing is not None:
+                gevent.sleep(0.01)
+    finally:
+        pool.terminate()
+
+    cleared = [message for topic, message in published if topic == MARKET_CLEAR]
+    assert sorted(message[1] for message in cleared) == market_names
+    assert all(message[2:] == [pytest.approx(50), pytest.approx(50)] for message in cleared)
+    reports = [message for topic, message in published if topic == MARKET_CLEARING_REPORT]
+    assert len(reports) == 1
+    _, results, _, clearing_times, missed_markets = reports[0]
+    assert sorted(results) == sorted(clearing_times) == market_names
+    assert missed_markets == []
+
+
+def test_market_list_replaces_pool_after_missed_deadline():
+    published = []
+
+    def publish(peer, topic, message):
+        published.append((topic, message))
+
+    pools = [multiprocessing.Pool(1)]
+
+    def make_clearing_pool():
+        pools.append(multiprocessing.Pool(1))
+        return pools[-1]
+
+    try:
+        # A deadline that has already passed when the batch is cleared.
+        market_list = MarketList(publish, False, pools[0], -1, make_clearing_pool)
+        buyer = MarketParticipant(BUYER, 'buyer')
+        seller = MarketParticipant(SELLER, 'seller')
+        market_list.make_reservation('market1', buyer)
+        market_list.make_reservation('market1', seller)
+        market_list.collect_offers()
+        market_list.make_offer('market1', buyer, PolyLineFactory.fromTupples([(0, 100), (100, 0)]))
+        market_list.make_offer('market1', seller, PolyLineFactory.fromTupples([(0, 0), (100, 100)]))
+
+        with gevent.Timeout(10):
+            while market_list._clearing is not None or len(published) < 2:
+                gevent.sleep(0.01)
+        assert len(pools) == 2
+        assert market_list.clearing_pool is pools[1]
+        assert pools[0]._state == multiprocessing.pool.TERMINATE
+    finally:
+        for pool in pools:
+            pool.terminate()
+
+    reports = [message for topic, message in published if topic == MARKET_CLEARING_REPORT]
+    assert reports[0][4] == ['market1']
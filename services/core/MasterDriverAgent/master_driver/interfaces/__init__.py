@@ -408,6 +408,10 @@ class BaseInterface(object):
         """
         Read multiple points from the interface.
 
+        The default implementation calls :py:meth:`get_point` for each
+        point. Interfaces whose protocol can read several points in one
+        operation should override this method.
+
         :param path: Device path
         :param point_names: Names of points to retrieve
         :param kwargs: Any interface specific parameters
@@ -435,6 +439,10 @@ class BaseInterface(object):
         """
         Set multiple points on the interface.
 
+        The default implementation calls :py:meth:`set_point` for each
+        point. Interfaces whose protocol can write several points in one
+        operation should override this method.
+
         :param path: Device path
         :param point_names_values: Point names and values to be set to.
         :param kwargs: Any interface specific parameters
@@ -97,6 +97,7 @@ class Interface(BaseInterface):
 
         self.max_per_request = config_dict.get("max_per_request")
         self.use_read_multiple = config_dict.get("use_read_multiple", True)
+        self.use_write_multiple = config_dict.get("use_write_multiple", False)
         self.timeout = float(config_dict.get("timeout", 30.0))
 
         self.ping_retry_interval = timedelta(seconds=config_dict.get("ping_retry_interval", 5.0))
@@ -164,6 +165,77 @@ class Interface(BaseInterface):
         result = self.vip.rpc.call(self.proxy_address, 'write_property', *args).get(timeout=self.timeout)
         return result
 
+    def get_multiple_points(self, path, point_names, **kwargs):
+        if kwargs.get("get_priority_array"):
+            return super(Interface, self).get_multiple_points(path, point_names, **kwargs)
+
+        results = {}
+        errors = {}
+        point_map = {}
+        for point_name in point_names:
+            try:
+                register = self.get_register_by_name(point_name)
+            except Exception as e:
+                errors[path + '/' + point_name] = repr(e)
+                continue
+            point_map[point_name] = [register.object_type,
+                                     register.instance_number,
+                                     register.property,
+                                     register.index]
+
+        if point_map:
+            try:
+                values = self.vip.rpc.call(self.proxy_address, 'read_properties',
+                                           self.target_address, point_map,
+                                           self.max_per_request, self.use_read_multiple).get(timeout=self.timeout)
+            except Exception as e:
+                for point_name in point_map:
+                    errors[path + '/' + point_name] = repr(e)
+            else:
+                for point_name in point_map:
+                    return_key = path + '/' + point_name
+                    if point_name in values:
+                        results[return_key] = values[point_name]
+                    else:
+                        errors[return_key] = repr(IOError("No value returned for point " + point_name))
+
+        return results, errors
+
+    def set_multiple_points(self, path, point_names_values, priority=None, **kwargs):
+        if not self.use_write_multiple:
+            return super(Interface, self).set_multiple_points(path, point_names_values,
+                                                              priority=priority, **kwargs)
+
+        results = {}
+        point_values = []
+        for point_name, value in point_names_values:
+            try:
+                register = self.get_register_by_name(point_name)
+                if register.read_only:
+                    raise IOError("Trying to write to a point configured read only: "+point_name)
+                if priority is not None and priority < self.min_priority:
+                    raise IOError("Trying to write with a priority lower than the minimum of "+str(self.min_priority))
+            except Exception as e:
+                results[path + '/' + point_name] = repr(e)
+                continue
+            point_values.append([register.object_type,
+                                 register.instance_number,
+                                 register.property,
+                                 priority if priority is not None else register.priority,
+                                 register.index,
+                                 value])
+
+        if point_values:
+            try:
+                self.vip.rpc.call(self.proxy_address, 'write_properties',
+                                  self.target_address, point_values).get(timeout=self.timeout)
+            except Exception as e:
+                # WritePropertyMultiple is all or nothing.
+                for point_name, value in point_names_values:
+                    results.setdefault(path + '/' + point_name, repr(e))
+
+        return results
+
     def scrape_all(self):
         #TODO: support reading from an array.
         point_map = {}
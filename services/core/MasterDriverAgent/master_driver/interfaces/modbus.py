@@ -275,6 +275,37 @@ class Interface(BasicRevert, BaseInterface):
                 IOError("Error encountered trying to write to point {}: {}".format(point_name, ex))
         return result
     
+    def get_multiple_points(self, path, point_names, **kwargs):
+        results = {}
+        errors = {}
+        # Read all of the points over one connection.
+        with modbus_client(self.ip_address, self.port) as client:
+            for point_name in point_names:
+                return_key = path + '/' + point_name
+                try:
+                    register = self.get_register_by_name(point_name)
+                    results[return_key] = register.get_state(client)
+                except (ConnectionException, ModbusIOException, ModbusInterfaceException):
+                    results[return_key] = None
+                except Exception as e:
+                    errors[return_key] = repr(e)
+        return results, errors
+
+    def set_multiple_points(self, path, point_names_values, **kwargs):
+        results = {}
+        # Write all of the points over one connection.
+        with modbus_client(self.ip_address, self.port) as client:
+            for point_name, value in point_names_values:
+                try:
+                    register = self.get_register_by_name(point_name)
+                    if register.read_only:
+                        raise IOError("Trying to write to a point configured read only: "+point_name)
+                    register.set_state(client, value)
+                    self._tracker.mark_dirty_point(point_name)
+                except Exception as e:
+                    results[path + '/' + point_name] = repr(e)
+        return results
+
     def scrape_byte_registers(self, client, read_only):
         result_dict = {}
         register_ranges = self.register_ranges[('byte', read_only)]
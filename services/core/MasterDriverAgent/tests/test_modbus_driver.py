@@ -212,4 +212,16 @@ class TestModbusDriver:
         for key in registers_dict.keys():
             self.set_point(agent, key, registers_dict[key])
             assert self.get_point(agent, key) == registers_dict[key]
-        assert self.scrape_all(agent) == registers_dict
\ No newline at end of file
+        assert self.scrape_all(agent) == registers_dict
+
+    def test_multiple_points(self, agent):
+        values = dict((key, value) for key, value in registers_dict.items()
+                      if key.startswith('Big'))
+        errors = agent.vip.rpc.call('platform.driver', 'set_multiple_points', 'modbus',
+                                    values.items()).get(timeout=10)
+        assert errors == {}
+
+        results, errors = agent.vip.rpc.call('platform.driver', 'get_multiple_points', 'modbus',
+                                             values.keys() + ['Missing']).get(timeout=10)
+        assert dict((key.rsplit('/', 1)[1], value) for key, value in results.items()) == values
+        assert [key.rsplit('/', 1)[1] for key in errors] == ['Missing']
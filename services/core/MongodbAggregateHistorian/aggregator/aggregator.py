@@ -211,6 +211,59 @@ class MongodbAggregateHistorian(AggregateHistorian):
              'topics_list': topic_ids},
             upsert=True)
 
+    def collect_aggregates(self, topic_ids, agg_types, start_time, end_time):
+
+        db = self.dbclient.get_default_database()
+        _log.debug("collect_aggregates: params {}, {}, {}, {}".format(
+            topic_ids, agg_types, start_time, end_time))
+        # map back to the ids that were passed in, which might be object
+        # ids as strings
+        id_map = {ObjectId(x) if not isinstance(x, ObjectId) else x: x
+                  for x in topic_ids}
+
+        match_conditions = [{"topic_id": {"$in": id_map.keys()}}]
+        if start_time is not None:
+            match_conditions.append({"ts": {"$gte": start_time}})
+        if end_time is not None:
+            match_conditions.append({"ts": {"$lt": end_time}})
+
+        match = {"$match": {"$and": match_conditions}}
+        group = {"_id": "$topic_id", "count": {"$sum": 1}}
+        for agg_type in agg_types:
+            group[agg_type.lower()] = {"$" + agg_type: "$value"}
+
+        pipeline = [match, {"$group": group}]
+
+        _log.debug("collect_aggregates: pipeline: {}".format(pipeline))
+        results = {}
+        for row in db[self._data_collection].aggregate(pipeline):
+            topic_id = id_map[row.pop('_id')]
+            results[topic_id] = row
+        return results
+
+    def insert_aggregates(self, agg_type, period, end_time, rows):
+
+        db = self.dbclient.get_default_database()
+        table_name = agg_type + '_' + period
+        requests = [pymongo.ReplaceOne(
+            {'ts': end_time, 'topic_id': topic_id},
+            {'ts': end_time, 'topic_id': topic_id, 'value': value,
+             'topics_list': topic_ids},
+            upsert=True) for topic_id, value, topic_ids in rows]
+        if requests:
+            db[table_name].bulk_write(requests, ordered=False)
+
+    def get_last_aggregate_time(self, agg_type, period, agg_topic_ids):
+
+        db = self.dbclient.get_default_database()
+        table_name = agg_type + '_' + period
+        cursor = db[table_name].find(
+            {'topic_id': {'$in': agg_topic_ids}}).sort(
+            'ts', pymongo.DESCENDING).limit(1)
+        for row in cursor:
+            return row['ts']
+        return None
+
 
 def main(argv=sys.argv):
     """Main method called by the eggsecutable."""
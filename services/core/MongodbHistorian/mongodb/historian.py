@@ -57,7 +57,8 @@ from pymongo import UpdateOne
 from pymongo.errors import BulkWriteError
 
 from volttron.platform.agent import utils
-from volttron.platform.agent.base_historian import BaseHistorian
+from volttron.platform.agent.base_historian import (BaseHistorian,
+                                                    TopicRegistry)
 from volttron.platform.agent.utils import get_aware_utc_now
 from volttron.platform.dbutils import mongoutils
 from volttron.platform.vip.agent import Core
@@ -126,8 +127,8 @@ class MongodbHistorian(BaseHistorian):
         This connection is thread-safe and therefore we create it before
         starting the main loop of the agent.
 
-        In addition, the topic_map and topic_meta are used for caching meta
-        data and topics respectively.
+        In addition, the topic_registry is used for caching topics and their
+        meta data.
 
         :param connection: dictionary that contains necessary information to
         establish a connection to the mongo database. The dictionary should 
@@ -164,9 +165,7 @@ class MongodbHistorian(BaseHistorian):
         self._connection_params = connection['params']
         self._client = None
 
-        self._topic_id_map = {}
-        self._topic_name_map = {}
-        self._topic_meta = {}
+        self._topic_registry = TopicRegistry()
         self._agg_topic_id_map = {}
         _log.debug("version number is {}".format(__version__))
         self.version_nums = __version__.split(".")
@@ -458,33 +457,25 @@ class MongodbHistorian(BaseHistorian):
 
             # look at the topics that are stored in the database already
             # to see if this topic has a value
-            topic_lower = topic.lower()
-            topic_id = self._topic_id_map.get(topic_lower, None)
-            db_topic_name = self._topic_name_map.get(topic_lower, None)
+            topic_id = self._topic_registry.get_id(topic)
 
             if topic_id is None:
                 row = db[self._topic_collection].insert_one(
                     {'topic_name': topic})
                 topic_id = row.inserted_id
-                self._topic_id_map[topic_lower] = topic_id
-                self._topic_name_map[topic_lower] = topic
+                self._topic_registry.add(topic, topic_id)
 
-            elif db_topic_name != topic:
+            elif self._topic_registry.get_name(topic) != topic:
                 _log.debug('Updating topic: {}'.format(topic))
 
                 result = db[self._topic_collection].update_one(
                     {'_id': ObjectId(topic_id)},
                     {'$set': {'topic_name': topic}})
                 assert result.matched_count
-                self._topic_name_map[topic_lower] = topic
+                self._topic_registry.add(topic, topic_id)
 
-            old_meta = self._topic_meta.get(topic_id, {})
-            if set(old_meta.items()) != set(meta.items()):
-                _log.debug(
-                    'Updating meta for topic: {} {}'.format(topic, meta))
-                db[self._meta_collection].insert_one(
-                    {'topic_id': topic_id, 'meta': meta})
-                self._topic_meta[topic_id] = meta
+            # changed metadata is written in one batch below
+            self._topic_registry.update_meta(topic_id, meta)
 
             if isinstance(value, dict):
                 # Do this so that we need not worry about dict keys with $ or .
@@ -499,6 +490,16 @@ class MongodbHistorian(BaseHistorian):
                     {'ts': ts, 'topic_id': topic_id, 'source': source,
                      'value': value})
 
+        pending_meta = self._topic_registry.pop_pending_meta()
+        if pending_meta:
+            _log.debug('Updating meta for {} topics'.format(len(pending_meta)))
+            try:
+                db[self._meta_collection].insert_many(
+                    [{'topic_id': topic_id, 'meta': meta}
+                     for topic_id, meta in pending_meta])
+            except Exception:
+                self._topic_registry.discard_pending_meta(pending_meta)
+                raise
 
         try:
             result = bulk_publish.execute()
@@ -563,7 +564,7 @@ class MongodbHistorian(BaseHistorian):
         id_name_map = {}
         for topic in topics_list:
             # find topic if based on topic table entry
-            topic_id = self._topic_id_map.get(topic.lower(), None)
+            topic_id = self._topic_registry.get_id(topic)
 
             if agg_type:
                 agg_type = agg_type.lower()
@@ -899,18 +900,18 @@ class MongodbHistorian(BaseHistorian):
                 if agg_type:
                     # if aggregation is on single topic find the topic id
                     # in the topics table.
-                    # if topic name does not have entry in topic_id_map
+                    # if topic name does not have entry in topic_registry
                     # it is a user configured aggregation_topic_name
                     # which denotes aggregation across multiple points
                     _log.debug("Single topic aggregate query. Try to get "
                                "metadata")
-                    meta_tid = self._topic_id_map.get(topic.lower(), None)
+                    meta_tid = self._topic_registry.get_id(topic)
                 else:
                     # this is a query on raw data, get metadata for
-                    # topic from topic_meta map
+                    # topic from topic_registry
                     meta_tid = topic_ids[0]
             if values:
-                metadata = self._topic_meta.get(meta_tid, {})
+                metadata = self._topic_registry.get_meta(meta_tid) or {}
                 results = {'values': values, 'metadata': metadata}
             else:
                 results = dict()
@@ -946,14 +947,14 @@ class MongodbHistorian(BaseHistorian):
 
         meta = {}
         if isinstance(topics, str):
-            topic_id = self._topic_id_map.get(topics.lower())
+            topic_id = self._topic_registry.get_id(topics)
             if topic_id:
-                meta = {topics: self._topic_meta.get(topic_id)}
+                meta = {topics: self._topic_registry.get_meta(topic_id)}
         elif isinstance(topics, list):
             for topic in topics:
-                topic_id = self._topic_id_map.get(topic.lower())
+                topic_id = self._topic_registry.get_id(topic)
                 if topic_id:
-                    meta[topic] = self._topic_meta.get(topic_id)
+                    meta[topic] = self._topic_registry.get_meta(topic_id)
         return meta
 
     def query_aggregate_topics(self):
@@ -971,20 +972,19 @@ class MongodbHistorian(BaseHistorian):
         # See https://github.com/VOLTTRON/volttron/issues/643
         for num in xrange(cursor.count()):
             document = cursor[num]
-            self._topic_id_map[document['topic_name'].lower()] = document[
-                '_id']
-            self._topic_name_map[document['topic_name'].lower()] = \
-                document['topic_name']
+            self._topic_registry.add(document['topic_name'], document['_id'])
 
     def _load_meta_map(self):
         _log.debug('loading meta map')
         db = self._client.get_default_database()
         cursor = db[self._meta_collection].find()
+        meta_map = {}
         # Hangs when using cursor as iterable.
         # See https://github.com/VOLTTRON/volttron/issues/643
         for num in xrange(cursor.count()):
             document = cursor[num]
-            self._topic_meta[document['topic_id']] = document['meta']
+            meta_map[document['topic_id']] = document['meta']
+        return meta_map
 
     @doc_inherit
     def historian_setup(self):
@@ -1031,10 +1031,10 @@ class MongodbHistorian(BaseHistorian):
             db[self._data_collection].create_index(
                 [('ts', pymongo.DESCENDING)], background=True)
 
-        self._topic_id_map, self._topic_name_map = \
-            mongoutils.get_topic_map(
-                self._client, self._topic_collection)
-        self._load_meta_map()
+        topic_id_map, topic_name_map = mongoutils.get_topic_map(
+            self._client, self._topic_collection)
+        self._topic_registry.load(topic_id_map, topic_name_map,
+                                  self._load_meta_map())
 
         if self._agg_topic_collection in db.collection_names():
             _log.debug("found agg_topics_collection ")
@@ -136,6 +136,24 @@ class SQLAggregateHistorian(AggregateHistorian):
                                              value,
                                              topic_ids)
 
+    def collect_aggregates(self, topic_ids, agg_types, start_time, end_time):
+        return self.dbfuncts_class.collect_aggregates(
+            topic_ids,
+            agg_types,
+            start_time,
+            end_time)
+
+    def insert_aggregates(self, agg_type, period, end_time, rows):
+        self.dbfuncts_class.insert_aggregates(agg_type,
+                                              period,
+                                              end_time,
+                                              rows)
+
+    def get_last_aggregate_time(self, agg_type, period, agg_topic_ids):
+        return self.dbfuncts_class.get_last_aggregate_time(agg_type,
+                                                           period,
+                                                           agg_topic_ids)
+
 
 def main(argv=sys.argv):
     """Main method called by the eggsecutable."""
@@ -42,7 +42,8 @@ import sys
 import threading
 
 from volttron.platform.agent import utils
-from volttron.platform.agent.base_historian import BaseHistorian
+from volttron.platform.agent.base_historian import (BaseHistorian,
+                                                    TopicRegistry)
 from volttron.platform.dbutils import sqlutils
 from volttron.utils.docs import doc_inherit
 
@@ -99,8 +100,8 @@ class SQLHistorian(BaseHistorian):
 
         The historian makes two connections to the data store.  Both of
         these connections are available across the main and processing
-        thread of the historian.  topic_map and topic_meta are used as
-        cache for the meta data and topic maps.
+        thread of the historian.  topic_registry is used as cache for the
+        meta data and topic maps.
 
         :param connection: dictionary that contains necessary information to
         establish a connection to the sql database. The dictionary should
@@ -125,9 +126,7 @@ class SQLHistorian(BaseHistorian):
         """
         self.connection = connection
         self.tables_def, self.table_names = self.parse_table_def(tables_def)
-        self.topic_id_map = {}
-        self.topic_name_map = {}
-        self.topic_meta = {}
+        self.topic_registry = TopicRegistry()
         self.agg_topic_id_map = {}
         database_type = self.connection['type']
         self.db_functs_class = sqlutils.get_dbfuncts_class(database_type)
@@ -164,43 +163,40 @@ class SQLHistorian(BaseHistorian):
         #    "publish_to_historian number of items: {} Thread: {}:{}".format(
         #        len(to_publish_list), threading.current_thread(), thread_name))
 
+        pending_meta = None
         try:
             real_published = []
+            registry = self.topic_registry
+            topic_ids = []
             for x in to_publish_list:
-                ts = x['timestamp']
                 topic = x['topic']
-                value = x['value']
-                meta = x['meta']
 
                 # look at the topics that are stored in the database
                 # already to see if this topic has a value
-                lowercase_name = topic.lower()
-                topic_id = self.topic_id_map.get(lowercase_name, None)
-                db_topic_name = self.topic_name_map.get(lowercase_name,
-                                                        None)
+                topic_id = registry.get_id(topic)
                 if topic_id is None:
                     # _log.debug('Inserting topic: {}'.format(topic))
                     # Insert topic name as is in db
                     topic_id = self.bg_thread_dbutils.insert_topic(topic)
-                    # user lower case topic name when storing in map
-                    # for case insensitive comparison
-                    self.topic_id_map[lowercase_name] = topic_id
-                    self.topic_name_map[lowercase_name] = topic
+                    registry.add(topic, topic_id)
                     # _log.debug('TopicId: {} => {}'.format(topic_id, topic))
-                elif db_topic_name != topic:
+                elif registry.get_name(topic) != topic:
                     # _log.debug('Updating topic: {}'.format(topic))
                     self.bg_thread_dbutils.update_topic(topic, topic_id)
-                    self.topic_name_map[lowercase_name] = topic
+                    registry.add(topic, topic_id)
 
-                old_meta = self.topic_meta.get(topic_id, {})
-                if set(old_meta.items()) != set(meta.items()):
-                    # _log.debug(
-                    #    'Updating meta for topic: {} {}'.format(topic,
-                    #                                            meta))
-                    self.bg_thread_dbutils.insert_meta(topic_id, meta)
-                    self.topic_meta[topic_id] = meta
+                registry.update_meta(topic_id, x['meta'])
+                topic_ids.append(topic_id)
+
+            # Changed metadata is written in one batch before the data, as
+            # the database driver may use it to decide how to store values.
+            pending_meta = registry.pop_pending_meta()
+            if pending_meta:
+                self.bg_thread_dbutils.insert_meta_many(pending_meta)
 
-                if self.bg_thread_dbutils.insert_data(ts, topic_id, value):
+            for x, topic_id in zip(to_publish_list, topic_ids):
+                if self.bg_thread_dbutils.insert_data(x['timestamp'], topic_id,
+                                                      x['value']):
                     # _log.debug('item was inserted')
                     real_published.append(x)
 
@@ -213,6 +209,7 @@ class SQLHistorian(BaseHistorian):
                     msg = 'commit error. rolling back {} values.'
                     _log.debug(msg.format(len(to_publish_list)))
                     self.bg_thread_dbutils.rollback()
+                    registry.discard_pending_meta(pending_meta)
             else:
                 _log.debug(
                     'Unable to publish {}'.format(len(to_publish_list)))
@@ -231,6 +228,7 @@ class SQLHistorian(BaseHistorian):
             # status = Status.from_json(self.vip.health.get_status())
             # self.vip.health.send_alert(alert_id, status)
             self.bg_thread_dbutils.rollback()
+            self.topic_registry.discard_pending_meta(pending_meta)
             # Raise to the platform so it is logged properly.
             raise
 
@@ -239,8 +237,9 @@ class SQLHistorian(BaseHistorian):
 
         _log.debug("query_topic_list Thread is: {}".format(
             threading.currentThread().getName()))
-        if len(self.topic_name_map) > 0:
-            return self.topic_name_map.values()
+        names = self.topic_registry.topic_names()
+        if len(names) > 0:
+            return names
         else:
             # No topics present.
             return []
@@ -253,14 +252,14 @@ class SQLHistorian(BaseHistorian):
     def query_topics_metadata(self, topics):
         meta = {}
         if isinstance(topics, str):
-            topic_id = self.topic_id_map.get(topics.lower())
+            topic_id = self.topic_registry.get_id(topics)
             if topic_id:
-                meta = {topics: self.topic_meta.get(topic_id)}
+                meta = {topics: self.topic_registry.get_meta(topic_id)}
         elif isinstance(topics, list):
             for topic in topics:
-                topic_id = self.topic_id_map.get(topic.lower())
+                topic_id = self.topic_registry.get_id(topic)
                 if topic_id:
-                    meta[topic] = self.topic_meta.get(topic_id)
+                    meta[topic] = self.topic_registry.get_meta(topic_id)
         return meta
 
     def query_aggregate_topics(self):
@@ -285,7 +284,7 @@ class SQLHistorian(BaseHistorian):
         id_name_map = {}
         for topic in topics_list:
             topic_lower = topic.lower()
-            topic_id = self.topic_id_map.get(topic_lower)
+            topic_id = self.topic_registry.get_id(topic_lower)
             if agg_type:
                 agg_type = agg_type.lower()
                 topic_id = self.agg_topic_id_map.get(
@@ -327,19 +326,19 @@ class SQLHistorian(BaseHistorian):
                     # if aggregation is on single topic find the topic id
                     # in the topics table that corresponds to agg_topic_id
                     # so that we can grab the correct metadata
-                    # if topic name does not have entry in topic_id_map
+                    # if topic name does not have entry in topic_registry
                     # it is a user configured aggregation_topic_name
                     # which denotes aggregation across multiple points
                     _log.debug("Single topic aggregate query. Try to get "
                                "metadata")
-                    meta_tid = self.topic_id_map.get(topic.lower(), None)
+                    meta_tid = self.topic_registry.get_id(topic)
                 else:
                     # this is a query on raw data, get metadata for
-                    # topic from topic_meta map
+                    # topic from topic_registry
                     meta_tid = topic_ids[0]
 
             if values:
-                metadata = self.topic_meta.get(meta_tid, {})
+                metadata = self.topic_registry.get_meta(meta_tid) or {}
                 # _log.debug("metadata is {}".format(metadata))
                 results = {'values': values, 'metadata': metadata}
             else:
@@ -357,10 +356,10 @@ class SQLHistorian(BaseHistorian):
         if not self._readonly:
             self.bg_thread_dbutils.setup_historian_tables()
 
-        topic_id_map, topic_name_map = self.bg_thread_dbutils.get_topic_map()
-        self.topic_id_map.update(topic_id_map)
-        self.topic_name_map.update(topic_name_map)
-        #_log.debug("updated topic name map. {}".format(self.topic_name_map))
+        # warm up the topic and metadata cache so that metadata is only
+        # written again when it actually changes
+        self.topic_registry.load(
+            *self.bg_thread_dbutils.get_topic_map_and_meta())
         self.agg_topic_id_map = self.bg_thread_dbutils.get_agg_topic_map()
 
 
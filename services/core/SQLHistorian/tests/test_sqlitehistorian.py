@@ -371,3 +371,26 @@ def publish_devices_fake_data(publish_agent, time=None):
     # Publish messages
     publish(publish_agent, DEVICES_ALL_TOPIC, headers, all_message)
     return time, reading, meta
+
+
+def test_first_batch_of_float_topic_is_typed(tmpdir):
+    sys.path.insert(0, get_services_core("SQLHistorian"))
+    from sqlhistorian.historian import SQLHistorian
+    historian = SQLHistorian(connection={
+        "type": "sqlite",
+        "params": {"database": str(tmpdir.join('typed.sqlite')),
+                   "typed_values": True}})
+    historian.historian_setup()
+    historian.report_all_handled = lambda: None
+
+    ts = datetime(year=2017, month=1, day=1, tzinfo=pytz.UTC)
+    meta = {'units': 'F', 'tz': 'UTC', 'type': 'float'}
+    historian.publish_to_historian([
+        {'timestamp': ts, 'topic': query_points['oat_point'], 'value': 1.5,
+         'meta': meta, 'source': 'scrape'}])
+
+    # The metadata of a new topic is written before its first values, so
+    # they are stored as numbers.
+    rows = historian.bg_thread_dbutils.select(
+        'SELECT value_string, value_real FROM data', None)
+    assert rows == [('', 1.5)]
@@ -1194,28 +1194,32 @@ volttron-central-serverkey."""
                                             platform_driver_id).get(timeout=5)
             _log.debug('Config list is: {}'.format(config_list))
 
-            for cfg_name in config_list:
-                # Skip as we are only looking to do devices in this call.
-                if not cfg_name.startswith('devices/'):
-                    continue
-
-                device_config = self.vip.rpc.call(CONFIGURATION_STORE,
-                                                  'manage_get',
-                                                  platform_driver_id,
-                                                  cfg_name,
-                                                  raw=False).get(timeout=5)
-                _log.debug('DEVICE CONFIG IS: {}'.format(device_config))
-
-                reg_cfg_name = device_config.get(
-                    'registry_config')[len('config://'):]
-                _log.debug('Reading registry_config file {}'.format(
-                    reg_cfg_name
-                ))
-                registry_config = self.vip.rpc.call(CONFIGURATION_STORE,
-                                                    'manage_get',
-                                                    platform_driver_id,
-                                                    reg_cfg_name,
-                                                    raw=False).get(timeout=5)
+            # Skip as we are only looking to do devices in this call.
+            device_names = [cfg_name for cfg_name in config_list
+                            if cfg_name.startswith('devices/')]
+
+            # Fetch the device configurations and then their registry
+            # configurations with one batched request each.
+            results = self.vip.rpc.gather(CONFIGURATION_STORE, [
+                ('manage_get', (platform_driver_id, cfg_name),
+                 {'raw': False})
+                for cfg_name in device_names])
+            device_configs = [result.get(timeout=5) for result in results]
+            _log.debug('DEVICE CONFIGS ARE: {}'.format(device_configs))
+
+            reg_cfg_names = [
+                device_config.get('registry_config')[len('config://'):]
+                for device_config in device_configs]
+            _log.debug('Reading registry_config files {}'.format(
+                reg_cfg_names
+            ))
+            results = self.vip.rpc.gather(CONFIGURATION_STORE, [
+                ('manage_get', (platform_driver_id, reg_cfg_name),
+                 {'raw': False})
+                for reg_cfg_name in reg_cfg_names])
+
+            for cfg_name, result in zip(device_names, results):
+                registry_config = result.get(timeout=5)
                 _log.debug('Registry Config: {}'.format(registry_config))
 
                 points = []
@@ -44,8 +44,10 @@ import gevent
 import logging
 import os.path
 import sys
+import time
 
 from datetime import datetime
+from gevent.event import Event
 from volttron.platform.agent.utils import watch_file_with_fullpath
 from volttron.platform.vip.agent import Agent, RPC, Core
 from volttron.platform.agent import utils
@@ -53,7 +55,10 @@ from volttron.platform.agent import utils
 
 utils.setup_logging()
 _log = logging.getLogger(__name__)
-__version__ = '3.6'
+__version__ = '3.7'
+
+DEFAULT_BATCH_SIZE = 1
+DEFAULT_MAX_LATENCY = 1.0
 
 
 def file_watch_publisher(config_path, **kwargs):
@@ -70,6 +75,78 @@ def file_watch_publisher(config_path, **kwargs):
     return FileWatchPublisher(config, **kwargs)
 
 
+class FileTailer(object):
+    """Follows a file from its current end, returning lines as they are
+    appended. Keeps the file open between reads and follows the path to
+    a new file when it is rotated (replaced or truncated).
+
+    :param path: Path of the file to follow.
+    :type path: str
+    """
+    chunk_size = 64 * 1024
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+        self._inode = None
+        self._partial = ''
+        self._open(seek_end=True)
+
+    def _open(self, seek_end=False):
+        self._file = open(self.path, 'r')
+        self._inode = os.fstat(self._file.fileno()).st_ino
+        self._partial = ''
+        if seek_end:
+            self._file.seek(0, 2)
+
+    def _drain(self):
+        lines = []
+        while True:
+            data = self._file.read(self.chunk_size)
+            if not data:
+                return lines
+            data = self._partial + data
+            lines.extend(data.split('\n'))
+            # The last item is an incomplete line (or empty); keep it until
+            # the rest of it is written.
+            self._partial = lines.pop()
+
+    def read_lines(self):
+        """Return the complete lines appended since the last call.
+
+        :returns: Lines without their line endings.
+        :rtype: list
+        """
+        lines = self._drain()
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            # Rotated and not yet recreated; keep the old file.
+            return lines
+        if stat.st_ino != self._inode:
+            old_file, partial = self._file, self._partial
+            try:
+                self._open()
+            except IOError:
+                # Not readable yet; keep the old file and try again on the
+                # next read.
+                return lines
+            old_file.close()
+            # Finish the old file before switching to the new one.
+            if partial:
+                lines.append(partial)
+            lines.extend(self._drain())
+        elif stat.st_size < self._file.tell():
+            # Truncated in place.
+            self._file.seek(0)
+            self._partial = ''
+            lines.extend(self._drain())
+        return lines
+
+    def close(self):
+        self._file.close()
+
+
 class FileWatchPublisher(Agent):
     """Monitors files from configuration for changes and
     publishes added lines on corresponding topics.
@@ -77,38 +154,43 @@ class FileWatchPublisher(Agent):
     in configuration with an error message.
     Exists if all files does not exist.
 
-    :param config: Configuration dict
-    :type config: dict
+    Lines are published in batches of up to batch_size lines. A batch
+    that is not full is published once its first line has waited
+    max_latency seconds. With the default batch_size of 1 each line is
+    published in its own message as {"timestamp": ..., "line": ...},
+    otherwise messages are {"timestamp": ..., "lines": [...]}.
+
+    :param config: Configuration list
+    :type config: list
 
     Example configuration:
 
     .. code-block:: python
 
-        {
-	        "publish_file": [
-                {
-                    "file": "/var/log/syslog",
-                    "topic": "platform/syslog",
-                },
-                {
-                    "file": "/home/volttron/tempfile.txt",
-                    "topic": "temp/filepublisher",
-                }
-	        ]
-        }
+        [
+            {
+                "file": "/var/log/syslog",
+                "topic": "platform/syslog",
+                "batch_size": 500,
+                "max_latency": 1.0
+            },
+            {
+                "file": "/home/volttron/tempfile.txt",
+                "topic": "temp/filepublisher"
+            }
+        ]
     """
     def __init__(self, config, **kwargs):
         super(FileWatchPublisher, self).__init__(**kwargs)
         self.config = config
         items = config[:]
         self.file_topic = {}
-        self.file_end_position = {}
+        self.file_tailer = {}
         for item in self.config:
             file =  item["file"]
             self.file_topic[file] = item["topic"]
             if os.path.isfile(file):
-                with open(file, 'r') as f:
-                    self.file_end_position[file] = self.get_end_position(f)
+                self.file_tailer[file] = FileTailer(file)
             else:
                 _log.error("File " + file + " does not exists. Ignoring this file.")
                 items.remove(item)
@@ -123,15 +205,61 @@ class FileWatchPublisher(Agent):
         else:
             for item in self.config:
                 file = item["file"]
-                self.core.spawn(watch_file_with_fullpath, file, self.read_file)
+                changed = Event()
+                self.core.spawn(watch_file_with_fullpath, file,
+                                lambda path, changed=changed: changed.set(),
+                                replaced=True)
+                self.core.spawn(self.tail_file, file, changed,
+                                item.get("batch_size", DEFAULT_BATCH_SIZE),
+                                item.get("max_latency", DEFAULT_MAX_LATENCY))
 
-    def read_file(self,file):
-        _log.debug('loading file %s', file)
-        with open(file, 'r') as f:
-            f.seek(self.file_end_position[file])
-            for line in f:
-                self.publish_file(line.strip(),self.file_topic[file])
-            self.file_end_position[file] = self.get_end_position(f)
+    @Core.receiver('onstop')
+    def stopping(self, sender, **kwargs):
+        for tailer in self.file_tailer.itervalues():
+            tailer.close()
+
+    def tail_file(self, file, changed, batch_size, max_latency):
+        """Read new lines whenever the file changes and publish them in
+        batches. The file is also checked every max_latency seconds so
+        pending lines are published on time and changes are still seen
+        where inotify is unavailable."""
+        tailer = self.file_tailer[file]
+        topic = self.file_topic[file]
+        pending = []
+        pending_since = None
+        while True:
+            timeout = max_latency
+            if pending:
+                timeout = max(pending_since + max_latency - time.time(),
+                              0)
+            changed.wait(timeout)
+            changed.clear()
+            try:
+                lines = tailer.read_lines()
+            except (IOError, OSError) as e:
+                _log.error("Error reading {}: {}".format(file, e))
+                lines = []
+            if lines and not pending:
+                pending_since = time.time()
+            pending.extend(lines)
+            while len(pending) >= batch_size:
+                self.publish_lines(pending[:batch_size], topic, batch_size)
+                del pending[:batch_size]
+                pending_since = time.time()
+            if pending and (time.time() - pending_since >=
+                            max_latency):
+                self.publish_lines(pending, topic, batch_size)
+                pending = []
+
+    def publish_lines(self, lines, topic, batch_size):
+        if batch_size == 1:
+            self.publish_file(lines[0].strip(), topic)
+            return
+        message = {'timestamp':  datetime.utcnow().isoformat() + 'Z',
+                   'lines': [line.strip() for line in lines]}
+        _log.debug('publishing {} lines on topic {}'.format(len(lines), topic))
+        self.vip.pubsub.publish(peer="pubsub", topic=topic,
+                                message=message)
 
     def publish_file(self, line, topic):
         message = {'timestamp':  datetime.utcnow().isoformat() + 'Z',
@@ -140,10 +268,6 @@ class FileWatchPublisher(Agent):
         self.vip.pubsub.publish(peer="pubsub", topic=topic,
                                 message=message)
 
-    def get_end_position(self, f):
-        f.seek(0,2)
-        return f.tell()
-
 
 def main(argv=sys.argv):
     """Main method called by the platform."""
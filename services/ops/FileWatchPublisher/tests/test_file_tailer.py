@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2017, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+import os
+
+from filewatchpublisher.agent import FileTailer
+
+
+def test_tailer_follows_appends_and_rotation(tmpdir):
+    path = str(tmpdir.join('app.log'))
+    with open(path, 'w') as f:
+        f.write('existing\n')
+    tailer = FileTailer(path)
+    assert tailer.read_lines() == []
+
+    with open(path, 'a') as f:
+        f.write('one\ntwo\nthr')
+    assert tailer.read_lines() == ['one', 'two']
+    with open(path, 'a') as f:
+        f.write('ee\n')
+    assert tailer.read_lines() == ['three']
+
+    # Rotate: lines written to the old file before the move are not lost.
+    with open(path, 'a') as f:
+        f.write('last\npartial')
+    os.rename(path, path + '.1')
+    assert tailer.read_lines() == ['last']
+    with open(path, 'w') as f:
+        f.write('new\n')
+    assert tailer.read_lines() == ['partial', 'new']
+
+    # Truncate in place.
+    with open(path, 'w') as f:
+        f.write('a\n')
+    assert tailer.read_lines() == ['a']
+    tailer.close()
+
+
+def test_tailer_keeps_old_file_when_reopen_fails(tmpdir, monkeypatch):
+    path = str(tmpdir.join('app.log'))
+    with open(path, 'w') as f:
+        f.write('')
+    tailer = FileTailer(path)
+    with open(path, 'a') as f:
+        f.write('one\npartial')
+    os.rename(path, path + '.1')
+    with open(path, 'w') as f:
+        f.write('new\n')
+
+    def fail(seek_end=False):
+        raise IOError(13, 'Permission denied')
+    monkeypatch.setattr(tailer, '_open', fail)
+    assert tailer.read_lines() == ['one']
+    # The old file is still open and followed.
+    with open(path + '.1', 'a') as f:
+        f.write(' line\n')
+    assert tailer.read_lines() == ['partial line']
+
+    monkeypatch.undo()
+    assert tailer.read_lines() == ['new']
+    tailer.close()
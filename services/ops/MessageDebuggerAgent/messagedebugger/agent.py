@@ -52,6 +52,7 @@
 #
 # }}}
 
+from collections import deque
 import datetime
 from dateutil.parser import parse
 import gevent
@@ -86,6 +87,11 @@ _verbosity = VERBOSITY_LOW
 
 MAX_MESSAGES_AT_LOW_VERBOSITY = 1000
 
+DEFAULT_BUFFER_SIZE = 10000         # Routed messages held for storage before the oldest are dropped
+DEFAULT_BATCH_SIZE = 500            # Routed messages stored per database commit
+DEFAULT_COMMIT_INTERVAL = 1.0       # Seconds between storing buffered messages
+EXCHANGE_CACHE_SIZE = 10000         # DebugMessageExchanges kept in memory to avoid looking them up
+
 
 class MessageDebuggerAgent(Agent):
     """
@@ -93,9 +99,10 @@ class MessageDebuggerAgent(Agent):
 
         When message debugging is enabled, Router publishes all messages to a (zmq) socket.
         This agent:
-            . Subscribes to that queue
+            . Subscribes to that queue, optionally capturing only some subsystems or senders
+            . Buffers (a sample of) the routed messages, dropping the oldest if storage falls behind
             . Transfers each message's contents to an instance of DebugMessage
-            . Writes each DebugMessage to a SQLite database
+            . Writes DebugMessages to a SQLite database in batches
             . Re-publishes each DebugMessage on another socket
             . Aggregates information for messages with the same ID into a single DebugMessageExchange
 
@@ -119,7 +126,17 @@ class MessageDebuggerAgent(Agent):
         self.default_config = dict(router_path=config.get('router_path', '$VOLTTRON_HOME/run/messagedebug'),
                                    monitor_path=config.get('monitor_path', '$VOLTTRON_HOME/run/messageviewer'),
                                    db_path=config.get('db_path', '$VOLTTRON_HOME/data/volttron_messages.sqlite'),
-                                   agentid=config.get('agentid', 'messagedebugger'))
+                                   agentid=config.get('agentid', 'messagedebugger'),
+                                   buffer_size=config.get('buffer_size', DEFAULT_BUFFER_SIZE),
+                                   batch_size=config.get('batch_size', DEFAULT_BATCH_SIZE),
+                                   commit_interval=config.get('commit_interval', DEFAULT_COMMIT_INTERVAL))
+        self._buffer = deque()
+        self._dropped_messages = 0
+        self._exchanges = {}
+        self._capture_prefix = u''
+        self._capture_sender = None
+        self._sample = 1
+        self._waiting_for_test_msg = True
         self.current_config = None
         _log.debug('Initializing agent config, default config = {}'.format(self.default_config))
         self.vip.config.set_default("config", self.default_config)
@@ -137,70 +154,129 @@ class MessageDebuggerAgent(Agent):
         """
             Subscribe to a zmq socket that publishes messages as they are routed.
 
-            Re-publish each DebugMessage for optional MessageViewer consumption.
-            Write each message to a SQLite db.
+            Routed messages are buffered here and processed by store_buffered_messages. When the buffer
+            is full the oldest messages are dropped, so a slow database can never stall the router.
         """
         self.enable_message_debugging()             # Always enable message debugging when the agent starts.
         router_socket = self.router_socket()
-        start_time = datetime.datetime.now()
-        waiting_for_test_msg = True
-        test_message_sent = False
+        self._buffer = deque(maxlen=self.vip_config_number('buffer_size', DEFAULT_BUFFER_SIZE))
+        self.core.spawn(self.store_buffered_messages)
+        received = 0
 
         _log.debug('Listening for messages on router socket')
         while True:
-            # Receive routed messages on the subscribed socket and process them.
+            # Receive routed messages on the subscribed socket and buffer them.
             try:
                 gevent.sleep(0)         # Sleep between messages so that other gevents can gain control of the process
 
-                routed_message = router_socket.recv_pyobj(zmq.NOBLOCK)
-                debug_message = DebugMessage(routed_message, self._debug_session.rowid if self._debug_session else 0)
-
-                if not test_message_sent:
-                    # First time in. Send a test RPC to validate that routed messages are arriving on the socket.
-                    _log.debug('Sending a test RPC call')
-                    self.vip.rpc.call(self.agent_id(), 'test_message')
-                    test_message_sent = True
+                # The first frame is the envelope that the router socket subscribes to.
+                routed_message = router_socket.recv_multipart(zmq.NOBLOCK)
+                if len(routed_message) < 9:
+                    continue            # Too few frames to be a VIP message, such as a router probe
+                if self._waiting_for_test_msg and self.is_test_message(routed_message):
+                    pass                # The test RPC is never excluded by the capture filters or sampling
+                elif self._capture_sender is not None and \
+                        routed_message[0].split(b'/', 2)[1] != self._capture_sender:
+                    continue
+                else:
+                    received += 1
+                    if received % self._sample:
+                        continue
+                if len(self._buffer) == self._buffer.maxlen:
+                    self._dropped_messages += 1
+                self._buffer.append(routed_message[1:])
 
-                if waiting_for_test_msg:
-                    waiting_for_test_msg = self.check_for_test_msg(debug_message, start_time)
+            except Again:
+                gevent.sleep(0.01)
+                continue
 
-                # Un-comment the following line to watch the message stream flow by in the log...
-                # _log.debug('{}'.format(debug_message))
+    def store_buffered_messages(self):
+        """
+            Periodically transfer buffered routed messages to DebugMessages.
 
-                if self._debug_session:
-                    self.store_debug_message(debug_message)
+            Re-publish each DebugMessage for optional MessageViewer consumption.
+            Write DebugMessages to a SQLite db, committing once per batch.
+        """
+        batch_size = self.vip_config_number('batch_size', DEFAULT_BATCH_SIZE)
+        commit_interval = self.vip_config_number('commit_interval', DEFAULT_COMMIT_INTERVAL)
+        start_time = datetime.datetime.now()
+        test_message_sent = False
+        dropped_messages = 0
 
-                if self._streaming_messages and self.allowed_by_filters(debug_message, ignore_session_id=True):
-                    # Re-publish the DebugMessage (as json) for MessageViewer real-time consumption
-                    self.monitor_socket().send(json.dumps(debug_message.as_json_compatible_object()))
+        while True:
+            gevent.sleep(commit_interval)
+            if not test_message_sent:
+                # First time in. Send a test RPC to validate that routed messages are arriving on the socket.
+                _log.debug('Sending a test RPC call')
+                self.vip.rpc.call(self.agent_id(), 'test_message')
+                test_message_sent = True
+            if self._dropped_messages != dropped_messages:
+                _log.warning('Dropped {} routed messages while storage was behind; consider capture filters '
+                             'or sampling'.format(self._dropped_messages - dropped_messages))
+                dropped_messages = self._dropped_messages
+            if not self._buffer and self._waiting_for_test_msg:
+                if not self.check_for_test_msg(None, start_time):
+                    self.stop_waiting_for_test_msg()
+            while self._buffer:
+                session_id = self._debug_session.rowid if self._debug_session else 0
+                debug_messages = [DebugMessage(self._buffer.popleft(), session_id)
+                                  for _ in xrange(min(batch_size, len(self._buffer)))]
+
+                for debug_message in debug_messages:
+                    if self._waiting_for_test_msg and not self.check_for_test_msg(debug_message, start_time):
+                        self.stop_waiting_for_test_msg()
+
+                    # Un-comment the following line to watch the message stream flow by in the log...
+                    # _log.debug('{}'.format(debug_message))
+
+                    if self._streaming_messages and self.allowed_by_filters(debug_message, ignore_session_id=True):
+                        # Re-publish the DebugMessage (as json) for MessageViewer real-time consumption
+                        self.monitor_socket().send(json.dumps(debug_message.as_json_compatible_object()))
 
-            except Again:
-                if waiting_for_test_msg:
-                    waiting_for_test_msg = self.check_for_test_msg(None, start_time)
-                continue
+                if self._debug_session:
+                    self.store_debug_messages(debug_messages)
+                gevent.sleep(0)
 
-    def store_debug_message(self, debug_message):
+    def store_debug_messages(self, debug_messages):
         """
-            A DebugMessage has arrived. Store it in the SQLite database.
+            A batch of DebugMessages has arrived. Store them in the SQLite database with a single commit.
 
-        @param debug_message: A DebugMessage instance.
+        @param debug_messages: A list of DebugMessage instances.
         """
-        self.db_session().add(debug_message)
+        db_session = self.db_session()
+        db_session.add_all(debug_messages)
         if self._debug_session:
-            self._debug_session.num_messages += 1
-        if debug_message.request_id:
-            # Update the DebugMessageExchange with this request ID; create one if necessary
-            query = self.db_session().query(DebugMessageExchange).filter_by(request_id=debug_message.request_id)
-            try:
-                exch = query.one_or_none()
-                exch.update_for_message(debug_message)
-            except:
-                exch = DebugMessageExchange(debug_message, self._debug_session.rowid if self._debug_session else 0)
-                self.db_session().add(exch)
+            self._debug_session.num_messages += len(debug_messages)
+
+        # Look up the DebugMessageExchanges of this batch that are not in the cache with one query.
+        request_ids = set(msg.request_id for msg in debug_messages
+                          if msg.request_id and msg.request_id not in self._exchanges)
+        if len(self._exchanges) + len(request_ids) > EXCHANGE_CACHE_SIZE:
+            self._exchanges = {}
+            request_ids = set(msg.request_id for msg in debug_messages if msg.request_id)
+        found = {}
+        request_ids = list(request_ids)
+        for index in xrange(0, len(request_ids), DEFAULT_BATCH_SIZE):
+            query = db_session.query(DebugMessageExchange).filter(
+                DebugMessageExchange.request_id.in_(request_ids[index:index + DEFAULT_BATCH_SIZE]))
+            found.update((exch.request_id, exch) for exch in query)
+
+        for debug_message in debug_messages:
+            if debug_message.request_id:
+                # Update the DebugMessageExchange with this request ID; create one if necessary
+                exch = self._exchanges.get(debug_message.request_id) or found.get(debug_message.request_id)
+                if exch is None:
+                    exch = DebugMessageExchange(debug_message, self._debug_session.rowid if self._debug_session else 0)
+                    db_session.add(exch)
+                else:
+                    exch.update_for_message(debug_message)
+                self._exchanges[debug_message.request_id] = exch
         try:
-            self.db_session().commit()
+            db_session.commit()
         except Exception, err:
-            pass
+            _log.error('Unable to store debug messages: {}'.format(err))
+            db_session.rollback()
+            self._exchanges = {}
 
     def allowed_by_filters(self, msg, ignore_session_id=False):
         """
@@ -264,6 +340,20 @@ class MessageDebuggerAgent(Agent):
         else:
             return True
 
+    def test_message_envelope(self):
+        """Return the envelope of the routed test RPC, which is captured regardless of the capture filters."""
+        return u'RPC/{}/'.format(self.agent_id())
+
+    def is_test_message(self, routed_message):
+        """Return whether a routed message (envelope and status frames first) is an RPC from this agent to itself."""
+        return routed_message[2] == routed_message[3] == self.agent_id() and routed_message[7] == b'RPC'
+
+    def stop_waiting_for_test_msg(self):
+        """Stop exempting the test RPC from the capture filters."""
+        self._waiting_for_test_msg = False
+        if self._router_socket:
+            self._router_socket.setsockopt_string(zmq.UNSUBSCRIBE, self.test_message_envelope())
+
     @RPC.export
     def execute_db_query(self, db_object_name, filters=None):
         """
@@ -275,7 +365,7 @@ class MessageDebuggerAgent(Agent):
         """
         global _verbosity
         _log.debug('Issuing {} query, filters={}'.format(db_object_name, filters))
-        self._filters = filters if filters else {}  # This also affects filtering while streaming to the monitor socket
+        self._set_filters(filters)      # This also affects filtering while streaming to the monitor socket
         if _verbosity == VERBOSITY_LOW:
             count = self._filtered_query(db_object_name).count()
             if count > MAX_MESSAGES_AT_LOW_VERBOSITY:
@@ -416,7 +506,7 @@ class MessageDebuggerAgent(Agent):
         @return: A string indicating command success.
         """
         _log.debug('Starting message streaming')
-        self._filters = filters if filters else {}
+        self._set_filters(filters)
         self._streaming_messages = True
         return 'Streaming debug messages'
 
@@ -434,6 +524,7 @@ class MessageDebuggerAgent(Agent):
         if os.path.exists(self.vip_config_get('db_path')):
             self._debug_session = None                  # End the current debug session
             self._db_session = None
+            self._exchanges = {}
             os.remove(self.vip_config_get('db_path'))
             result = 'Database deleted'
         else:
@@ -461,6 +552,7 @@ class MessageDebuggerAgent(Agent):
         delete_rows_with_value('DebugMessage', 'session_id', session_id)
         delete_rows_with_value('DebugMessageExchange', 'session_id', session_id)
         self.db_session().commit()
+        self._exchanges = {}
         return 'Deleted debug session {}'.format(session_id)
 
     @RPC.export
@@ -478,19 +570,49 @@ class MessageDebuggerAgent(Agent):
     @RPC.export
     def set_filters(self, filters):
         """Set the filters to use in responses to RPC calls and while streaming to the socket."""
-        # This gets set as a side effect of other RPC calls; it is not itself an exported RPC call.
+        # This also gets set as a side effect of other RPC calls.
         _log.debug('Setting filters to {}'.format(filters))
-        self._filters = filters
+        self._set_filters(filters)
         return 'Set filters to {}'.format(filters)
 
+    def _set_filters(self, filters):
+        """
+            Set the current filters, pushing the capture filters down to the router socket.
+
+            The 'capture_subsystem' and 'capture_sender' filters restrict which routed messages are captured
+            at all, and 'sample' <n> captures only every n-th of them. Message subscriptions are prefix matches
+            on a 'subsystem/sender/' envelope, so a capture_sender filter without a capture_subsystem filter
+            is applied by this agent rather than by the router.
+        """
+        self._filters = filters if filters else {}
+        subsystem = self._filters.get('capture_subsystem')
+        sender = self._filters.get('capture_sender')
+        prefix = u''
+        if subsystem:
+            prefix = u'{}/'.format(subsystem)
+            if sender:
+                prefix += u'{}/'.format(sender)
+        self._capture_sender = bytes(sender) if sender and not subsystem else None
+        if prefix != self._capture_prefix:
+            router_socket = self.router_socket()
+            router_socket.setsockopt_string(zmq.SUBSCRIBE, prefix)
+            router_socket.setsockopt_string(zmq.UNSUBSCRIBE, self._capture_prefix)
+            self._capture_prefix = prefix
+        try:
+            self._sample = max(1, int(self._filters.get('sample', 1)))
+        except ValueError:
+            self._sample = 1
+
     def router_socket(self):
         """Return the zmq socket that subscribes to router messages. Initialize the connection if first time in."""
         if not self._router_socket:
             ipc = 'ipc://{}'.format('@' if sys.platform.startswith('linux') else '')
             router_socket_address = ipc + self.vip_config_get('router_path')
             self._router_socket = zmq.Context().socket(zmq.SUB)
-            self._router_socket.setsockopt_string(zmq.SUBSCRIBE, u"")
-            self._router_socket.set_hwm(100)            # Start dropping messages if queue backlog exceeds 100
+            self._router_socket.setsockopt_string(zmq.SUBSCRIBE, self._capture_prefix)
+            if self._waiting_for_test_msg:
+                self._router_socket.setsockopt_string(zmq.SUBSCRIBE, self.test_message_envelope())
+            self._router_socket.set_hwm(1000)           # Start dropping messages if queue backlog exceeds 1000
             self._router_socket.bind(router_socket_address)
             _log.debug('Subscribing to router socket {}'.format(router_socket_address))
         return self._router_socket
@@ -542,6 +664,16 @@ class MessageDebuggerAgent(Agent):
         config_var = os.path.expandvars(config_var)
         return config_var
 
+    def vip_config_number(self, var_name, default):
+        """
+            Fetch a numeric parameter from this process's vip config.
+
+        @param var_name: The parameter's name.
+        @param default: The value to use if the parameter is not set; also determines the parameter's type.
+        @return: The parameter's value.
+        """
+        return type(default)(self.vip.config.get('config').get(var_name, default))
+
 
 def format_attribute(att, label=None):
     """
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+
+# Copyright (c) 2017, SLAC National Laboratory / Kisensum Inc.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions
+# are met:
+#
+# 1. Redistributions of source code must retain the above copyright
+#    notice, this list of conditions and the following disclaimer.
+# 2. Redistributions in binary form must reproduce the above copyright
+#    notice, this list of conditions and the following disclaimer in
+#    the documentation and/or other materials provided with the
+#    distribution.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS
+# "AS IS" AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT
+# LIMITED TO, THE IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR
+# A PARTICULAR PURPOSE ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT
+# OWNER OR CONTRIBUTORS BE LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL,
+# SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT
+# LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES; LOSS OF USE,
+# DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND ON ANY
+# THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE
+# OF THIS SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+#
+# The views and conclusions contained in the software and documentation
+# are those of the authors and should not be interpreted as representing
+# official policies, either expressed or implied, of the FreeBSD
+# Project.
+#
+# This material was prepared as an account of work sponsored by an
+# agency of the United States Government.  Neither the United States
+# Government nor the United States Department of Energy, nor SLAC / Kisensum,
+# nor any of their employees, nor any jurisdiction or organization that
+# has cooperated in the development of these materials, makes any
+# warranty, express or implied, or assumes any legal liability or
+# responsibility for the accuracy, completeness, or usefulness or any
+# information, apparatus, product, software, or process disclosed, or
+# represents that its use would not infringe privately owned rights.
+#
+# Reference herein to any specific commercial product, process, or
+# service by trade name, trademark, manufacturer, or otherwise does not
+# necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# SLAC / Kisensum. The views and opinions of authors
+# expressed herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# }}}
+
+import json
+
+import gevent
+import zmq
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from zmq.green import Again
+
+from messagedebugger import agent as agent_module
+from messagedebugger.agent import (MessageDebuggerAgent, DebugMessage, DebugMessageExchange,
+                                   ORMBase, INCOMING, OUTGOING)
+
+AGENT_ID = 'messagedebugger'
+
+
+class FakeSocket(object):
+    """Stands in for the router and monitor zmq sockets."""
+
+    def __init__(self):
+        self.messages = []
+        self.subscriptions = []
+        self.sent = []
+
+    def recv_multipart(self, flags=0):
+        if not self.messages:
+            raise Again()
+        return self.messages.pop(0)
+
+    def setsockopt_string(self, option, value):
+        self.subscriptions.append((option, value))
+
+    def send(self, data):
+        self.sent.append(data)
+
+
+def routed(sender, recipient, request_id=b'', subsystem=b'RPC', data=b'{}', status=INCOMING):
+    """Return a routed message as the router publishes it: envelope, status, then the VIP frames."""
+    envelope = b'/'.join([subsystem, sender, b''])
+    return [envelope, str(status), sender, recipient, b'VIP1', b'', request_id, subsystem, data]
+
+
+def build_agent(tmpdir, **config):
+    config = dict(dict(agentid=AGENT_ID, commit_interval=0.01), **config)
+    config_path = tmpdir.join('config')
+    config_path.write(json.dumps(config))
+    agent = MessageDebuggerAgent(str(config_path))
+    agent.vip.config.get = lambda config_name='config': config
+    agent.vip.rpc.call = lambda peer, method, *args, **kwargs: None
+    # The agent is not running; its greenlets are run by the tests.
+    agent.core.spawn = lambda func, *args, **kwargs: None
+    engine = create_engine('sqlite://')
+    ORMBase.metadata.create_all(engine)
+    agent._db_session = sessionmaker(bind=engine)()
+    agent._router_socket = FakeSocket()
+    agent._monitor_socket = FakeSocket()
+    return agent
+
+
+def run_briefly(func):
+    greenlet = gevent.spawn(func)
+    gevent.sleep(0.1)
+    greenlet.kill()
+
+
+def buffered_request_ids(agent):
+    return [message[5] for message in agent._buffer]
+
+
+def debug_messages(agent, *request_ids):
+    return [DebugMessage(routed(b'a', b'b', request_id=request_id)[1:], agent._debug_session.rowid)
+            for request_id in request_ids]
+
+
+def test_full_buffer_drops_oldest(tmpdir):
+    agent = build_agent(tmpdir, buffer_size=3)
+    agent._router_socket.messages = [routed(b'a', b'b', request_id=str(i)) for i in range(5)]
+    run_briefly(agent.listen_for_messages)
+    assert buffered_request_ids(agent) == ['2', '3', '4']
+    assert agent._dropped_messages == 2
+
+
+def test_capture_sender_and_sample(tmpdir):
+    agent = build_agent(tmpdir)
+    agent._set_filters({'capture_sender': 'a', 'sample': 2})
+    agent._router_socket.messages = [
+        routed(b'a', b'b', request_id='0'),
+        routed(b'b', b'a', request_id='b'),
+        # The test RPC is captured although the filters would exclude it.
+        routed(AGENT_ID, AGENT_ID, request_id='test', status=OUTGOING),
+        routed(b'a', b'b', request_id='1'),
+        routed(b'a', b'b', request_id='2'),
+        routed(b'a', b'b', request_id='3')]
+    run_briefly(agent.listen_for_messages)
+    assert buffered_request_ids(agent) == ['test', '1', '3']
+
+    agent.stop_waiting_for_test_msg()
+    agent._router_socket.messages = [routed(AGENT_ID, AGENT_ID, request_id='test', status=OUTGOING)]
+    run_briefly(agent.listen_for_messages)
+    assert buffered_request_ids(agent) == []
+
+
+def test_capture_filters_switch_envelope_subscription(tmpdir):
+    agent = build_agent(tmpdir)
+    socket = agent._router_socket
+    agent._set_filters({'capture_subsystem': 'pubsub', 'capture_sender': 'a'})
+    assert agent._capture_sender is None
+    # Without a subsystem the sender cannot be matched by prefix, so everything is subscribed to.
+    agent._set_filters({'capture_sender': 'a'})
+    assert agent._capture_sender == b'a'
+    agent._set_filters({'capture_sender': 'a', 'sample': 'x'})
+    assert agent._sample == 1
+    assert socket.subscriptions == [(zmq.SUBSCRIBE, u'pubsub/a/'), (zmq.UNSUBSCRIBE, u''),
+                                    (zmq.SUBSCRIBE, u''), (zmq.UNSUBSCRIBE, u'pubsub/a/')]
+
+    agent.stop_waiting_for_test_msg()
+    assert socket.subscriptions[-1] == (zmq.UNSUBSCRIBE, u'RPC/{}/'.format(AGENT_ID))
+
+
+def test_store_buffered_messages(tmpdir):
+    agent = build_agent(tmpdir, batch_size=2)
+    calls = []
+    agent.vip.rpc.call = lambda peer, method: calls.append((peer, method))
+    agent.enable_message_debugging()
+    agent.enable_message_streaming()
+    agent._buffer.extend(routed(b'a', b'b', request_id=str(i))[1:] for i in range(4))
+    agent._buffer.append(routed(AGENT_ID, AGENT_ID, request_id='test', status=OUTGOING)[1:])
+    run_briefly(agent.store_buffered_messages)
+
+    assert calls == [(AGENT_ID, 'test_message')]
+    assert not agent._buffer
+    assert agent.db_session().query(DebugMessage).count() == 5
+    assert agent._debug_session.num_messages == 5
+    assert len(agent._monitor_socket.sent) == 5
+    assert not agent._waiting_for_test_msg
+
+
+def test_store_debug_messages_caches_exchanges(tmpdir):
+    agent = build_agent(tmpdir)
+    agent.enable_message_debugging()
+    db_session = agent.db_session()
+    session_id = agent._debug_session.rowid
+    agent.store_debug_messages([
+        DebugMessage(routed(b'a', b'b', request_id='r1', status=OUTGOING)[1:], session_id),
+        DebugMessage(routed(b'b', b'a', request_id='r1')[1:], session_id)])
+    exchange = agent._exchanges['r1']
+    assert exchange.sender == 'a'
+    assert exchange.recipient == 'b'
+
+    agent.store_debug_messages(debug_messages(agent, 'r1', 'r2'))
+    assert agent._exchanges['r1'] is exchange
+    assert db_session.query(DebugMessageExchange).count() == 2
+    assert db_session.query(DebugMessage).count() == 4
+    assert agent._debug_session.num_messages == 4
+
+
+def test_exchange_cache_is_bounded(tmpdir, monkeypatch):
+    monkeypatch.setattr(agent_module, 'EXCHANGE_CACHE_SIZE', 2)
+    agent = build_agent(tmpdir)
+    agent.enable_message_debugging()
+    agent.store_debug_messages(debug_messages(agent, 'r1', 'r2'))
+    agent.store_debug_messages(debug_messages(agent, 'r3'))
+    assert set(agent._exchanges) == {'r3'}
+
+    # An exchange no longer cached is found in the database.
+    agent.store_debug_messages(debug_messages(agent, 'r1'))
+    assert agent.db_session().query(DebugMessageExchange).count() == 3
+
+
+def test_failed_batch_is_rolled_back(tmpdir, monkeypatch):
+    agent = build_agent(tmpdir)
+    agent.enable_message_debugging()
+    db_session = agent.db_session()
+    agent.store_debug_messages(debug_messages(agent, 'r1'))
+
+    def fail():
+        raise Exception('database is locked')
+    monkeypatch.setattr(db_session, 'commit', fail)
+    agent.store_debug_messages(debug_messages(agent, 'r1', 'r2'))
+    assert agent._exchanges == {}
+    monkeypatch.undo()
+    assert db_session.query(DebugMessage).count() == 1
+    assert db_session.query(DebugMessageExchange).count() == 1
+
+    agent.store_debug_messages(debug_messages(agent, 'r1', 'r2'))
+    assert db_session.query(DebugMessage).count() == 3
+    assert db_session.query(DebugMessageExchange).count() == 2
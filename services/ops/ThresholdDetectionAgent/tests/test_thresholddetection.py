@@ -48,11 +48,13 @@ import json
 import pytest
 
 import gevent
+import numpy as np
 
 from volttron.platform import get_ops
 from volttron.platform.agent.known_identities import CONFIGURATION_STORE
 from volttron.platform.vip.agent import Agent, PubSub
 from volttrontesting.utils.utils import poll_gevent_sleep
+from thresholddetection.agent import Thresholds
 
 _default_config = {
     "test_max": {
@@ -198,3 +200,20 @@ def test_device_publish(threshold_tester_agent):
                                               headers={}, message=[{'point': 11}]).get()
     check = lambda: threshold_tester_agent.seen_alert_keys == set(['devices/all'])
     assert poll_gevent_sleep(2, check)
+
+
+def test_thresholds_debounce_and_interval():
+    thresholds = Thresholds({
+        "a": {"threshold_max": 10, "threshold_min": 0},
+        "b": {"threshold_max": 10, "debounce": 2},
+        "c": {"threshold_min": 5, "alert_interval": 0}
+    })
+    assert thresholds.check(np.array([11., 11., 4.]), 0) == [(0, 10), (2, 5)]
+    # Values that stay out of range are not alerted on again.
+    assert thresholds.check(np.array([11., 11., 4.]), 1) == [(1, 10)]
+    # Missing values leave the state unchanged.
+    assert thresholds.check(np.array([np.nan, np.nan, np.nan]), 2) == []
+    assert thresholds.check(np.array([5., 5., 6.]), 3) == []
+    # Back out of range, "a" is held back by the alert interval.
+    assert thresholds.check(np.array([-1., 5., 4.]), 4) == [(2, 5)]
+    assert thresholds.check(np.array([-1., 5., 4.]), 60) == [(0, 0)]
@@ -42,8 +42,11 @@
 
 import logging
 import sys
+import time
 import uuid
 
+import numpy as np
+
 from volttron.platform.vip.agent import Agent, Core, PubSub, RPC, compat
 from volttron.platform.agent import utils
 from volttron.platform.messaging.health import Status, STATUS_BAD
@@ -52,6 +55,8 @@ utils.setup_logging()
 _log = logging.getLogger(__name__)
 __version__ = '3.7'
 
+DEFAULT_ALERT_INTERVAL = 60
+
 
 def thresholddetection_agent(config_path, **kwargs):
     """Load configuration for ThresholdDetectionAgent
@@ -66,6 +71,73 @@ def thresholddetection_agent(config_path, **kwargs):
     return ThresholdDetectionAgent(config, **kwargs)
 
 
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class Thresholds(object):
+    """
+    Thresholds of one or more values compiled into arrays so a publish
+    is checked with a few vectorized comparisons.
+
+    A value is alerted on once it has been out of range for "debounce"
+    consecutive publishes. It is not alerted on again until it has come
+    back in range, and never more often than every "alert_interval"
+    seconds.
+
+    :param thresholds: Dictionary of names to threshold settings
+    :type thresholds: dict
+    """
+    def __init__(self, thresholds):
+        self.names = sorted(thresholds)
+        settings = [thresholds[name] for name in self.names]
+
+        def setting(key, default):
+            return np.array([_to_float(values.get(key, default))
+                             for values in settings])
+
+        self.maximums = setting('threshold_max', np.nan)
+        self.minimums = setting('threshold_min', np.nan)
+        # Configured values, used in alert messages.
+        self._threshold_max = [values.get('threshold_max') for values in settings]
+        self._threshold_min = [values.get('threshold_min') for values in settings]
+        self.debounce = setting('debounce', 1)
+        self.alert_interval = setting('alert_interval', DEFAULT_ALERT_INTERVAL)
+
+        self.out_count = np.zeros(len(self.names))
+        self.alerted = np.zeros(len(self.names), dtype=bool)
+        self.last_alert = np.full(len(self.names), -np.inf)
+
+    def check(self, values, now):
+        """
+        Update the state of each value and return the alerts to send.
+
+        :param values: Values in the same order as names, nan if missing
+        :returns: List of (index, threshold) for values to alert on
+        """
+        valid = ~np.isnan(values)
+        with np.errstate(invalid='ignore'):
+            above = values > self.maximums
+            out = above | (values < self.minimums)
+
+        # Missing or non-numeric values leave the state unchanged.
+        self.out_count = np.where(valid, np.where(out, self.out_count + 1, 0),
+                                  self.out_count)
+        self.alerted &= out | ~valid
+        due = (out & ~self.alerted & (self.out_count >= self.debounce) &
+               (now - self.last_alert >= self.alert_interval))
+        if not due.any():
+            return []
+
+        self.alerted |= due
+        self.last_alert[due] = now
+        return [(i, self._threshold_max[i] if above[i] else self._threshold_min[i])
+                for i in np.flatnonzero(due)]
+
+
 class ThresholdDetectionAgent(Agent):
     """
     Listen to topics and publish alerts when thresholds are passed.
@@ -75,6 +147,12 @@ class ThresholdDetectionAgent(Agent):
     can specify a maximum and minimum threshold. Non-numberic data
     will be ignored.
 
+    Thresholds may also set "debounce", the number of consecutive
+    publishes a value must be out of range before an alert is sent
+    (defaults to 1), and "alert_interval", the minimum number of seconds
+    between alerts for the same value (defaults to 60). A value that stays
+    out of range is only alerted on again after it has come back in range.
+
     Example configuration:
 
     .. code-block:: python
@@ -89,7 +167,8 @@ class ThresholdDetectionAgent(Agent):
             "devices/some/device/topic/all": {
                 "some_point": {
                     "threshold_max": 42,
-                    "threshold_min": 0
+                    "threshold_min": 0,
+                    "debounce": 3
                 }
             }
         }
@@ -131,24 +210,17 @@ class ThresholdDetectionAgent(Agent):
         :param device_points: Dictionary of points to thresholds
         :type device_points: dict
         """
-        for point, values in device_points.iteritems():
-            threshold_max = values.get('threshold_max')
-            threshold_min = values.get('threshold_min')
-
-            def callback(peer, sender, bus, topic, headers, message):
-                data = message[0].get(point)
+        thresholds = Thresholds(device_points)
+        points = thresholds.names
 
-                try:
-                    float(data)
-                except ValueError:
-                    return
+        def callback(peer, sender, bus, topic, headers, message):
+            data = message[0]
+            values = np.fromiter((_to_float(data.get(point)) for point in points),
+                                 dtype=float, count=len(points))
+            for i, threshold in thresholds.check(values, time.time()):
+                self._alert(topic, threshold, data[points[i]], point=points[i])
 
-                if threshold_max is not None and data > threshold_max:
-                    self._alert(topic, threshold_max, data, point=point)
-                elif threshold_min is not None and data < threshold_min:
-                    self._alert(topic, threshold_min, data, point=point)
-
-            self.vip.pubsub.subscribe('pubsub', topic, callback)
+        self.vip.pubsub.subscribe('pubsub', topic, callback)
 
     def _create_standard_subscription(self, topic, values):
         """
@@ -160,19 +232,12 @@ class ThresholdDetectionAgent(Agent):
         :param device_points: Dictionary of points to thresholds
         :type device_points: dict
         """
-        threshold_max = values.get('threshold_max')
-        threshold_min = values.get('threshold_min')
+        thresholds = Thresholds({topic: values})
 
         def callback(peer, sender, bus, topic, headers, data):
-            try:
-                float(data)
-            except ValueError:
-                return
-
-            if threshold_max is not None and data > threshold_max:
-                self._alert(topic, threshold_max, data)
-            elif threshold_min is not None and data < threshold_min:
-                self._alert(topic, threshold_min, data)
+            values = np.array([_to_float(data)])
+            for _, threshold in thresholds.check(values, time.time()):
+                self._alert(topic, threshold, data)
 
         self.vip.pubsub.subscribe('pubsub', topic, callback)
 
@@ -503,3 +503,104 @@ def test_for_duplicate_logs(volttron_instance1, agent, cleanup_db):
         assert r[1] is None
         non_utc = publish_time.replace(tzinfo=None)
         assert r[2] >= non_utc
+
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def alert_group(monkeypatch):
+    from topic_watcher import agent as watcher
+    clock = FakeClock()
+    monkeypatch.setattr(watcher, 'time', clock)
+    connection = sqlite3.connect(
+        ':memory:',
+        detect_types=sqlite3.PARSE_DECLTYPES | sqlite3.PARSE_COLNAMES)
+    connection.execute("CREATE TABLE topic_log( "
+                       "topic TEXT, "
+                       "last_seen_before_timeout TIMESTAMP, "
+                       "first_seen_after_timeout TIMESTAMP)")
+    group = watcher.AlertGroup('group1', {}, connection)
+    group.vip.pubsub.subscribe = lambda *args, **kwargs: None
+    group.vip.pubsub.unsubscribe = lambda *args, **kwargs: None
+    group.alerts = []
+    group.send_alert = lambda unseen: group.alerts.append(sorted(unseen))
+    group.clock = clock
+    return group
+
+
+def publish(group, topic, message=None):
+    group.reset_time('pubsub', 'sender', '', topic, {}, message or [{}])
+
+
+def advance(group, seconds):
+    group.clock.now += seconds
+    group.check_deadlines()
+
+
+def test_alert_group_deadlines(alert_group):
+    alert_group.watch_topic('fakedevice', 5)
+    advance(alert_group, 3)
+    publish(alert_group, 'fakedevice')
+    advance(alert_group, 3)
+    publish(alert_group, 'fakedevice')
+    advance(alert_group, 3)
+    assert alert_group.alerts == []
+
+    advance(alert_group, 3)
+    assert alert_group.alerts == [['fakedevice']]
+    # The alert repeats until the topic is published, the timeout is
+    # only logged once.
+    advance(alert_group, 1)
+    assert alert_group.alerts == [['fakedevice'], ['fakedevice']]
+    c = alert_group.connection.cursor()
+    c.execute("SELECT topic, first_seen_after_timeout FROM topic_log")
+    assert c.fetchall() == [('fakedevice', None)]
+
+    publish(alert_group, 'fakedevice')
+    advance(alert_group, 1)
+    assert len(alert_group.alerts) == 2
+    c.execute("SELECT first_seen_after_timeout FROM topic_log")
+    assert c.fetchone()[0] is not None
+
+
+def test_alert_group_shorter_timeout(alert_group):
+    alert_group.watch_topic('fakedevice', 60)
+    alert_group.watch_topic('fakedevice', 5)
+    advance(alert_group, 6)
+    assert alert_group.alerts == [['fakedevice']]
+
+
+def test_alert_group_longest_prefix(alert_group):
+    alert_group.watch_topic('devices/campus', 5)
+    alert_group.watch_topic('devices/campus/building', 5)
+    advance(alert_group, 4)
+    publish(alert_group, 'devices/campus/building/rtu/all')
+    publish(alert_group, 'devices/other/rtu/all')
+    advance(alert_group, 2)
+    assert alert_group.alerts == [['devices/campus']]
+
+
+def test_alert_group_device_points(alert_group):
+    alert_group.watch_device('fakedevice2/all', 5, ['point'])
+    advance(alert_group, 4)
+    publish(alert_group, 'fakedevice2/all', [{'other': 1}])
+    advance(alert_group, 2)
+    assert alert_group.alerts == [[('fakedevice2/all', 'point')]]
+
+
+def test_alert_group_ignore_topic(alert_group):
+    alert_group.watch_topic('devices/campus', 5)
+    alert_group.watch_device('fakedevice2/all', 5, ['point'])
+    alert_group.ignore_topic('devices/campus')
+    alert_group.ignore_topic('fakedevice2/all')
+    # Ignoring a topic that is not watched does nothing.
+    alert_group.ignore_topic('fakedevice')
+    publish(alert_group, 'devices/campus/building')
+    advance(alert_group, 10)
+    assert alert_group.alerts == []
@@ -39,8 +39,10 @@
 import logging
 
 import gevent
+import heapq
 import sqlite3
 import datetime
+import time
 
 from volttron.platform.agent.known_identities import PLATFORM_TOPIC_WATCHER
 from volttron.platform.agent import utils
@@ -53,6 +55,8 @@ _log = logging.getLogger(__name__)
 
 __version__ = '1.0'
 
+_PREFIX_CACHE_SIZE = 10000
+
 
 class AlertAgent(Agent):
     def __init__(self, config_path, **kwargs):
@@ -188,10 +192,22 @@ class AlertGroup(Agent):
         self.connection = connection
         self.config = config
         self.wait_time = {}
-        self.topic_ttl = {}
-        self.point_ttl = {}
+        self.points = {}
         self.unseen_topics = set()
         self.last_seen = {}
+        # Time each topic or (topic, point) that has not timed out is
+        # expected by. Publishes only move the deadline forward. The heap
+        # entry is checked and rescheduled when it comes due so nothing
+        # is done for watched topics between publishes. _scheduled holds
+        # the deadline of the current heap entry of each key; older
+        # entries left in the heap are skipped.
+        self.deadlines = {}
+        self._deadline_heap = []
+        self._scheduled = {}
+        # Lengths of the watched topics, longest first, and the watched
+        # topic matched by each published topic.
+        self._prefix_lengths = []
+        self._prefix_cache = {}
 
     @Core.receiver('onstart')
     def onstart(self, sender, **kwargs):
@@ -222,7 +238,8 @@ class AlertGroup(Agent):
         :type timeout: int
         """
         self.wait_time[topic] = timeout
-        self.topic_ttl[topic] = timeout
+        self._update_prefixes()
+        self._schedule(topic, time.time() + timeout)
         self.vip.pubsub.subscribe(peer='pubsub',
                                   prefix=topic,
                                   callback=self.reset_time)
@@ -241,10 +258,13 @@ class AlertGroup(Agent):
         :param points: Points to expect in the publish message.
         :type points: [str]
         """
-        self.point_ttl[topic] = {}
+        for p in set(self.points.get(topic, [])).difference(points):
+            self._forget((topic, p))
+        self.points[topic] = list(points)
 
+        deadline = time.time() + timeout
         for p in points:
-            self.point_ttl[topic][p] = timeout
+            self._schedule((topic, p), deadline)
 
         self.watch_topic(topic, timeout)
 
@@ -259,13 +279,48 @@ class AlertGroup(Agent):
         self.vip.pubsub.unsubscribe(peer='pubsub',
                                     prefix=topic,
                                     callback=self.reset_time)
-        points = self.point_ttl.pop(topic, None)
-        self.topic_ttl.pop(topic, None)
         self.wait_time.pop(topic, None)
-        self.unseen_topics.remove(topic)
-        for p in points:
-            self.unseen_topics.remove((topic,p))
-
+        self._update_prefixes()
+        self._forget(topic)
+        for p in self.points.pop(topic, []):
+            self._forget((topic, p))
+
+    def _update_prefixes(self):
+        self._prefix_lengths = sorted(set(len(t) for t in self.wait_time),
+                                      reverse=True)
+        self._prefix_cache.clear()
+
+    def _watched_topic(self, topic):
+        """Return the watched topic a published topic belongs to, the
+        longest watched prefix of the topic, or None."""
+        if topic in self.wait_time:
+            return topic
+        try:
+            return self._prefix_cache[topic]
+        except KeyError:
+            pass
+        watched = None
+        for length in self._prefix_lengths:
+            if topic[:length] in self.wait_time:
+                watched = topic[:length]
+                break
+        if len(self._prefix_cache) >= _PREFIX_CACHE_SIZE:
+            self._prefix_cache.clear()
+        self._prefix_cache[topic] = watched
+        return watched
+
+    def _schedule(self, key, deadline):
+        self.deadlines[key] = deadline
+        scheduled = self._scheduled.get(key)
+        # A later deadline is picked up when the current entry comes due,
+        # an earlier one (a shorter timeout) needs an entry of its own.
+        if scheduled is None or deadline < scheduled:
+            self._scheduled[key] = deadline
+            heapq.heappush(self._deadline_heap, (deadline, key))
+
+    def _forget(self, key):
+        self.deadlines.pop(key, None)
+        self.unseen_topics.discard(key)
 
     def reset_time(self, peer, sender, bus, topic, headers, message):
         """Callback for topic subscriptions
@@ -273,47 +328,39 @@ class AlertGroup(Agent):
         Resets the timeout for topics and devices when publishes are received.
         """
         up_time = get_aware_utc_now()
-        # TODO: What is the use case for this IF STMT
-        # topic should always be there?? Ask Craig
-        if topic not in self.wait_time:
-            found = False
-            # if topic isn't in wait time we need to figure out the
-            # prefix topic so that we can determine the wait time
-            for x in self.wait_time:
-                # TODO: order the wait_time topics so furthest down the tree wins.
-                if topic.startswith(x):
-                    topic = x
-                    found = True
-                    break
-            if not found:
-                _log.debug("No configured topic prefix for topic {}".format(
-                    topic))
-                return
+        # if topic isn't watched we need to figure out the
+        # prefix topic so that we can determine the wait time
+        watched = self._watched_topic(topic)
+        if watched is None:
+            _log.debug("No configured topic prefix for topic {}".format(
+                topic))
+            return
+        topic = watched
 
         log_topics = set()
+        deadline = time.time() + self.wait_time[topic]
         # Reset the standard topic timeout
-        self.topic_ttl[topic] = self.wait_time[topic]
-        self.last_seen[topic] = get_aware_utc_now()
-        if topic in self.unseen_topics:
-            self.unseen_topics.remove(topic)
-            # log time we saw topic only if we had earlier recorded a timeout
-            log_topics.add(topic)
+        self._seen(topic, deadline, up_time, log_topics)
 
         # Reset timeouts on volatile points
-        if topic in self.point_ttl:
-            received_points = set(message[0].keys())
-            expected_points = self.point_ttl[topic].keys()
-            for point in expected_points:
+        points = self.points.get(topic)
+        if points:
+            received_points = message[0]
+            for point in points:
                 if point in received_points:
-                    self.point_ttl[topic][point] = self.wait_time[topic]
-                    self.last_seen[(topic, point)] = get_aware_utc_now()
-                    if (topic,point) in self.unseen_topics:
-                        self.unseen_topics.remove((topic, point))
-                        log_topics.add((topic, point))
+                    self._seen((topic, point), deadline, up_time, log_topics)
 
         if log_topics:
             self.log_time_up(up_time, log_topics)
 
+    def _seen(self, key, deadline, up_time, log_topics):
+        self._schedule(key, deadline)
+        self.last_seen[key] = up_time
+        if key in self.unseen_topics:
+            self.unseen_topics.remove(key)
+            # log time we saw topic only if we had earlier recorded a timeout
+            log_topics.add(key)
+
     def log_timeout(self, log_topics):
         """
         logs into database the last time a topic was seen before a time out
@@ -388,36 +435,34 @@ class AlertGroup(Agent):
 
 
     @Core.periodic(1)
-    def decrement_ttl(self):
+    def check_deadlines(self):
         """Periodic call
 
-        Used to maintain the time since each topic's last publish.
+        Times out the topics and points whose deadline has passed.
         Sends an alert if any topics are missing.
         """
-
+        now = time.time()
         topics_timedout = set()
-        for topic in self.wait_time.iterkeys():
-
-            # Send an alert if a topic hasn't been seen
-            self.topic_ttl[topic] -= 1
-            if self.topic_ttl[topic] <= 0:
-                if topic not in self.unseen_topics:
-                    topics_timedout.add(topic)
-                    self.unseen_topics.add(topic)
-                self.topic_ttl[topic] = self.wait_time[topic]
-
-            # Send an alert if a point hasn't been seen
-            try:
-                points = self.point_ttl[topic].keys()
-                for p in points:
-                    self.point_ttl[topic][p] -= 1
-                    if self.point_ttl[topic][p] <= 0:
-                        if (topic,p) not in self.unseen_topics:
-                            topics_timedout.add((topic, p))
-                            self.unseen_topics.add((topic, p))
-                        self.point_ttl[topic][p] = self.wait_time[topic]
-            except KeyError:
-                pass
+        heap = self._deadline_heap
+        while heap and heap[0][0] <= now:
+            scheduled, key = heapq.heappop(heap)
+            if self._scheduled.get(key) != scheduled:
+                # Replaced by an entry with an earlier deadline.
+                continue
+            deadline = self.deadlines.get(key)
+            if deadline is None:
+                # No longer watched or already timed out.
+                del self._scheduled[key]
+            elif deadline > now:
+                # Seen since this entry was pushed.
+                self._scheduled[key] = deadline
+                heapq.heappush(heap, (deadline, key))
+            else:
+                del self._scheduled[key]
+                del self.deadlines[key]
+                if key not in self.unseen_topics:
+                    topics_timedout.add(key)
+                    self.unseen_topics.add(key)
 
         if self.unseen_topics:
             self.send_alert(list(self.unseen_topics))
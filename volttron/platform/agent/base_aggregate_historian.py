@@ -40,6 +40,9 @@ from __future__ import absolute_import
 
 import copy
 import logging
+import numbers
+import re
+from collections import deque
 from datetime import datetime, timedelta
 
 import pytz
@@ -47,12 +50,131 @@ from abc import abstractmethod
 
 from volttron.platform.agent import utils
 from volttron.platform.agent.known_identities import (PLATFORM_HISTORIAN)
+from volttron.platform.messaging import topics, headers as headers_mod
 from volttron.platform.vip.agent import Agent
 from volttron.platform.vip.agent.subsystems import RPC
 
 _log = logging.getLogger(__name__)
 __version__ = '1.0'
 
+# Aggregations that can be maintained incrementally from device publishes
+STREAMING_AGGREGATIONS = ('avg', 'min', 'max', 'sum', 'count')
+
+# Number of aggregation periods ahead of the current one into which a
+# streamed value is accepted
+STREAMING_LOOKAHEAD_PERIODS = 2
+
+
+class RunningAggregate(object):
+    """
+    Running count, sum, minimum and maximum of the values recorded for a
+    single aggregation window.
+    """
+    __slots__ = ('count', 'total', 'minimum', 'maximum')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.minimum = None
+        self.maximum = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        if self.minimum is None or value < self.minimum:
+            self.minimum = value
+        if self.maximum is None or value > self.maximum:
+            self.maximum = value
+
+    def value(self, agg_type):
+        """
+        :param agg_type: one of :py:data:`STREAMING_AGGREGATIONS`
+        :return: the aggregate of the values recorded so far
+        """
+        agg_type = agg_type.lower()
+        if agg_type == 'avg':
+            return float(self.total) / self.count
+        elif agg_type == 'min':
+            return self.minimum
+        elif agg_type == 'max':
+            return self.maximum
+        elif agg_type == 'sum':
+            return self.total
+        elif agg_type == 'count':
+            return self.count
+        raise ValueError("Invalid aggregation type {}".format(agg_type))
+
+
+class _StreamingPoint(object):
+    """
+    Configured point whose aggregate is computed from device publishes.
+    """
+    def __init__(self, data):
+        self.data = data
+        self.pattern = None
+        self.topic_names = set()
+        if data.get('topic_name_pattern'):
+            self.pattern = re.compile(data['topic_name_pattern'],
+                                      re.IGNORECASE)
+        else:
+            self.topic_names = set(x.lower() for x in data['topic_names'])
+        # end time of aggregation window -> RunningAggregate
+        self.windows = {}
+
+    def matches(self, topic):
+        if self.pattern is not None:
+            return self.pattern.search(topic) is not None
+        return topic in self.topic_names
+
+
+class _StreamingGroup(object):
+    """
+    Aggregation period whose points are computed from device publishes.
+    """
+    def __init__(self, agg_time_period, use_calendar_periods, points,
+                 streaming_since):
+        self.agg_time_period = agg_time_period
+        self.use_calendar_periods = use_calendar_periods
+        self.points = points
+        # windows starting before this time contain data published before
+        # the agent subscribed so they are computed from the data store.
+        self.streaming_since = streaming_since
+        self.next_collection_time = None
+        self.window_start = None
+        self.window_end = None
+
+    def set_next_collection(self, collection_time):
+        self.next_collection_time = collection_time
+        self.window_start, self.window_end = \
+            AggregateHistorian.compute_aggregation_time_slice(
+                collection_time, self.agg_time_period,
+                self.use_calendar_periods)
+
+    def get_window_end(self, timestamp):
+        """
+        :return: end time of the aggregation window the timestamp falls in
+                 or None if that window was already recorded or is too far
+                 in the future
+        """
+        if timestamp < self.window_start:
+            return None
+        collection_time = self.next_collection_time
+        window_end = self.window_end
+        for _ in range(STREAMING_LOOKAHEAD_PERIODS):
+            if timestamp < window_end:
+                return window_end
+            collection_time = \
+                AggregateHistorian.compute_next_collection_time(
+                    collection_time, self.agg_time_period,
+                    self.use_calendar_periods)
+            _, window_end = \
+                AggregateHistorian.compute_aggregation_time_slice(
+                    collection_time, self.agg_time_period,
+                    self.use_calendar_periods)
+        if timestamp < window_end:
+            return window_end
+        return None
+
 
 class AggregateHistorian(Agent):
     """
@@ -68,6 +190,20 @@ class AggregateHistorian(Agent):
     - :py:meth:`insert_aggregate() <AggregateHistorian.insert_aggregate>`
     - :py:meth:`get_aggregation_list() <AggregateHistorian.get_aggregation_list>`
 
+    Subclasses can optionally override the following methods to support
+    batched collection and backfill of missed periods efficiently
+
+    - :py:meth:`collect_aggregates() <AggregateHistorian.collect_aggregates>`
+    - :py:meth:`insert_aggregates() <AggregateHistorian.insert_aggregates>`
+    - :py:meth:`get_last_aggregate_time() <AggregateHistorian.get_last_aggregate_time>`
+
+    When streaming_aggregation is enabled, avg, min, max, sum and count
+    aggregates are maintained in memory from device publishes and only
+    written out through
+    :py:meth:`insert_aggregates() <AggregateHistorian.insert_aggregates>`
+    at the end of each period instead of being queried from the historian's
+    data table.
+
     """
 
     def __init__(self, config_path, **kwargs):
@@ -84,6 +220,17 @@ class AggregateHistorian(Agent):
         self.topic_id_map = None
         self.aggregate_topic_id_map = None
         self.volttron_table_defs = 'volttron_table_definitions'
+        self.batch_collection = False
+        self.backfill_missed_periods = False
+        self.max_backfill_periods = 100
+        self.topic_pattern_refresh_interval = 3600
+        # topic_name_pattern -> (time of resolution, topic ids)
+        self._pattern_topic_ids = {}
+        self.streaming_aggregation = False
+        self._streaming_groups = []
+        # topic_name.lower() -> list of (_StreamingGroup, _StreamingPoint)
+        self._streaming_topics = {}
+        self._streaming_subscribed = False
 
         self.vip.config.set_default("config", config)
         self.vip.config.subscribe(self.configure, actions=["NEW", "UPDATE"],
@@ -116,6 +263,18 @@ class AggregateHistorian(Agent):
         params = connection.get('params', None)
         assert params is not None
 
+        self.batch_collection = config.get('batch_collection', False)
+        self.backfill_missed_periods = config.get('backfill_missed_periods',
+                                                  False)
+        self.max_backfill_periods = config.get('max_backfill_periods', 100)
+        self.topic_pattern_refresh_interval = config.get(
+            'topic_pattern_refresh_interval', 3600)
+        self._pattern_topic_ids = {}
+        self.streaming_aggregation = config.get('streaming_aggregation',
+                                                False)
+        self._streaming_groups = []
+        self._streaming_topics = {}
+
         self.topic_id_map, name_map = self.get_topic_map()
         self.agg_topic_id_map = self.get_agg_topic_map()
         _log.debug("In start of aggregate historian. "
@@ -142,11 +301,28 @@ class AggregateHistorian(Agent):
             else:
                 utc_collection_start_time = datetime.utcnow().replace(
                     tzinfo=pytz.utc)
-            self.collect_aggregate_data(
-                utc_collection_start_time,
-                agg_time_period,
-                use_calendar_periods,
-                agg_group['points'])
+                if self.backfill_missed_periods:
+                    self.backfill_aggregate_data(utc_collection_start_time,
+                                                 agg_time_period,
+                                                 use_calendar_periods,
+                                                 agg_group['points'])
+            points = agg_group['points']
+            if self.streaming_aggregation:
+                points = self._init_streaming_group(utc_collection_start_time,
+                                                    agg_time_period,
+                                                    use_calendar_periods,
+                                                    points)
+            if points:
+                self.collect_aggregate_data(
+                    utc_collection_start_time,
+                    agg_time_period,
+                    use_calendar_periods,
+                    points)
+        if self._streaming_groups and not self._streaming_subscribed:
+            self.vip.pubsub.subscribe(peer='pubsub',
+                                      prefix=topics.DRIVER_TOPIC_BASE,
+                                      callback=self._capture_streaming_data)
+            self._streaming_subscribed = True
         _log.debug("End of onstart method - current time{}".format(
             datetime.utcnow()))
 
@@ -206,6 +382,8 @@ class AggregateHistorian(Agent):
                 _log.info("topic_names matching the given pattern {} "
                           ":\n {}".format(topic_pattern, topic_map.keys()))
                 data['topic_ids'] = topic_map.values()
+                self._pattern_topic_ids[topic_pattern] = (
+                    utils.get_aware_utc_now(), data['topic_ids'])
 
             # Aggregating across multiple points. Check if unique topic
             # name was given for this.
@@ -315,6 +493,10 @@ class AggregateHistorian(Agent):
             _log.debug(
                 "After  compute agg_time_period = {} start_time {} end_time "
                 "{} ".format(agg_time_period, start_time, end_time))
+            if self.batch_collection:
+                self.collect_batched_aggregate_data(start_time, end_time,
+                                                    agg_time_period, points)
+                return
             for data in points:
                 _log.debug("data in loop {}".format(data))
                 topic_ids = data.get('topic_ids', None)
@@ -391,6 +573,314 @@ class AggregateHistorian(Agent):
                                        points)
             _log.debug("After Scheduling next collection.{}".format(event))
 
+    def collect_batched_aggregate_data(self, start_time, end_time,
+                                       agg_time_period, points):
+        """
+        Compute aggregates of all the given points for a single time period.
+        Points that aggregate a single topic are computed together with one
+        call to
+        :py:meth:`collect_aggregates() <AggregateHistorian.collect_aggregates>`
+        and recorded with one call to
+        :py:meth:`insert_aggregates() <AggregateHistorian.insert_aggregates>`
+        per aggregation type. Points that aggregate across multiple topics are
+        computed individually using
+        :py:meth:`collect_aggregate() <AggregateHistorian.collect_aggregate>`
+
+        :param start_time: start time of the period (inclusive)
+        :param end_time: end time of the period (exclusive)
+        :param agg_time_period: time period of the aggregation
+        :param points: list of configured points for the aggregation period
+        """
+        single_topic_points = []
+        agg_types = set()
+        # agg_type -> list of (agg_topic_id, value, topic_ids)
+        records = {}
+        for data in points:
+            topic_ids = self._get_topic_ids(data)
+            if not topic_ids:
+                _log.warn(
+                    "Skipping recording of aggregate data for {topic} "
+                    "between {start_time} and {end_time} as no matching "
+                    "topics were found".format(
+                        topic=data.get('topic_name_pattern'),
+                        start_time=start_time,
+                        end_time=end_time))
+                continue
+            if len(topic_ids) == 1:
+                single_topic_points.append((data, topic_ids))
+                agg_types.add(data['aggregation_type'].lower())
+                continue
+            agg_value, count = self.collect_aggregate(
+                topic_ids,
+                data['aggregation_type'],
+                start_time,
+                end_time)
+            if self._has_min_count(data, count, start_time, end_time):
+                records.setdefault(data['aggregation_type'], []).append(
+                    (self._get_agg_topic_id(data, agg_time_period),
+                     agg_value, topic_ids))
+
+        if single_topic_points:
+            results = self.collect_aggregates(
+                list(set(ids[0] for _, ids in single_topic_points)),
+                sorted(agg_types),
+                start_time,
+                end_time)
+            for data, topic_ids in single_topic_points:
+                row = results.get(topic_ids[0], {})
+                if self._has_min_count(data, row.get('count', 0),
+                                       start_time, end_time):
+                    records.setdefault(data['aggregation_type'], []).append(
+                        (self._get_agg_topic_id(data, agg_time_period),
+                         row[data['aggregation_type'].lower()],
+                         topic_ids))
+
+        for agg_type, rows in records.items():
+            self.insert_aggregates(agg_type, agg_time_period, end_time, rows)
+
+    def backfill_aggregate_data(self, collection_time, agg_time_period,
+                                use_calendar_periods, points):
+        """
+        Compute aggregates for the periods that were missed while the
+        aggregate historian was not running. The time of the most recent
+        aggregate recorded for the configured points is queried using
+        :py:meth:`get_last_aggregate_time() <AggregateHistorian.get_last_aggregate_time>`
+        and every period between that time and the given collection time is
+        collected using
+        :py:meth:`collect_batched_aggregate_data() <AggregateHistorian.collect_batched_aggregate_data>`.
+        At most max_backfill_periods most recent periods are collected.
+
+        :param collection_time: time of the first regular aggregate
+                                collection
+        :param agg_time_period: time period of the aggregation
+        :param use_calendar_periods: flag that indicates if time
+                                     agg_time_period should be aligned
+                                     to calendar times
+        :param points: list of configured points for the aggregation period
+        """
+        last_times = []
+        for data in points:
+            last_time = self.get_last_aggregate_time(
+                data['aggregation_type'],
+                agg_time_period,
+                [self._get_agg_topic_id(data, agg_time_period)])
+            if last_time is not None:
+                if last_time.tzinfo is None:
+                    last_time = last_time.replace(tzinfo=pytz.utc)
+                last_times.append(last_time)
+        if not last_times:
+            _log.debug("No aggregates recorded for period {}. Nothing to "
+                       "backfill".format(agg_time_period))
+            return
+
+        missed = deque(maxlen=self.max_backfill_periods)
+        backfill_time = AggregateHistorian.compute_next_collection_time(
+            min(last_times), agg_time_period, use_calendar_periods)
+        while backfill_time < collection_time:
+            missed.append(backfill_time)
+            backfill_time = AggregateHistorian.compute_next_collection_time(
+                backfill_time, agg_time_period, use_calendar_periods)
+        if len(missed) == self.max_backfill_periods:
+            _log.warn("Backfilling only the last {} periods of aggregation "
+                      "period {}".format(self.max_backfill_periods,
+                                         agg_time_period))
+
+        _log.info("Backfilling {} missed periods of aggregation period "
+                  "{}".format(len(missed), agg_time_period))
+        for backfill_time in missed:
+            start_time, end_time = \
+                AggregateHistorian.compute_aggregation_time_slice(
+                    backfill_time, agg_time_period, use_calendar_periods)
+            self.collect_batched_aggregate_data(start_time, end_time,
+                                                agg_time_period, points)
+
+    def _get_topic_ids(self, data):
+        """
+        Returns the topic ids of a configured point. Topic ids matching a
+        topic_name_pattern are cached and resolved again using the platform
+        historian only after topic_pattern_refresh_interval seconds.
+        """
+        topic_pattern = data.get('topic_name_pattern', None)
+        if not topic_pattern:
+            return data.get('topic_ids', None)
+        now = utils.get_aware_utc_now()
+        resolved = self._pattern_topic_ids.get(topic_pattern)
+        if resolved and (now - resolved[0]).total_seconds() < \
+                self.topic_pattern_refresh_interval:
+            return resolved[1]
+        topic_map = self.vip.rpc.call(
+            PLATFORM_HISTORIAN,
+            "get_topics_by_pattern",
+            topic_pattern=topic_pattern).get()
+        _log.debug("Found topics for pattern {}".format(topic_map))
+        topic_ids = topic_map.values() if topic_map else []
+        self._pattern_topic_ids[topic_pattern] = (now, topic_ids)
+        return topic_ids
+
+    def _get_agg_topic_id(self, data, agg_time_period):
+        return self.agg_topic_id_map[
+            data['aggregation_topic_name'].lower(),
+            data['aggregation_type'].lower(),
+            agg_time_period]
+
+    @staticmethod
+    def _has_min_count(data, count, start_time, end_time):
+        """
+        Checks if enough records were found for a configured point to record
+        its aggregate.
+        """
+        topic = data.get('topic_name_pattern') or data['topic_names']
+        if count == 0:
+            _log.warn(
+                "No records found for topic {topic} between "
+                "{start_time} and {end_time}".format(
+                    topic=topic,
+                    start_time=start_time,
+                    end_time=end_time))
+            return False
+        if count < data.get('min_count', 0):
+            _log.warn(
+                "Skipping recording of aggregate data for {topic} "
+                "between {start_time} and {end_time} as number of "
+                "records is less than minimum allowed("
+                "{count})".format(
+                    topic=topic,
+                    start_time=start_time,
+                    end_time=end_time,
+                    count=data.get('min_count', 0)))
+            return False
+        return True
+
+    def _init_streaming_group(self, collection_time, agg_time_period,
+                              use_calendar_periods, points):
+        """
+        Set up in memory aggregation for the points of an aggregation period
+        that support it and schedule the first flush.
+
+        :return: list of points that still need to be collected periodically
+                 from the historian's data store
+        """
+        if agg_time_period[-1:] == 'M':
+            # calendar month periods overlap between collections
+            return points
+        streamed = []
+        periodic = []
+        for data in points:
+            if data['aggregation_type'].lower() in STREAMING_AGGREGATIONS:
+                streamed.append(_StreamingPoint(data))
+            else:
+                periodic.append(data)
+        if streamed:
+            group = _StreamingGroup(agg_time_period, use_calendar_periods,
+                                    streamed, utils.get_aware_utc_now())
+            group.set_next_collection(collection_time)
+            self._streaming_groups.append(group)
+            self.flush_streaming_aggregate_data(group, collection_time)
+        return periodic
+
+    def _get_streaming_points(self, topic):
+        try:
+            return self._streaming_topics[topic]
+        except KeyError:
+            matches = [(group, point) for group in self._streaming_groups
+                       for point in group.points if point.matches(topic)]
+            self._streaming_topics[topic] = matches
+            return matches
+
+    def _capture_streaming_data(self, peer, sender, bus, topic, headers,
+                                message):
+        """
+        Record the values of a device publish into the running aggregates of
+        the configured points.
+        """
+        if not topic.endswith('/all'):
+            return
+        timestamp = None
+        timestamp_string = headers.get(headers_mod.DATE, None)
+        if timestamp_string is not None:
+            timestamp, _ = utils.process_timestamp(timestamp_string, topic)
+        if timestamp is None:
+            timestamp = utils.get_aware_utc_now()
+
+        values = message if isinstance(message, dict) else message[0]
+        device = topic[len(topics.DRIVER_TOPIC_BASE) + 1:-len('/all')]
+        window_ends = {}
+        for point_name, value in values.iteritems():
+            if not isinstance(value, numbers.Number) or \
+                    isinstance(value, bool):
+                continue
+            matches = self._get_streaming_points(
+                (device + '/' + point_name).lower())
+            for group, point in matches:
+                try:
+                    window_end = window_ends[group]
+                except KeyError:
+                    window_end = window_ends[group] = \
+                        group.get_window_end(timestamp)
+                if window_end is None:
+                    continue
+                try:
+                    point.windows[window_end].add(value)
+                except KeyError:
+                    point.windows[window_end] = RunningAggregate()
+                    point.windows[window_end].add(value)
+
+    def flush_streaming_aggregate_data(self, group, collection_time):
+        """
+        Record the aggregates of a streamed aggregation period that ended at
+        the given collection time and schedule the next flush. Periods that
+        started before the agent subscribed to device publishes are computed
+        from the historian's data store instead.
+
+        :param group: _StreamingGroup for the aggregation period
+        :param collection_time: time of aggregation collection
+        """
+        if group not in self._streaming_groups:
+            # agent was reconfigured
+            return
+        agg_time_period = group.agg_time_period
+        start_time, end_time = \
+            AggregateHistorian.compute_aggregation_time_slice(
+                collection_time, agg_time_period, group.use_calendar_periods)
+        try:
+            if start_time < group.streaming_since:
+                for point in group.points:
+                    for window_end in point.windows.keys():
+                        if window_end <= end_time:
+                            del point.windows[window_end]
+                self.collect_batched_aggregate_data(
+                    start_time, end_time, agg_time_period,
+                    [point.data for point in group.points])
+                return
+
+            # (agg_type, window end) -> list of (agg_topic_id, value, [])
+            records = {}
+            for point in group.points:
+                data = point.data
+                for window_end in sorted(point.windows.keys()):
+                    if window_end > end_time:
+                        continue
+                    running = point.windows.pop(window_end)
+                    if self._has_min_count(data, running.count,
+                                           start_time, window_end):
+                        records.setdefault(
+                            (data['aggregation_type'], window_end),
+                            []).append(
+                            (self._get_agg_topic_id(data, agg_time_period),
+                             running.value(data['aggregation_type']),
+                             data.get('topic_ids', [])))
+            for (agg_type, window_end), rows in records.items():
+                self.insert_aggregates(agg_type, agg_time_period,
+                                       window_end, rows)
+        finally:
+            collection_time = AggregateHistorian.compute_next_collection_time(
+                collection_time, agg_time_period, group.use_calendar_periods)
+            group.set_next_collection(collection_time)
+            self.core.schedule(collection_time,
+                               self.flush_streaming_aggregate_data,
+                               group,
+                               collection_time)
+
     @abstractmethod
     def get_topic_map(self):
         """
@@ -487,6 +977,72 @@ class AggregateHistorian(Agent):
         """
         pass
 
+    def collect_aggregates(self, topic_ids, agg_types, start_time, end_time):
+        """
+        Collect aggregates of each of the given topics individually by
+        querying the historian's data store. Used when batch_collection is
+        enabled. Subclasses should override this to compute all the
+        aggregates in a single query. The default implementation calls
+        :py:meth:`collect_aggregate() <AggregateHistorian.collect_aggregate>`
+        once per topic and aggregation type.
+
+        :param topic_ids: list of topic ids for which aggregation should be
+                          performed.
+        :param agg_types: list of aggregation types
+        :param start_time: start time for query (inclusive)
+        :param end_time:  end time for query (exclusive)
+        :return: dictionary of format
+        ::
+
+            {topic_id: {'count': number of records,
+                        agg_type.lower(): aggregated value,
+                        ...},
+             ...}
+
+        """
+        results = {}
+        for topic_id in topic_ids:
+            for agg_type in agg_types:
+                value, count = self.collect_aggregate([topic_id], agg_type,
+                                                      start_time, end_time)
+                if not count:
+                    break
+                row = results.setdefault(topic_id, {'count': count})
+                row[agg_type.lower()] = value
+        return results
+
+    def insert_aggregates(self, agg_type, agg_time_period, end_time, rows):
+        """
+        Insert aggregates collected for several aggregate topics for the same
+        time period. Subclasses should override this to insert all the rows
+        at once. The default implementation calls
+        :py:meth:`insert_aggregate() <AggregateHistorian.insert_aggregate>`
+        for each row.
+
+        :param agg_type: type of aggregation
+        :param agg_time_period: The time period of aggregation
+        :param end_time: end time used for query records that got aggregated
+        :param rows: list of tuples (agg_topic_id, value, topic_ids)
+        """
+        for agg_topic_id, value, topic_ids in rows:
+            self.insert_aggregate(agg_topic_id, agg_type, agg_time_period,
+                                  end_time, value, topic_ids)
+
+    def get_last_aggregate_time(self, agg_type, agg_time_period,
+                                agg_topic_ids):
+        """
+        Get the end time of the most recent aggregate recorded for the
+        given aggregate topics. Used to backfill periods that were missed
+        while the agent was not running. Returns None by default which
+        disables backfill.
+
+        :param agg_type: type of aggregation
+        :param agg_time_period: The time period of aggregation
+        :param agg_topic_ids: list of aggregate topic ids
+        :return: end time of the latest recorded aggregate or None
+        """
+        return None
+
     def is_supported_aggregation(self, agg_type):
         """
         Checks if the given aggregation is supported by the historian's
@@ -264,6 +264,7 @@ try:
 except ImportError:
     from zmq.utils.jsonapi import dumps, loads
 
+from volttron.platform.agent import json as jsonapi
 from volttron.platform.agent import utils
 
 _log = logging.getLogger(__name__)
@@ -1276,6 +1277,119 @@ class BaseHistorianAgent(Agent):
 #             my_deque.popleft()
 
 
+class TopicRegistry(object):
+    """
+    Cache of the topic ids, topic names and metadata a historian has stored
+    in its backend.
+
+    Topic names are looked up case insensitively. Metadata is compared by
+    hash so that checking an incoming record for a metadata change does not
+    require comparing dictionaries. Changed metadata is queued until the
+    historian calls :py:meth:`pop_pending_meta` so that it can be written to
+    the backend in a single batch along with the data.
+
+    Historian implementors may use this class from
+    :py:meth:`BaseHistorianAgent.publish_to_historian`. It is warmed up by
+    calling :py:meth:`load` from :py:meth:`BaseHistorianAgent.historian_setup`.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._names = {}
+        self._meta = {}
+        self._meta_hashes = {}
+        self._pending_meta = {}
+
+    @staticmethod
+    def meta_hash(meta):
+        """
+        Returns a hash of a metadata dictionary that does not depend on the
+        order of its keys.
+        """
+        try:
+            return hash(frozenset(meta.iteritems()))
+        except TypeError:
+            # metadata with unhashable values such as lists
+            return hash(jsonapi.dumps(meta, sort_keys=True))
+
+    def load(self, topic_id_map, topic_name_map, topic_meta=None):
+        """
+        Replace the contents of the registry with topics read from the
+        backend.
+
+        :param topic_id_map: dictionary of lower case topic name: topic id
+        :param topic_name_map: dictionary of lower case topic name: topic
+            name as stored in the backend
+        :param topic_meta: optional dictionary of topic id: metadata
+        """
+        self._ids = dict(topic_id_map)
+        self._names = dict(topic_name_map)
+        self._meta = {}
+        self._meta_hashes = {}
+        self._pending_meta = {}
+        for topic_id, meta in (topic_meta or {}).iteritems():
+            self._meta[topic_id] = meta
+            self._meta_hashes[topic_id] = self.meta_hash(meta)
+
+    def get_id(self, topic):
+        return self._ids.get(topic.lower())
+
+    def get_name(self, topic):
+        return self._names.get(topic.lower())
+
+    def get_meta(self, topic_id):
+        return self._meta.get(topic_id)
+
+    def topic_names(self):
+        return self._names.values()
+
+    def id_map(self):
+        return self._ids
+
+    def add(self, topic, topic_id):
+        """
+        Register a topic that was inserted in, or renamed in, the backend.
+        """
+        self._ids[topic.lower()] = topic_id
+        self._names[topic.lower()] = topic
+
+    def update_meta(self, topic_id, meta):
+        """
+        Record the metadata of a topic.
+
+        :return: True if the metadata changed and was queued for writing
+        """
+        meta_hash = self.meta_hash(meta)
+        if self._meta_hashes.get(topic_id) == meta_hash:
+            return False
+        self._meta[topic_id] = meta
+        self._meta_hashes[topic_id] = meta_hash
+        self._pending_meta[topic_id] = meta
+        return True
+
+    def pop_pending_meta(self):
+        """
+        :return: list of (topic id, metadata) tuples changed since the last
+            call
+        """
+        pending = self._pending_meta.items()
+        self._pending_meta = {}
+        return pending
+
+    def discard_pending_meta(self, pending=None):
+        """
+        Forget the hashes of metadata that could not be written so that it is
+        queued again the next time the topic is published.
+
+        :param pending: list returned by :py:meth:`pop_pending_meta`. If
+            omitted metadata still queued is discarded.
+        """
+        if pending is None:
+            pending = self.pop_pending_meta()
+        for topic_id, _ in pending:
+            self._meta_hashes.pop(topic_id, None)
+
+
 class BackupDatabase:
     """
     A creates and manages backup cache for the
@@ -40,3 +40,5 @@ NOT_FORMED = 'not formed'
 SHORT_OFFERS = 'not enough offers'
 NO_INTERSECT = 'no curve intersection'
 BAD_STATE = 'bad state transition' # This error should never happen.
+CLEARING_TIMEOUT = 'clearing deadline missed'
+CLEARING_FAILED = 'clearing failed'
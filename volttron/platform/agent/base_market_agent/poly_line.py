@@ -74,6 +74,39 @@ class PolyLine:
             self._max_x = PolyLine.max(self._max_x, point.x)
             self._max_y = PolyLine.max(self._max_y, point.y)
 
+    def add_all(self, points):
+        """
+        Add many points at once. The result is the same as calling add for
+        each point in turn but the list is sorted at most once.
+        """
+        if self.points is None:
+            self.points = []
+        seen = set(self.points)
+        last = self.points[-1] if self.points else None
+        largest = max(self.points) if self.points else None
+        sort_upto = 0
+        for point in points:
+            if point in seen:
+                continue
+            seen.add(point)
+            self.points.append(point)
+            largest = point if largest is None else max(largest, point)
+            if last is not None and point.x < last.x:
+                # add would sort here, after which the largest point is last.
+                sort_upto = len(self.points)
+                last = largest
+            else:
+                last = point
+            if point.x is not None and point.y is not None:
+                self._min_x = PolyLine.min(self._min_x, point.x)
+                self._min_y = PolyLine.min(self._min_y, point.y)
+                self._max_x = PolyLine.max(self._max_x, point.x)
+                self._max_y = PolyLine.max(self._max_y, point.y)
+        if sort_upto:
+            self.points[:sort_upto] = sorted(self.points[:sort_upto])
+        self.xs = None
+        self.ys = None
+
     def contains_none(self):
         result = False
         if self.points is not None and len(self.points) > 0:
@@ -210,6 +243,36 @@ class PolyLine:
         if (l1[1][0] == l2[0][0] and l1[1][1] == l2[0][1]) or (l1[1][0] == l2[1][0] and l1[1][1] == l2[1][1]):
             return True
 
+    @staticmethod
+    def segments_intersect(pl_1, pl_2):
+        """
+        Vectorized segment_intersects for every pair of segments of two lines.
+        Returns a boolean array indexed by [segment of pl_1, segment of pl_2].
+        """
+        points_1 = np.array(pl_1, dtype=float)
+        points_2 = np.array(pl_2, dtype=float)
+        # Segment start and end points as column (pl_1) and row (pl_2)
+        # vectors so they broadcast to every pair.
+        a, b = points_1[:-1, np.newaxis, :], points_1[1:, np.newaxis, :]
+        c, d = points_2[np.newaxis, :-1, :], points_2[np.newaxis, 1:, :]
+
+        def ccw(p1, p2, p3):
+            return (p3[..., 1] - p1[..., 1]) * (p2[..., 0] - p1[..., 0]) > \
+                   (p2[..., 1] - p1[..., 1]) * (p3[..., 0] - p1[..., 0])
+
+        def same(p1, p2):
+            return (p1[..., 0] == p2[..., 0]) & (p1[..., 1] == p2[..., 1])
+
+        with np.errstate(invalid='ignore'):
+            result = ((ccw(a, c, d) != ccw(b, c, d)) & (ccw(a, b, c) != ccw(a, b, d)))
+            result |= same(a, c) | same(a, d) | same(b, c) | same(b, d)
+        # segment_intersects never matches segments with missing values.
+        missing = np.isnan(points_1).any(axis=1)
+        result[missing[:-1] | missing[1:], :] = False
+        missing = np.isnan(points_2).any(axis=1)
+        result[:, missing[:-1] | missing[1:]] = False
+        return result
+
     @staticmethod
     def between(a, b, c):
         if (a[0] is None or a[1] is None or b[0] is None or b[1] is None or c[0] is None or c[1] is None):
@@ -254,13 +317,14 @@ class PolyLine:
 
         # we have line segments
         elif len(pl_1) > 1 and len(pl_2) > 1:
-            for i, pl_1_1 in enumerate(pl_1[:-1]):
-                pl_1_2 = pl_1[i + 1]
-                for j, pl_2_1 in enumerate(pl_2[:-1]):
-                    pl_2_2 = pl_2[j + 1]
-                    if PolyLine.segment_intersects((pl_1_1, pl_1_2), (pl_2_1, pl_2_2)):
-                        quantity, price = PolyLine.segment_intersection((pl_1_1, pl_1_2), (pl_2_1, pl_2_2))
-                        return quantity, price
+            intersects = PolyLine.segments_intersect(pl_1, pl_2)
+            if intersects.any():
+                # The first intersecting pair in the order the segments
+                # appear in each line.
+                i, j = np.unravel_index(np.argmax(intersects), intersects.shape)
+                quantity, price = PolyLine.segment_intersection((pl_1[i], pl_1[i + 1]),
+                                                                (pl_2[j], pl_2[j + 1]))
+                return quantity, price
 
         # The lines don't intersect, add the auxillary information
         quantity = None
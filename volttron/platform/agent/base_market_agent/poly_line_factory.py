@@ -79,20 +79,23 @@ class PolyLineFactory(object):
         # create an array of ys in equal increments, with highest first
         # this is assuming that price decreases with increase in demand (buyers!)
         # but seems to work with multiple suppliers?
-        ys = sorted(np.linspace(minY, maxY, num=increment), reverse=True)
-        # print ys
-        # print minY, maxY
+        ys = np.linspace(minY, maxY, num=increment)[::-1]
 
         # now find the cumulative x associated with each y in the array
-        # starting with the highest y
-        for y in ys:
-            xt = None
-            for line in lines:
-                x = line.x(y, left=np.nan)
-                # print x, y
-                if x is not None:
-                    xt = x if xt is None else xt + x
-            composite.add(Point(xt, y))
+        # starting with the highest y. Each row holds the x of one line
+        # at every y, nan where y is below the line.
+        xs = np.empty((len(lines), len(ys)))
+        for row, line in enumerate(lines):
+            if not line.points:
+                xs[row] = np.nan
+                continue
+            line.vectorize()
+            xs[row] = np.interp(ys, line.ysSortedByY, line.xsSortedByY, left=np.nan)
+        defined = ~np.isnan(xs)
+        xts = np.where(defined, xs, 0.0).sum(axis=0)
+
+        composite.add_all([Point(xt if has_x else None, y)
+                           for xt, y, has_x in zip(xts, ys, defined.any(axis=0))])
 
         return composite
 
@@ -131,6 +131,28 @@ def test_poly_line_no_intersection():
     intersection = PolyLine.intersection(demand1, demand2)
     assert len(intersection) == 2
 
+@pytest.mark.market
+def test_poly_line_add_all_matches_add():
+    points = [Point(4,8), Point(2,4), Point(2,4), Point(6,2), Point(6,1), Point(5,3)]
+    line = PolyLine()
+    for point in points:
+        line.add(point)
+    batch = PolyLine()
+    batch.add_all(points)
+    assert batch.points == line.points
+    assert batch.min_x() == 2
+    assert batch.max_y() == 8
+
+@pytest.mark.market
+def test_poly_line_intersection_segments():
+    demand = PolyLine()
+    demand.add_all([Point(0,10), Point(4,6), Point(8,2), Point(10,0)])
+    supply = PolyLine()
+    supply.add_all([Point(0,0), Point(2,2), Point(8,4), Point(10,10)])
+    quantity, price = PolyLine.intersection(demand, supply)
+    assert quantity == pytest.approx(6.5)
+    assert price == pytest.approx(3.5)
+
 def create_supply_curve():
     supply_curve = PolyLine()
     price = 0
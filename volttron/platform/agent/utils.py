@@ -61,12 +61,15 @@ from tzlocal import get_localzone
 from volttron.platform.agent import json as jsonapi
 
 try:
-    from ..lib.inotify.green import inotify, IN_MODIFY
+    from ..lib.inotify.green import (inotify, IN_MODIFY, IN_CREATE,
+                                     IN_MOVED_TO)
 except AttributeError:
     # inotify library is not available on OS X/MacOS.
     # @TODO Integrate with the OS X FS Events API
     inotify = None
     IN_MODIFY = None
+    IN_CREATE = None
+    IN_MOVED_TO = None
 
 __all__ = ['load_config', 'run_agent', 'start_agent_thread',
            'is_valid_identity']
@@ -544,19 +547,26 @@ def watch_file(fullpath, callback):
                     callback()
 
 
-def watch_file_with_fullpath(fullpath, callback):
+def watch_file_with_fullpath(fullpath, callback, replaced=False):
     """Run callback method whenever the file changes
 
+        If replaced is True the callback is also run when a new file is
+        created or moved into place at fullpath, as happens when a log file
+        is rotated.
+
         Not available on OS X/MacOS.
     """
     dirname, filename = os.path.split(fullpath)
     if inotify is None:
         _log.warning("Runtime changes to: %s not supported on this platform.", fullpath)
     else:
+        mask = IN_MODIFY
+        if replaced:
+            mask |= IN_CREATE | IN_MOVED_TO
         with inotify() as inot:
-            inot.add_watch(dirname, IN_MODIFY)
+            inot.add_watch(dirname, mask)
             for event in inot:
-                if event.name == filename and event.mask & IN_MODIFY:
+                if event.name == filename and event.mask & mask:
                     callback(fullpath)
 
 
@@ -47,6 +47,7 @@ import random
 import re
 import shutil
 import uuid
+from collections import OrderedDict, defaultdict
 
 import gevent
 from gevent.fileobject import FileObject
@@ -99,6 +100,7 @@ class AuthService(Agent):
         self.zap_socket = None
         self._zap_greenlet = None
         self.auth_entries = []
+        self._auth_index = AuthEntryIndex([])
         self._is_connected = False
         self._protected_topics_file = protected_topics_file
         self._protected_topics_file_path = os.path.abspath(protected_topics_file)
@@ -124,6 +126,8 @@ class AuthService(Agent):
         # sort the entries so the regex credentails follow the concrete creds
         entries.sort()
         self.auth_entries = entries
+        # Replacing the index also discards its cached lookups.
+        self._auth_index = AuthEntryIndex(entries)
         _log.info('auth file %s loaded', self.auth_file_path)
         if self._is_connected:
             self._send_update()
@@ -266,10 +270,10 @@ class AuthService(Agent):
             timeout = (wait_list[0][0] - now) if wait_list else None
 
     def authenticate(self, domain, address, mechanism, credentials):
-        for entry in self.auth_entries:
-            if entry.match(domain, address, mechanism, credentials):
-                return entry.user_id or dump_user(
-                    domain, address, mechanism, *credentials[:1])
+        entry = self._auth_index.find(domain, address, mechanism, credentials)
+        if entry is not None:
+            return entry.user_id or dump_user(
+                domain, address, mechanism, *credentials[:1])
         if mechanism == 'NULL' and address.startswith('localhost:'):
             parts = address.split(':')[1:]
             if len(parts) > 2:
@@ -308,17 +312,7 @@ class AuthService(Agent):
         :returns: tuple of capabiliy-list, group-list, role-list
         :rtype: tuple
         """
-        use_parts = True
-        try:
-            domain, address, mechanism, credentials = load_user(user_id)
-        except ValueError:
-            use_parts = False
-        for entry in self.auth_entries:
-            if entry.user_id == user_id:
-                return [entry.capabilities, entry.groups, entry.roles]
-            elif use_parts:
-                if entry.match(domain, address, mechanism, [credentials]):
-                    return entry.capabilities, entry.groups, entry.roles
+        return self._auth_index.find_authorizations(user_id)
 
     @RPC.export
     def get_authorization_failures(self):
@@ -550,6 +544,99 @@ class AuthEntry(object):
         AuthEntry.valid_credentials(self.credentials, self.mechanism)
 
 
+class AuthEntryIndex(object):
+    """Indexed lookup of a sorted list of enabled AuthEntry objects.
+
+    Entries with plain (non-regex) credentials are indexed by mechanism and
+    credential. Entries with regex credentials and NULL entries, which ignore
+    credentials, are kept in a fallback list that is still walked in order.
+    Lookups return the same entry as walking the whole list in order would.
+    Results are kept in a bounded LRU cache, so a new index must be built
+    whenever the entries change.
+
+    :param list entries: AuthEntry objects in the order they are checked
+    :param int cache_size: Maximum number of cached lookups
+    """
+    def __init__(self, entries, cache_size=1024):
+        self.entries = entries
+        self.cache_size = cache_size
+        self._by_credentials = defaultdict(list)
+        self._fallback = []
+        self._by_user_id = {}
+        self._cache = OrderedDict()
+        for position, entry in enumerate(entries):
+            self._by_user_id.setdefault(entry.user_id, (position, entry))
+            credentials = entry.credentials
+            if entry.mechanism == 'NULL' or credentials is None:
+                self._fallback.append((position, entry))
+                continue
+            if not isinstance(credentials, list):
+                credentials = [credentials]
+            if any(hasattr(cred, 'regex') for cred in credentials):
+                self._fallback.append((position, entry))
+                continue
+            for cred in set(credentials):
+                self._by_credentials[(entry.mechanism, cred)].append(
+                    (position, entry))
+
+    def _cached(self, key, lookup, *args):
+        cache = self._cache
+        try:
+            result = cache.pop(key)
+        except KeyError:
+            result = lookup(*args)
+            if len(cache) >= self.cache_size:
+                cache.popitem(last=False)
+        cache[key] = result
+        return result
+
+    def find(self, domain, address, mechanism, credentials):
+        """Returns the first entry matching the connection or None."""
+        key = (domain, address, mechanism, tuple(credentials[:1]))
+        result = self._cached(key, self._find, domain, address, mechanism,
+                              credentials)
+        return result[1] if result else None
+
+    def _find(self, domain, address, mechanism, credentials):
+        found = None
+        if credentials:
+            candidates = self._by_credentials.get((mechanism, credentials[0]),
+                                                  ())
+            for position, entry in candidates:
+                if entry.match(domain, address, mechanism, credentials):
+                    found = position, entry
+                    break
+        for position, entry in self._fallback:
+            if found is not None and position > found[0]:
+                break
+            if entry.match(domain, address, mechanism, credentials):
+                return position, entry
+        return found
+
+    def find_authorizations(self, user_id):
+        """Returns the capabilities, groups and roles of the first entry
+        whose user_id matches or whose fields match the parts of a user_id
+        created by dump_user, or None."""
+        return self._cached(('user_id', user_id), self._find_authorizations,
+                            user_id)
+
+    def _find_authorizations(self, user_id):
+        by_user_id = self._by_user_id.get(user_id)
+        try:
+            domain, address, mechanism, credentials = load_user(user_id)
+        except ValueError:
+            by_parts = None
+        else:
+            by_parts = self._find(domain, address, mechanism, [credentials])
+        if by_user_id is not None and (by_parts is None or
+                                       by_user_id[0] <= by_parts[0]):
+            entry = by_user_id[1]
+            return [entry.capabilities, entry.groups, entry.roles]
+        if by_parts is not None:
+            entry = by_parts[1]
+            return entry.capabilities, entry.groups, entry.roles
+
+
 class AuthFile(object):
     def __init__(self, auth_file=None):
         if auth_file is None:
@@ -66,6 +66,7 @@ from . import aip as aipmod
 from . import config
 from .jsonrpc import RemoteError
 from .vip.agent.errors import VIPError
+from .messaging import topics
 from .auth import AuthEntry, AuthFile, AuthException
 from .keystore import KeyStore, KnownHostsStore
 
@@ -90,13 +91,20 @@ CHUNK_SIZE = 4096
 class ControlService(BaseAgent):
     def __init__(self, aip, *args, **kwargs):
         tracker = kwargs.pop('tracker', None)
+        metrics = kwargs.pop('metrics', None)
+        metrics_interval = kwargs.pop('metrics_interval', 0)
         kwargs["enable_store"] = False
         super(ControlService, self).__init__(*args, **kwargs)
         self._aip = aip
         self._tracker = tracker
+        self._metrics = metrics
+        self._metrics_interval = metrics_interval
 
     @Core.receiver('onsetup')
     def _setup(self, sender, **kwargs):
+        if self._metrics:
+            self.vip.rpc.export(self._metrics.snapshot, 'stats.metrics')
+            self.vip.rpc.export(self._metrics.reset, 'stats.metrics_reset')
         if not self._tracker:
             return
         self.vip.rpc.export(lambda: self._tracker.enabled, 'stats.enabled')
@@ -104,6 +112,15 @@ class ControlService(BaseAgent):
         self.vip.rpc.export(self._tracker.disable, 'stats.disable')
         self.vip.rpc.export(lambda: self._tracker.stats, 'stats.get')
 
+    @Core.receiver('onstart')
+    def _start_metrics(self, sender, **kwargs):
+        if self._metrics and self._metrics_interval > 0:
+            self.core.periodic(self._metrics_interval, self._publish_metrics)
+
+    def _publish_metrics(self):
+        self.vip.pubsub.publish('pubsub', topics.PLATFORM_METRICS,
+                                message=self._metrics.snapshot())
+
     @RPC.export
     def serverkey(self):
         q = Query(self.core)
@@ -851,6 +868,11 @@ def do_stats(opts):
     if opts.op == 'status':
         _stdout.write(
             '%sabled\n' % ('en' if call('stats.enabled') else 'dis'))
+    elif opts.op == 'metrics':
+        import pprint
+        pprint.pprint(call('stats.metrics'), _stdout)
+    elif opts.op == 'reset-metrics':
+        call('stats.metrics_reset')
     elif opts.op in ['dump', 'pprint']:
         stats = call('stats.get')
         if opts.op == 'pprint':
@@ -1932,7 +1954,8 @@ def main(argv=sys.argv):
     stats = add_parser('stats',
                        help='manage router message statistics tracking')
     op = stats.add_argument(
-        'op', choices=['status', 'enable', 'disable', 'dump', 'pprint'],
+        'op', choices=['status', 'enable', 'disable', 'dump', 'pprint',
+                       'metrics', 'reset-metrics'],
         nargs='?')
     stats.set_defaults(func=do_stats, op='status')
 
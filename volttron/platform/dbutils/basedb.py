@@ -164,6 +164,30 @@ class DbDriver(object):
         """
         pass
 
+    def get_topic_map_and_meta(self):
+        """
+        Returns details of topics in database along with their metadata
+        using a single query
+
+        :return: three dictionaries.
+        - First one maps topic_name.lower() to topic id
+        - Second one maps topic_name.lower() to topic name
+        - Third one maps topic id to metadata for topics that have metadata
+        """
+        rows = self.select(
+            "SELECT t.topic_id, t.topic_name, m.metadata FROM " +
+            self.topics_table + " t LEFT JOIN " + self.meta_table +
+            " m ON t.topic_id = m.topic_id", None)
+        id_map = dict()
+        name_map = dict()
+        meta_map = dict()
+        for topic_id, name, metadata in rows:
+            id_map[name.lower()] = topic_id
+            name_map[name.lower()] = name
+            if metadata is not None:
+                meta_map[topic_id] = jsonapi.loads(metadata)
+        return id_map, name_map, meta_map
+
     @abstractmethod
     def get_agg_topics(self):
         """
@@ -276,6 +300,19 @@ class DbDriver(object):
                           (topic_id, jsonapi.dumps(metadata)), commit=False)
         return True
 
+    def insert_meta_many(self, rows):
+        """
+        Inserts metadata for several topics in a single batch
+
+        :param rows: list of (topic_id, metadata) tuples
+        :return: True if execution completes. Raises exception if unable to
+        connect to database
+        """
+        self.execute_many(self.insert_meta_query(),
+                          [(topic_id, jsonapi.dumps(metadata))
+                           for topic_id, metadata in rows], commit=False)
+        return True
+
     def insert_data(self, ts, topic_id, data):
         """
         Inserts data for topic
@@ -570,3 +607,77 @@ class DbDriver(object):
                  this aggregation was computed)
         """
         pass
+
+    def collect_aggregates(self, topic_ids, agg_types, start=None, end=None):
+        """
+        Collect aggregates for each of the given topics individually.
+        Subclasses should override this with a single query grouped by
+        topic id. The default implementation calls
+        :py:meth:`collect_aggregate` once per topic and aggregation type.
+
+        :param topic_ids: list of topic ids for which aggregates should be
+                          computed.
+        :param agg_types: list of aggregation types to compute for every
+                          topic
+        :param start: start time for query (inclusive)
+        :param end:  end time for query (exclusive)
+        :return: dictionary of format
+        .. code-block:: python
+
+            {topic_id: {'count': number of records,
+                        agg_type.lower(): aggregated value,
+                        ...},
+             ...}
+
+        Topics without any records in the given time range are omitted
+        """
+        results = {}
+        for topic_id in topic_ids:
+            for agg_type in agg_types:
+                value, count = self.collect_aggregate([topic_id], agg_type,
+                                                      start, end)
+                if not count:
+                    break
+                row = results.setdefault(topic_id, {'count': count})
+                row[agg_type.lower()] = value
+        return results
+
+    def insert_aggregates(self, agg_type, period, ts, rows):
+        """
+        Insert aggregates computed for several aggregate topics for the
+        same time period in a single transaction. Data is inserted into
+        <agg_type>_<period> table
+
+        :param agg_type: type of aggregation
+        :param period: time period of aggregation
+        :param ts: end time of aggregation period (not inclusive)
+        :param rows: list of tuples of format
+                     (agg_topic_id, computed aggregate, topic_ids)
+        :return: True if execution was successful, raises exception
+        in case of connection failures
+        """
+        if not rows:
+            return True
+        table_name = agg_type + '_' + period
+        _log.debug("Inserting {} aggregates for {} into table {}".format(
+            len(rows), ts, table_name))
+        self.execute_many(
+            self.insert_aggregate_stmt(table_name),
+            [(ts, agg_topic_id, jsonapi.dumps(data), str(topic_ids))
+             for agg_topic_id, data, topic_ids in rows],
+            commit=True)
+        return True
+
+    def get_last_aggregate_time(self, agg_type, period, agg_topic_ids):
+        """
+        Get the end time of the most recent aggregate recorded for the given
+        aggregate topics. Used to find periods that were missed while the
+        aggregate historian was not running.
+
+        :param agg_type: type of aggregation
+        :param period: time period of aggregation
+        :param agg_topic_ids: list of aggregate topic ids
+        :return: timestamp of the latest aggregate or None if nothing has
+                 been recorded yet
+        """
+        return None
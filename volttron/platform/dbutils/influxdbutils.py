@@ -301,6 +301,35 @@ def insert_meta(client, topic_id, topic, meta, updated_time):
     client.write_points(json_body)
 
 
+def insert_meta_many(client, rows):
+    """
+    Insert or update metadata dictionaries of several topics into the
+    database with a single write. It will insert into 'meta' table.
+
+    :param client: InfluxDB client connected in historian_setup method.
+    :param rows: list of (topic_id, topic, meta, updated_time) tuples. See
+                 :py:func:`insert_meta` for details.
+    """
+
+    json_body = [
+        {
+            "measurement": "meta",
+            "tags": {
+                "topic_id": topic_id
+            },
+            "time": 0,
+            "fields": {
+                "topic": topic,
+                "meta_dict": str(meta),
+                "last_updated": updated_time
+            }
+        }
+        for topic_id, topic, meta, updated_time in rows
+    ]
+
+    client.write_points(json_body)
+
+
 def insert_data_point(client, time, topic_id, source, value, value_string):
     """
     Insert one data point of a specific topic into the database.
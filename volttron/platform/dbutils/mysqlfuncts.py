@@ -456,3 +456,63 @@ class MySqlFuncts(DbDriver):
             return rows[0][0], rows[0][1]
         else:
             return 0, 0
+
+    def collect_aggregates(self, topic_ids, agg_types, start=None, end=None):
+        supported = self.get_aggregation_list()
+        agg_types = [agg_type.upper() for agg_type in agg_types]
+        for agg_type in agg_types:
+            if agg_type not in supported:
+                raise ValueError(
+                    "Invalid aggregation type {}".format(agg_type))
+        columns = ''.join(', {}(value_string)'.format(agg_type)
+                          for agg_type in agg_types)
+        query = '''SELECT topic_id, count(value_string)''' + columns + \
+                ''' FROM ''' + self.data_table + \
+                ''' {where} GROUP BY topic_id'''
+
+        where_clauses = ["WHERE topic_id IN (" +
+                         ", ".join(["%s"] * len(topic_ids)) + ")"]
+        args = list(topic_ids)
+        if start is not None:
+            where_clauses.append("ts >= %s")
+            if self.MICROSECOND_SUPPORT:
+                args.append(start)
+            else:
+                start_str = start.isoformat()
+                args.append(start_str[:start_str.rfind('.')])
+
+        if end is not None:
+            where_clauses.append("ts < %s")
+            if self.MICROSECOND_SUPPORT:
+                args.append(end)
+            else:
+                end_str = end.isoformat()
+                args.append(end_str[:end_str.rfind('.')])
+
+        real_query = query.format(where=' AND '.join(where_clauses))
+        _log.debug("Real Query: " + real_query)
+        _log.debug("args: " + str(args))
+
+        results = {}
+        for row in self.select(real_query, args):
+            result = {'count': row[1]}
+            for agg_type, value in zip(agg_types, row[2:]):
+                result[agg_type.lower()] = value
+            results[row[0]] = result
+        return results
+
+    def get_last_aggregate_time(self, agg_type, period, agg_topic_ids):
+        table_name = agg_type + '_' + period
+        query = '''SELECT ts FROM ''' + table_name + \
+                ''' WHERE topic_id IN (''' + \
+                ", ".join(["%s"] * len(agg_topic_ids)) + \
+                ''') ORDER BY ts DESC LIMIT 1'''
+        try:
+            rows = self.select(query, agg_topic_ids)
+        except MysqlError as e:
+            if e.errno == mysql_errorcodes.ER_NO_SUCH_TABLE:
+                return None
+            raise
+        if rows:
+            return rows[0][0].replace(tzinfo=pytz.UTC)
+        return None
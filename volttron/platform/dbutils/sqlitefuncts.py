@@ -38,11 +38,12 @@
 import ast
 import errno
 import logging
+import math
 import sqlite3
 import pytz
 import threading
 from collections import defaultdict
-from datetime import datetime
+from datetime import datetime, timedelta
 from math import ceil
 
 import os
@@ -54,6 +55,19 @@ from volttron.platform.agent import json as jsonapi
 utils.setup_logging()
 _log = logging.getLogger(__name__)
 
+# Maximum number of topic ids bound into a single grouped aggregate query
+AGGREGATE_BATCH_SIZE = 500
+
+# Supported values of the partition_period connection parameter
+PARTITION_PERIODS = ('month', 'week')
+
+# Metadata types whose values are stored in the value_real column when
+# typed_values is enabled
+TYPED_VALUE_TYPES = ('float', 'double')
+
+# Connection parameters consumed by the driver rather than sqlite3.connect
+DRIVER_PARAMS = ('partition_period', 'typed_values')
+
 from volttron.platform.agent.utils import fix_sqlite3_datetime
 #Make sure sqlite3 datetime adapters are updated.
 fix_sqlite3_datetime()
@@ -98,6 +112,18 @@ class SqlLiteFuncts(DbDriver):
         if 'timeout' not in connect_params.keys():
             connect_params['timeout'] = 10
 
+        self.partition_period = connect_params.get('partition_period', None)
+        if self.partition_period not in (None,) + PARTITION_PERIODS:
+            raise ValueError("Invalid partition_period {}. Valid values are "
+                             "{}".format(self.partition_period,
+                                         PARTITION_PERIODS))
+        self._created_partitions = set()
+        self.typed_values = connect_params.get('typed_values', False)
+        self._typed_topics = set()
+        self._has_value_real = False
+        connect_params = {k: v for k, v in connect_params.items()
+                          if k not in DRIVER_PARAMS}
+
         self.data_table = None
         self.topics_table = None
         self.meta_table = None
@@ -125,15 +151,12 @@ class SqlLiteFuncts(DbDriver):
             self.select('''PRAGMA auto_vacuum=1''')
             self.select('''VACUUM;''')
 
-        self.execute_stmt(
-            '''CREATE TABLE IF NOT EXISTS ''' + self.data_table +
-            ''' (ts timestamp NOT NULL,
-                 topic_id INTEGER NOT NULL,
-                 value_string TEXT NOT NULL,
-                 UNIQUE(topic_id, ts))''',commit=False)
-        self.execute_stmt(
-            '''CREATE INDEX IF NOT EXISTS data_idx 
-            ON ''' + self.data_table + ''' (ts ASC)''', commit=False)
+        self._create_data_table(self.data_table, 'data_idx')
+        if self.typed_values:
+            self._add_value_real_column(self.data_table)
+            for _, _, name in self._get_partitions():
+                self._add_value_real_column(name)
+            self._has_value_real = True
         self.execute_stmt(
             '''CREATE TABLE IF NOT EXISTS ''' + self.topics_table +
             ''' (topic_id INTEGER PRIMARY KEY,
@@ -145,6 +168,219 @@ class SqlLiteFuncts(DbDriver):
                 metadata TEXT NOT NULL)''', commit=True)
         _log.debug("Created data topics and meta tables")
 
+    def _create_data_table(self, table_name, index_name):
+        value_real = ''
+        if table_name != self.data_table and self._data_table_is_typed():
+            # partitions must have the same columns as the data table so
+            # that they can be combined in a single query
+            value_real = '''
+                 value_real REAL,'''
+        self.execute_stmt(
+            '''CREATE TABLE IF NOT EXISTS ''' + table_name +
+            ''' (ts timestamp NOT NULL,
+                 topic_id INTEGER NOT NULL,
+                 value_string TEXT NOT NULL,''' + value_real + '''
+                 UNIQUE(topic_id, ts))''',commit=False)
+        self.execute_stmt(
+            '''CREATE INDEX IF NOT EXISTS ''' + index_name + '''
+            ON ''' + table_name + ''' (ts ASC)''', commit=False)
+
+    def _add_value_real_column(self, table_name):
+        columns = [row[1] for row in
+                   self.select('''PRAGMA table_info(''' + table_name + ''')''')]
+        if 'value_real' not in columns:
+            _log.info("Adding value_real column to {}".format(table_name))
+            self.execute_stmt('''ALTER TABLE ''' + table_name +
+                              ''' ADD COLUMN value_real REAL''', commit=True)
+
+    def _data_table_is_typed(self):
+        """
+        Returns True if the data table has a value_real column. Once added
+        the column is never removed, so a positive result is cached. Readers
+        check the schema instead of the typed_values setting so that data
+        written by a typed historian can be read with any configuration.
+        """
+        if not self._has_value_real:
+            columns = [row[1] for row in self.select(
+                '''PRAGMA table_info(''' + self.data_table + ''')''')]
+            self._has_value_real = 'value_real' in columns
+        return self._has_value_real
+
+    def _get_value_columns(self):
+        """
+        Returns the value columns to select from the data table and the
+        expression to aggregate over
+        """
+        if self._data_table_is_typed():
+            return ('value_string, value_real',
+                    'COALESCE(value_real, value_string)')
+        return 'value_string, NULL', 'value_string'
+
+    def _encode_value(self, topic_id, data):
+        """
+        Returns the (value_string, value_real) pair to store for a value.
+        Finite numeric values of topics whose metadata type is a floating
+        point type are stored as REAL. Everything else is stored as json.
+        """
+        if (self.typed_values and topic_id in self._typed_topics and
+                isinstance(data, (int, long, float)) and
+                not isinstance(data, bool) and
+                not (math.isnan(data) or math.isinf(data))):
+            return '', float(data)
+        return jsonapi.dumps(data), None
+
+    @staticmethod
+    def _decode_value(value_string, value_real):
+        if value_real is not None:
+            return value_real
+        return jsonapi.loads(value_string)
+
+    def _get_partition_bounds(self, ts):
+        """
+        Returns the start and end time of the partition that should hold
+        data for the given timestamp
+        """
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=pytz.UTC)
+        else:
+            ts = ts.astimezone(pytz.UTC)
+        if self.partition_period == 'month':
+            start = datetime(ts.year, ts.month, 1, tzinfo=pytz.UTC)
+        else:
+            start = datetime(ts.year, ts.month, ts.day, tzinfo=pytz.UTC)
+            start -= timedelta(days=start.weekday())
+        return start, self._get_partition_end(start, self.partition_period)
+
+    @staticmethod
+    def _get_partition_end(start, partition_period):
+        if partition_period == 'month':
+            if start.month == 12:
+                return start.replace(year=start.year + 1, month=1)
+            return start.replace(month=start.month + 1)
+        return start + timedelta(weeks=1)
+
+    def _get_partition_name(self, start, partition_period):
+        if partition_period == 'month':
+            return self.data_table + '_' + start.strftime('%Y%m')
+        return self.data_table + '_' + start.strftime('%Y%m%d')
+
+    def _get_partitions(self):
+        """
+        Returns the partitions of the data table currently in the database
+        ordered by time. Monthly and weekly partitions are both returned so
+        that data remains readable after partition_period is changed.
+
+        :return: list of tuples (start, end, table name)
+        """
+        rows = self.select(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND "
+            "name LIKE ? ESCAPE '\\'",
+            [self.data_table.replace('_', '\\_') + '\\_%'])
+        partitions = []
+        for row in rows:
+            suffix = row[0][len(self.data_table) + 1:]
+            if not suffix.isdigit():
+                continue
+            if len(suffix) == 6:
+                partition_period = 'month'
+                start = datetime.strptime(suffix, '%Y%m')
+            elif len(suffix) == 8:
+                partition_period = 'week'
+                start = datetime.strptime(suffix, '%Y%m%d')
+            else:
+                continue
+            start = start.replace(tzinfo=pytz.UTC)
+            partitions.append((start,
+                               self._get_partition_end(start,
+                                                       partition_period),
+                               row[0]))
+        partitions.sort()
+        return partitions
+
+    def _get_data_tables(self, start=None, end=None):
+        """
+        Returns the names of the tables that might hold data between start
+        (inclusive) and end (exclusive). The unpartitioned data table is
+        always included so that data recorded before partitioning was
+        enabled remains readable.
+        """
+        tables = [self.data_table]
+        if self.partition_period:
+            for p_start, p_end, name in self._get_partitions():
+                if start is not None and p_end <= start:
+                    continue
+                if end is not None and p_start >= end:
+                    continue
+                tables.append(name)
+        return tables
+
+    def _get_data_source(self, columns, where_statement, start=None,
+                         end=None):
+        """
+        Returns the table or sub query to select data from, the where
+        statement that should be applied to it and the number of times the
+        arguments of the where statement have to be repeated. When the data
+        table is partitioned the where statement is applied to each of the
+        partitions that overlap the given time range and the results are
+        combined with UNION ALL.
+        """
+        if not self.partition_period:
+            return self.data_table, where_statement, 1
+        tables = self._get_data_tables(start, end)
+        source = ' UNION ALL '.join(
+            'SELECT ' + columns + ' FROM ' + table + ' ' + where_statement
+            for table in tables)
+        return '(' + source + ')', '', len(tables)
+
+    def _get_partition_for_insert(self, ts):
+        start, _ = self._get_partition_bounds(ts)
+        table_name = self._get_partition_name(start, self.partition_period)
+        if table_name not in self._created_partitions:
+            self._create_data_table(table_name, table_name + '_idx')
+            self._created_partitions.add(table_name)
+        return table_name
+
+    def _update_typed_topics(self, topic_id, metadata):
+        if metadata.get('type') in TYPED_VALUE_TYPES:
+            self._typed_topics.add(topic_id)
+        else:
+            self._typed_topics.discard(topic_id)
+
+    def insert_meta(self, topic_id, metadata):
+        self._update_typed_topics(topic_id, metadata)
+        return super(SqlLiteFuncts, self).insert_meta(topic_id, metadata)
+
+    def insert_meta_many(self, rows):
+        for topic_id, metadata in rows:
+            self._update_typed_topics(topic_id, metadata)
+        return super(SqlLiteFuncts, self).insert_meta_many(rows)
+
+    def get_topic_map_and_meta(self):
+        id_map, name_map, meta_map = \
+            super(SqlLiteFuncts, self).get_topic_map_and_meta()
+        for topic_id, metadata in meta_map.iteritems():
+            self._update_typed_topics(topic_id, metadata)
+        return id_map, name_map, meta_map
+
+    def insert_data(self, ts, topic_id, data):
+        if not self.partition_period and not self.typed_values:
+            return super(SqlLiteFuncts, self).insert_data(ts, topic_id, data)
+        table_name = self.data_table
+        if self.partition_period:
+            table_name = self._get_partition_for_insert(ts)
+        if self.typed_values:
+            value_string, value_real = self._encode_value(topic_id, data)
+            self.execute_stmt(
+                '''INSERT OR REPLACE INTO ''' + table_name +
+                ''' (ts, topic_id, value_string, value_real)
+                values(?, ?, ?, ?)''',
+                (ts, topic_id, value_string, value_real), commit=False)
+        else:
+            self.execute_stmt(
+                '''INSERT OR REPLACE INTO ''' + table_name +
+                ''' (ts, topic_id, value_string) values(?, ?, ?)''',
+                (ts, topic_id, jsonapi.dumps(data)), commit=False)
+        return True
 
     def record_table_definitions(self, table_defs, meta_table_name):
         _log.debug(
@@ -219,8 +455,11 @@ class SqlLiteFuncts(DbDriver):
         if agg_type and agg_period:
             table_name = agg_type + "_" + agg_period
 
-        query = '''SELECT topic_id, ts, value_string
-                   FROM ''' + table_name + '''
+        value_columns = 'value_string, NULL'
+        if table_name == self.data_table:
+            value_columns, _ = self._get_value_columns()
+        query = '''SELECT topic_id, ts, ''' + value_columns + '''
+                   FROM {table}
                    {where}
                    {order_by}
                    {limit}
@@ -250,6 +489,10 @@ class SqlLiteFuncts(DbDriver):
 
 
         where_statement = ' AND '.join(where_clauses)
+        repeat = 1
+        if table_name == self.data_table:
+            table_name, where_statement, repeat = self._get_data_source(
+                'topic_id, ts, ' + value_columns, where_statement, start, end)
 
         order_by = 'ORDER BY topic_id ASC, ts ASC'
         if order == 'LAST_TO_FIRST':
@@ -262,19 +505,20 @@ class SqlLiteFuncts(DbDriver):
             count = -1
 
         limit_statement = 'LIMIT ?'
-        args.append(count)
+        limit_args = [count]
 
         offset_statement = ''
         if skip > 0:
             offset_statement = 'OFFSET ?'
-            args.append(skip)
+            limit_args.append(skip)
 
-        real_query = query.format(where=where_statement,
+        real_query = query.format(table=table_name,
+                                  where=where_statement,
                                   limit=limit_statement,
                                   offset=offset_statement,
                                   order_by=order_by)
         _log.debug("Real Query: " + real_query)
-        _log.debug("args: " + str(args))
+        _log.debug("args: " + str(args + limit_args))
 
 
         values = defaultdict(list)
@@ -282,11 +526,13 @@ class SqlLiteFuncts(DbDriver):
         for topic_id in topic_ids:
             args[0] = topic_id
             values[id_name_map[topic_id]] = []
-            cursor = self.select(real_query, args, fetch_all=False)
+            cursor = self.select(real_query, args * repeat + limit_args,
+                                 fetch_all=False)
             if cursor:
-                for _id, ts, value in cursor:
+                for _id, ts, value, value_real in cursor:
                     values[id_name_map[topic_id]].append(
-                        (utils.format_timestamp(ts), jsonapi.loads(value)))
+                        (utils.format_timestamp(ts),
+                         self._decode_value(value, value_real)))
                 cursor.close()
 
         _log.debug("Time taken to load results from db:{}".format(
@@ -303,6 +549,11 @@ class SqlLiteFuncts(DbDriver):
 
         _log.debug("Managing store - timestamp limit: {}  GB size limit: {}".format(history_limit_timestamp, storage_limit_gb))
 
+        if self.partition_period:
+            self._manage_partitions_size(history_limit_timestamp,
+                                         storage_limit_gb)
+            return
+
         commit = False
 
         if history_limit_timestamp is not None:
@@ -340,13 +591,84 @@ class SqlLiteFuncts(DbDriver):
             _log.debug("Committing changes for manage_db_size.")
             self.commit()
 
+    def _manage_partitions_size(self, history_limit_timestamp,
+                                storage_limit_gb):
+        """
+        Manage database size when the data table is partitioned. Partitions
+        entirely older than history_limit_timestamp are dropped and only a
+        partition straddling the limit is purged row by row. While the
+        database is too large the oldest partition is dropped until a single
+        partition remains.
+        """
+        partitions = self._get_partitions()
+
+        def drop_partition(name):
+            self.execute_stmt('''DROP TABLE IF EXISTS ''' + name)
+            self._created_partitions.discard(name)
+
+        if history_limit_timestamp is not None:
+            if history_limit_timestamp.tzinfo is None:
+                history_limit_timestamp = history_limit_timestamp.replace(
+                    tzinfo=pytz.UTC)
+            for partition in list(partitions):
+                start, end, name = partition
+                if end <= history_limit_timestamp:
+                    drop_partition(name)
+                    partitions.remove(partition)
+                    _log.debug("Dropped partition {} from historian. "
+                               "(TTL exceeded)".format(name))
+            tables = [self.data_table] + [
+                name for start, end, name in partitions
+                if start < history_limit_timestamp]
+            for table in tables:
+                count = self.execute_stmt(
+                    '''DELETE FROM ''' + table + ''' WHERE ts < ?''',
+                    (history_limit_timestamp,))
+                if count is not None and count > 0:
+                    _log.debug("Deleted {} old items from {}. "
+                               "(TTL exceeded)".format(count, table))
+            self.commit()
+
+        if storage_limit_gb is not None:
+            result = self.select('''PRAGMA page_size''')
+            page_size = result[0][0]
+            max_storage_bytes = storage_limit_gb * 1024 ** 3
+            max_pages = int(ceil(max_storage_bytes / page_size))
+
+            def page_count():
+                result = self.select("PRAGMA page_count")
+                return result[0][0]
+
+            while page_count() >= max_pages:
+                if len(partitions) > 1:
+                    start, end, name = partitions.pop(0)
+                    drop_partition(name)
+                    self.commit()
+                    _log.debug("Dropped partition {} from historian. "
+                               "(Managing store size)".format(name))
+                    continue
+                count = 0
+                for table in [self.data_table] + [p[2] for p in partitions]:
+                    count = self.execute_stmt(
+                        '''DELETE FROM ''' + table + '''
+                        WHERE ts IN
+                        (SELECT ts FROM ''' + table + '''
+                        ORDER BY ts ASC LIMIT 100)''')
+                    if count:
+                        break
+                self.commit()
+                if not count:
+                    break
+                _log.debug("Deleted {} old items from historian. "
+                           "(Managing store size)".format(count))
+
     def insert_meta_query(self):
         return '''INSERT OR REPLACE INTO ''' + self.meta_table + \
                ''' values(?, ?)'''
 
     def insert_data_query(self):
         return '''INSERT OR REPLACE INTO ''' + self.data_table + \
-               ''' values(?, ?, ?)'''
+               ''' (ts, topic_id, value_string) values(?, ?, ?)'''
 
     def insert_topic_query(self):
         return '''INSERT INTO ''' + self.topics_table + \
@@ -521,9 +843,10 @@ class SqlLiteFuncts(DbDriver):
             if agg_type.upper() not in ['AVG', 'MIN', 'MAX', 'COUNT', 'SUM']:
                 raise ValueError(
                     "Invalid aggregation type {}".format(agg_type))
+        value_columns, value_expr = self._get_value_columns()
         query = '''SELECT ''' \
-                + agg_type + '''(value_string), count(value_string) FROM ''' \
-                + self.data_table + ''' {where}'''
+                + agg_type + '''(''' + value_expr + '''), ''' \
+                + '''count(value_string) FROM {table} {where}'''
 
         where_clauses = ["WHERE topic_id = ?"]
         args = [topic_ids[0]]
@@ -556,12 +879,14 @@ class SqlLiteFuncts(DbDriver):
                 args.append(end)
 
         where_statement = ' AND '.join(where_clauses)
+        table_name, where_statement, repeat = self._get_data_source(
+            'ts, topic_id, ' + value_columns, where_statement, start, end)
 
-        real_query = query.format(where=where_statement)
+        real_query = query.format(table=table_name, where=where_statement)
         _log.debug("Real Query: " + real_query)
         _log.debug("args: " + str(args))
 
-        results = self.select(real_query, args)
+        results = self.select(real_query, args * repeat)
         if results:
             _log.debug("results got {}, {}".format(results[0][0],
                                                    results[0][1]))
@@ -569,6 +894,77 @@ class SqlLiteFuncts(DbDriver):
         else:
             return 0, 0
 
+    def collect_aggregates(self, topic_ids, agg_types, start=None, end=None):
+        """
+        This function should return the results of a aggregation query
+        grouped by topic id.
+        @param topic_ids: list of topics
+        @param agg_types: list of aggregation types
+        @param start: start time
+        @param end: end time
+        @return: dictionary of topic_id:{'count': count,
+        agg_type: aggregate value,...}
+        """
+        supported = self.get_aggregation_list()
+        agg_types = [agg_type.upper() for agg_type in agg_types]
+        for agg_type in agg_types:
+            if agg_type not in supported:
+                raise ValueError(
+                    "Invalid aggregation type {}".format(agg_type))
+        value_columns, value_expr = self._get_value_columns()
+        columns = ''.join(', {}({})'.format(agg_type, value_expr)
+                          for agg_type in agg_types)
+        query = '''SELECT topic_id, count(value_string)''' + columns + \
+                ''' FROM {table} {where} GROUP BY topic_id'''
+
+        if start:
+            start = start.astimezone(pytz.UTC)
+        if end:
+            end = end.astimezone(pytz.UTC)
+
+        results = {}
+        # stay well below sqlite's limit on the number of host parameters
+        for i in range(0, len(topic_ids), AGGREGATE_BATCH_SIZE):
+            chunk = topic_ids[i:i + AGGREGATE_BATCH_SIZE]
+            where_clauses = ["WHERE topic_id IN (" +
+                             ", ".join("?" * len(chunk)) + ")"]
+            args = list(chunk)
+            if start:
+                where_clauses.append("ts >= ?")
+                args.append(start)
+            if end:
+                where_clauses.append("ts < ?")
+                args.append(end)
+            table_name, where_statement, repeat = self._get_data_source(
+                'ts, topic_id, ' + value_columns, ' AND '.join(where_clauses),
+                start, end)
+            real_query = query.format(table=table_name, where=where_statement)
+            _log.debug("Real Query: " + real_query)
+            _log.debug("args: " + str(args))
+
+            for row in self.select(real_query, args * repeat):
+                result = {'count': row[1]}
+                for agg_type, value in zip(agg_types, row[2:]):
+                    result[agg_type.lower()] = value
+                results[row[0]] = result
+        return results
+
+    def get_last_aggregate_time(self, agg_type, period, agg_topic_ids):
+        table_name = agg_type + '_' + period
+        query = '''SELECT ts FROM ''' + table_name + \
+                ''' WHERE topic_id IN (''' + \
+                ", ".join("?" * len(agg_topic_ids)) + \
+                ''') ORDER BY ts DESC LIMIT 1'''
+        try:
+            rows = self.select(query, agg_topic_ids)
+        except sqlite3.Error as e:
+            if e.message[0:13] == 'no such table':
+                return None
+            raise
+        if rows:
+            return rows[0][0]
+        return None
+
 
     @staticmethod
     def get_tagging_query_from_ast(topic_tags_table, tup, tag_refs):
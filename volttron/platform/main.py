@@ -51,6 +51,7 @@ import stat
 import struct
 import sys
 import threading
+import time
 import uuid
 import signal
 
@@ -71,7 +72,7 @@ from .vip.agent import Agent, Core
 from .vip.agent.compat import CompatPubSub
 from .vip.router import *
 from .vip.socket import decode_key, encode_key, Address
-from .vip.tracking import Tracker
+from .vip.tracking import Tracker, Metrics
 from .auth import AuthService, AuthFile, AuthEntry
 from .control import ControlService
 from .web import MasterWebService
@@ -80,7 +81,7 @@ from .agent import utils
 from .agent.known_identities import MASTER_WEB, CONFIGURATION_STORE, AUTH
 from .vip.agent.subsystems.pubsub import ProtectedPubSubTopics
 from .keystore import KeyStore, KnownHostsStore
-from .vip.pubsubservice import PubSubService
+from .vip.pubsubservice import PubSubService, PubSubWorker
 from .vip.routingservice import RoutingService
 from .vip.externalrpcservice import ExternalRPCService
 from .vip.keydiscovery import KeyDiscoveryAgent
@@ -234,6 +235,10 @@ class Monitor(threading.Thread):
             log.info('%s %s %s', event_name, event_value, endpoint)
 
 
+# Messages queued for MessageDebuggerAgent before new ones are dropped
+_MSGDEBUG_HWM = 10000
+
+
 class FramesFormatter(object):
     def __init__(self, frames):
         self.frames = frames
@@ -253,7 +258,7 @@ class Router(BaseRouter):
                  volttron_central_address=None, instance_name=None,
                  bind_web_address=None, volttron_central_serverkey=None,
                  protected_topics={}, external_address_file='',
-                 msgdebug=None):
+                 msgdebug=None, metrics=None, pubsub_thread=False):
 
         super(Router, self).__init__(
             context=context, default_user_id=default_user_id)
@@ -267,6 +272,7 @@ class Router(BaseRouter):
             self.logger.setLevel(logging.WARNING)
         self._monitor = monitor
         self._tracker = tracker
+        self._metrics = metrics
         self._volttron_central_address = volttron_central_address
         if self._volttron_central_address:
             parsed = urlparse(self._volttron_central_address)
@@ -282,6 +288,8 @@ class Router(BaseRouter):
         self._protected_topics = protected_topics
         self._external_address_file = external_address_file
         self._pubsub = None
+        self._pubsub_thread = pubsub_thread
+        self._pubsub_socket = None
         self._ext_rpc = None
         self._msgdebug = msgdebug
         self._message_debugger_socket = None
@@ -325,22 +333,46 @@ class Router(BaseRouter):
                                            self._socket_class, self._poller,
                                            self._addr, self._instance_name)
 
-        self._pubsub = PubSubService(self.socket, self._protected_topics, self._ext_routing)
+        if self._pubsub_thread:
+            # Handle pubsub in a thread of its own, relaying its messages to the peers
+            self._pubsub_socket = self.context.socket(zmq.PAIR)
+            self._pubsub_socket.set_hwm(10000)
+            self._pubsub_socket.bind(PubSubWorker.address)
+            self._poller.register(self._pubsub_socket, zmq.POLLIN)
+            PubSubWorker(self.context, self._protected_topics,
+                         peer_formats=self._peer_formats).start()
+            _log.info('Pubsub requests are handled in a separate thread; '
+                      'pubsub with external platforms is disabled')
+        else:
+            self._pubsub = PubSubService(self.socket, self._protected_topics, self._ext_routing,
+                                         peer_formats=self._peer_formats)
         self._ext_rpc = ExternalRPCService(self.socket, self._ext_routing)
         self._poller.register(sock, zmq.POLLIN)
         _log.debug("ZMQ version: {}".format(zmq.zmq_version()))
 
     def issue(self, topic, frames, extra=None):
-        log = self.logger.debug
-        formatter = FramesFormatter(frames)
-        if topic == ERROR:
-            errnum, errmsg = extra
-            log('%s (%s): %s', errmsg, errnum, formatter)
-        elif topic == UNROUTABLE:
-            log('unroutable: %s: %s', extra, formatter)
-        else:
-            log('%s: %s',
-                ('incoming' if topic == INCOMING else 'outgoing'), formatter)
+        metrics = self._metrics
+        if metrics is not None:
+            if topic == INCOMING:
+                metrics.incoming(frames)
+            elif topic == OUTGOING:
+                metrics.outgoing(frames)
+            elif topic == ERROR:
+                metrics.error(extra[0])
+            else:
+                metrics.unroutable_message(extra)
+        if self.logger.isEnabledFor(logging.DEBUG):
+            log = self.logger.debug
+            formatter = FramesFormatter(frames)
+            if topic == ERROR:
+                errnum, errmsg = extra
+                log('%s (%s): %s', errmsg, errnum, formatter)
+            elif topic == UNROUTABLE:
+                log('unroutable: %s: %s', extra, formatter)
+            else:
+                log('%s: %s',
+                    ('incoming' if topic == INCOMING else 'outgoing'),
+                    formatter)
         if self._tracker:
             self._tracker.hit(topic, frames, extra)
         if self._msgdebug:
@@ -350,11 +382,19 @@ class Router(BaseRouter):
                 socket_path = os.path.expanduser(socket_path)
                 socket_path = 'ipc://{}'.format('@' if sys.platform.startswith('linux') else '') + socket_path
                 self._message_debugger_socket = zmq.Context().socket(zmq.PUB)
+                self._message_debugger_socket.set_hwm(_MSGDEBUG_HWM)
                 self._message_debugger_socket.connect(socket_path)
-            # Publish the routed message, including the "topic" (status/direction), for use by MessageDebuggerAgent.
-            frame_bytes = [topic]
-            frame_bytes.extend([frame if type(frame) is str else frame.bytes for frame in frames])
-            self._message_debugger_socket.send_pyobj(frame_bytes)
+            # Publish the routed message as raw frames, preceded by the "topic" (status/direction), for use
+            # by MessageDebuggerAgent. The first frame is a "subsystem/peer/" envelope that the agent
+            # subscribes to, so messages it is not capturing are dropped by the socket.
+            frame_bytes = [frame if type(frame) is str else frame.bytes for frame in frames]
+            envelope = b'/'.join([frame_bytes[5] if len(frame_bytes) > 5 else b'', frame_bytes[0], b''])
+            try:
+                self._message_debugger_socket.send_multipart([envelope, str(topic)] + frame_bytes,
+                                                             flags=zmq.NOBLOCK)
+            except ZMQError:
+                # Never let the debugger stall routing.
+                pass
 
     def handle_subsystem(self, frames, user_id):
         subsystem = bytes(frames[5])
@@ -407,6 +447,9 @@ class Router(BaseRouter):
             frames[3] = b''
             return frames
         elif subsystem == b'pubsub':
+            if self._pubsub_socket is not None:
+                self._pubsub_socket.send_multipart([b'handle', user_id] + frames, copy=False)
+                return False
             result = self._pubsub.handle_subsystem(frames, user_id)
             return result
         elif subsystem == b'routing_table':
@@ -417,10 +460,20 @@ class Router(BaseRouter):
             return result
 
     def _drop_pubsub_peers(self, peer):
-        self._pubsub.peer_drop(peer)
+        if self._pubsub_socket is not None:
+            self._pubsub_socket.send_multipart([b'drop', peer])
+        else:
+            self._pubsub.peer_drop(peer)
+        if self._metrics is not None:
+            self._metrics.gauges['peers'] = len(self._peers)
 
     def _add_pubsub_peers(self, peer):
-        self._pubsub.peer_add(peer)
+        if self._pubsub_socket is not None:
+            self._pubsub_socket.send_multipart([b'add', peer])
+        else:
+            self._pubsub.peer_add(peer)
+        if self._metrics is not None:
+            self._metrics.gauges['peers'] = len(self._peers)
 
     def poll_sockets(self):
         """
@@ -434,7 +487,14 @@ class Router(BaseRouter):
         for sock in sockets:
             if sock == self.socket:
                 if sockets[sock] == zmq.POLLIN:
-                    self.route()
+                    if self._metrics is None:
+                        self.route()
+                    else:
+                        start = time.time()
+                        self.route()
+                        self._metrics.routed(time.time() - start)
+            elif sock is self._pubsub_socket:
+                self._relay_pubsub()
             elif sock in self._ext_routing._vip_sockets:
                 if sockets[sock] == zmq.POLLIN:
                     # _log.debug("From Ext Socket: ")
@@ -445,6 +505,23 @@ class Router(BaseRouter):
                 # _log.debug("External ")
                 frames = sock.recv_multipart(copy=False)
 
+    def _relay_pubsub(self):
+        """
+        Send a message from the pubsub thread to its recipient
+        """
+        # Expecting frames:
+        #   [RECIPIENT, SENDER, PROTO, USER_ID, MSG_ID, SUBSYS, ...]
+        frames = self._pubsub_socket.recv_multipart(copy=False)
+        try:
+            self.socket.send_multipart(frames, flags=zmq.NOBLOCK, copy=False)
+            self.issue(OUTGOING, frames)
+        except ZMQError as exc:
+            if exc.errno not in (zmq.EHOSTUNREACH, zmq.EAGAIN):
+                raise
+            self.issue(ERROR, frames, (str(exc.errno), os.strerror(exc.errno)))
+            if exc.errno == zmq.EHOSTUNREACH:
+                self._drop_peer(bytes(frames[0]))
+
     def ext_route(self, socket):
         """
         Handler function for message received through external socket connection
@@ -480,6 +557,10 @@ class Router(BaseRouter):
                 pass
         # Handle 'pubsub' subsystem messages
         elif name == 'pubsub':
+            if self._pubsub is None:
+                _log.warning('Dropped pubsub message from external platform {}: '
+                             'pubsub is handled in a separate thread'.format(bytes(sender)))
+                return
             if bytes(frames[1]) == b'VIP1':
                 recipient = b''
                 frames[:1] = [zmq.Frame(b''), zmq.Frame(b'')]
@@ -634,6 +715,7 @@ def start_volttron_process(opts):
     # zmq.Context.instance().set(zmq.MAX_SOCKETS, 2046)
 
     tracker = Tracker()
+    metrics = Metrics()
     protected_topics_file = os.path.join(opts.volttron_home, 'protected_topics.json')
     _log.debug('protected topics file %s', protected_topics_file)
     external_address_file = os.path.join(opts.volttron_home, 'external_address.json')
@@ -653,7 +735,8 @@ def start_volttron_process(opts):
                    bind_web_address=opts.bind_web_address,
                    protected_topics=protected_topics,
                    external_address_file=external_address_file,
-                   msgdebug=opts.msgdebug).run()
+                   msgdebug=opts.msgdebug, metrics=metrics,
+                   pubsub_thread=opts.pubsub_thread).run()
         except Exception:
             _log.exception('Unhandled exception in router loop')
             raise
@@ -740,7 +823,9 @@ def start_volttron_process(opts):
         # auto-starting agents
         services = [
             ControlService(opts.aip, address=address, identity='control',
-                           tracker=tracker, heartbeat_autostart=True,
+                           tracker=tracker, metrics=metrics,
+                           metrics_interval=opts.metrics_interval,
+                           heartbeat_autostart=True,
                            enable_store=False, enable_channel=True),
 
             CompatPubSub(address=address, identity='pubsub.compat',
@@ -880,6 +965,14 @@ def main(argv=sys.argv):
     agents.add_argument(
         '--msgdebug', action='store_true',
         help='Route all messages to an agent while debugging.')
+    agents.add_argument(
+        '--pubsub-thread', action='store_true',
+        help='handle pubsub subscriptions and publishes in a separate '
+             'thread (not available with external platforms)')
+    agents.add_argument(
+        '--metrics-interval', type=float, metavar='SECONDS',
+        help='publish router metrics to platform/metrics every SECONDS '
+             '(0 disables publishing)')
     agents.add_argument(
         '--setup-mode', action='store_true',
         help='Setup mode flag for setting up authorization of external platforms.')
@@ -966,6 +1059,8 @@ def main(argv=sys.argv):
         resource_monitor=True,
         # mobility=True,
         msgdebug=None,
+        metrics_interval=0,
+        pubsub_thread=False,
         setup_mode=False
     )
 
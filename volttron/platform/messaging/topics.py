@@ -87,6 +87,7 @@ PLATFORM_BASE = _('platform')
 PLATFORM_SEND_EMAIL = _('platform/send_email')
 PLATFORM = _('platform/{subtopic}')
 PLATFORM_SHUTDOWN = PLATFORM(subtopic='shutdown')
+PLATFORM_METRICS = PLATFORM(subtopic='metrics')
 PLATFORM_VCP_DEVICES = _('platforms/{platform_uuid}/devices/{topic}')
 
 RECORD_BASE = _('record')
@@ -98,6 +99,7 @@ MARKET_BID = _(MARKET_BASE.replace('{subtopic}', 'bid'))
 MARKET_CLEAR = _(MARKET_BASE.replace('{subtopic}', 'cleared_price'))
 MARKET_AGGREGATE = _(MARKET_BASE.replace('{subtopic}', 'aggregate'))
 MARKET_ERROR = _(MARKET_BASE.replace('{subtopic}', 'error'))
+MARKET_CLEARING_REPORT = _(MARKET_BASE.replace('{subtopic}', 'clearing_report'))
 MARKET_RECORD = _(RECORD.replace('{subtopic}', MARKET_CLEAR))
 
 AGENT_SHUTDOWN = _('agent/{agent}/shutdown')
@@ -133,6 +135,7 @@ _ACTUATOR_SCHEDULE = _(('{base}/actuators/schedule/{op}').replace('{base}',DRIVE
 ACTUATOR_SCHEDULE_REQUEST = _(_ACTUATOR_SCHEDULE.replace('{op}', 'request'))
 ACTUATOR_SCHEDULE_RESULT = _(_ACTUATOR_SCHEDULE.replace('{op}', 'result'))
 ACTUATOR_SCHEDULE_ANNOUNCE_RAW = _(_ACTUATOR_SCHEDULE.replace('{op}','announce/{device}'))
+ACTUATOR_SCHEDULE_STATES = _(_ACTUATOR_SCHEDULE.replace('{op}', 'states'))
 
 #This is a convenience topic for agent listening for announcements
 # and want to use the {campus}//{building}//{unit} style replacement
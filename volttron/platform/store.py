@@ -39,6 +39,7 @@
 
 import logging
 import glob
+import hashlib
 import os
 import os.path
 import errno
@@ -48,7 +49,7 @@ from StringIO import StringIO
 from volttron.platform.agent import json as jsonapi
 from gevent.lock import Semaphore
 
-from volttron.utils.persistance import PersistentDict
+from volttron.utils.persistance import JournaledDict
 from volttron.platform.agent.utils import parse_json_config
 from volttron.platform.vip.agent import errors
 from volttron.platform.jsonrpc import RemoteError, MethodNotFound
@@ -110,6 +111,14 @@ def process_raw_config(config_string, config_type="raw"):
     raise ValueError("Unsupported configuration type.")
 
 
+def config_hash(config_data):
+    """Returns a hash of the raw contents and type of a stored configuration."""
+    data = config_data["data"]
+    if isinstance(data, unicode):
+        data = data.encode('utf-8')
+    return hashlib.sha1(str(config_data["type"]) + ":" + data).hexdigest()
+
+
 class ConfigStoreService(Agent):
     def __init__(self, *args, **kwargs):
         super(ConfigStoreService, self).__init__(*args, **kwargs)
@@ -140,7 +149,7 @@ class ConfigStoreService(Agent):
             root, ext = os.path.splitext(store_path)
             agent_identity = os.path.basename(root)
             _log.debug("Processing store for agent {}".format(agent_identity))
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = JournaledDict(filename=store_path, flag='c')
             parsed_configs, name_map = process_store(agent_identity, store)
             self.store[agent_identity] = {"configs": parsed_configs,
                                           "store": store,
@@ -153,6 +162,24 @@ class ConfigStoreService(Agent):
         self._add_config_to_store(identity, config_name, raw_contents, contents, config_type,
                                   trigger_callback=True)
 
+    @RPC.export
+    def manage_store_many(self, identity, configs):
+        """Store several configurations for identity at once.
+
+        configs is a list of [config_name, raw_contents, config_type]
+        entries where config_type is optional and defaults to "raw".
+        Either every configuration is stored or, if any of them is invalid,
+        none are. The changes are written to disk together and the agent
+        is sent all of the updates in a single batch.
+        """
+        processed = []
+        for config in configs:
+            config_name, raw_contents = config[:2]
+            config_type = config[2] if len(config) > 2 else "raw"
+            contents = process_raw_config(raw_contents, config_type)
+            processed.append((config_name, raw_contents, contents, config_type))
+        self._add_configs_to_store(identity, processed, trigger_callback=True)
+
     @RPC.export
     def manage_delete_config(self, identity, config_name):
         self.delete(identity, config_name, trigger_callback=True)
@@ -275,7 +302,7 @@ class ConfigStoreService(Agent):
         if agent_store is None:
             # Initialize a new store.
             store_path = os.path.join(self.store_path, identity + store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = JournaledDict(filename=store_path, flag='c')
             agent_store = {
                 "configs": {}, "store": store, "name_map": {},
                 "lock": Semaphore()
@@ -305,6 +332,81 @@ class ConfigStoreService(Agent):
         if not agent_disk_store:
             self.store.pop(identity, None)
 
+    @RPC.export
+    def get_config_hashes(self):
+        """
+        Called by an Agent at startup or after reconnecting to get the names
+        and content hashes of its configurations.
+
+        The hashes are sent with the config.initial_hashes RPC call so that
+        no update can be missed between this call and later updates. The
+        agent then requests only the configurations it does not already have
+        with get_config_contents.
+        """
+        identity = bytes(self.vip.rpc.context.vip_message.peer)
+
+        agent_store = self.store.get(identity)
+
+        if agent_store is None:
+            # Initialize a new store.
+            store_path = os.path.join(self.store_path, identity + store_ext)
+            store = JournaledDict(filename=store_path, flag='c')
+            agent_store = {
+                "configs": {}, "store": store, "name_map": {},
+                "lock": Semaphore()
+            }
+            self.store[identity] = agent_store
+
+        agent_disk_store = agent_store["store"]
+        agent_store_lock = agent_store["lock"]
+
+        with agent_store_lock:
+            hashes = {config_name: config_hash(config_data)
+                      for config_name, config_data in agent_disk_store.iteritems()}
+            try:
+                self.vip.rpc.call(identity, "config.initial_hashes",
+                                  hashes).get(timeout=10.0)
+            except errors.Unreachable:
+                _log.debug("Agent {} not currently running. Configuration hashes not sent.".format(identity))
+            except RemoteError as e:
+                _log.error("Agent {} failure when sending configuration hashes: {}".format(identity, e))
+            except MethodNotFound as e:
+                _log.error(
+                    "Agent {} failure when sending configuration hashes: {}".format(identity, e))
+            except errors.VIPError as e:
+                _log.error("VIP Error sending configuration hashes: {}".format(e))
+
+        # If the store is empty (and nothing jumped in and added to it while we
+        # were informing the agent) then remove it from the global store.
+        if not agent_disk_store:
+            self.store.pop(identity, None)
+
+    @RPC.export
+    def get_config_contents(self, config_names):
+        """
+        Called by an Agent to fetch the parsed contents of some of its
+        configurations. Returns a dictionary mapping each configuration name
+        that exists to a [hash, contents] list. Names that are not in the
+        store are left out.
+        """
+        identity = bytes(self.vip.rpc.context.vip_message.peer)
+        agent_store = self.store.get(identity)
+        if agent_store is None:
+            return {}
+
+        agent_configs = agent_store["configs"]
+        agent_disk_store = agent_store["store"]
+        agent_name_map = agent_store["name_map"]
+
+        results = {}
+        for config_name in config_names:
+            real_config_name = agent_name_map.get(strip_config_name(config_name).lower())
+            if real_config_name is None:
+                continue
+            results[real_config_name] = [config_hash(agent_disk_store[real_config_name]),
+                                         agent_configs[real_config_name]]
+        return results
+
     @RPC.export
     def delete_config(self, config_name, trigger_callback=False, send_update=True):
         """Called by an Agent to delete a configuration."""
@@ -380,14 +482,21 @@ class ConfigStoreService(Agent):
                              config_type, trigger_callback=False,
                              send_update=True):
         """Adds a processed configuration to the store."""
+        self._add_configs_to_store(identity,
+                                   [(config_name, raw, parsed, config_type)],
+                                   trigger_callback=trigger_callback,
+                                   send_update=send_update)
+
+    def _add_configs_to_store(self, identity, configs, trigger_callback=False,
+                              send_update=True):
+        """Adds a list of processed (config_name, raw, parsed, config_type)
+        configurations to the store."""
         agent_store = self.store.get(identity)
 
-        action = "UPDATE"
-
         if agent_store is None:
             #Initialize a new store.
             store_path = os.path.join(self.store_path, identity+ store_ext)
-            store = PersistentDict(filename=store_path, flag='c', format='json')
+            store = JournaledDict(filename=store_path, flag='c')
             agent_store = {"configs": {}, "store": store, "name_map": {}, "lock": Semaphore()}
             self.store[identity] = agent_store
 
@@ -396,38 +505,65 @@ class ConfigStoreService(Agent):
         agent_store_lock = agent_store["lock"]
         agent_name_map = agent_store["name_map"]
 
-        config_name = strip_config_name(config_name)
-        config_name_lower = config_name.lower()
-
-        if config_name_lower not in agent_name_map:
-            action = "NEW"
-
-        if check_for_recursion(config_name, parsed, agent_configs):
-            raise ValueError("Recursive configuration references detected.")
+        # Check every configuration against the others before changing
+        # anything so that a bad entry in a batch leaves the store untouched.
+        batch = len(configs) > 1
+        new_configs = dict(agent_configs) if batch else agent_configs
+        new_name_map = dict(agent_name_map) if batch else agent_name_map
+        updates = []
+        for config_name, raw, parsed, config_type in configs:
+            config_name = strip_config_name(config_name)
+            config_name_lower = config_name.lower()
+
+            if check_for_recursion(config_name, parsed, new_configs):
+                raise ValueError("Recursive configuration references detected.")
+
+            old_config_name = new_name_map.get(config_name_lower)
+            action = "NEW" if old_config_name is None else "UPDATE"
+            updates.append((action, config_name, old_config_name, raw, parsed,
+                            config_type))
+
+            if batch:
+                new_configs.pop(old_config_name, None)
+                new_configs[config_name] = parsed
+                new_name_map[config_name_lower] = config_name
+
+        if not updates:
+            return
 
-        if config_name_lower in agent_name_map:
-            old_config_name = agent_name_map[config_name_lower]
-            del agent_configs[old_config_name]
+        modified = format_timestamp(get_aware_utc_now())
+        for _, config_name, old_config_name, raw, parsed, config_type in updates:
+            if old_config_name is not None:
+                del agent_configs[old_config_name]
+                if old_config_name != config_name:
+                    agent_disk_store.pop(old_config_name, None)
 
-        agent_configs[config_name] = parsed
-        agent_name_map[config_name_lower] = config_name
+            agent_configs[config_name] = parsed
+            agent_name_map[config_name.lower()] = config_name
 
-        agent_disk_store[config_name] = {"type": config_type,
-                                         "modified": format_timestamp(get_aware_utc_now()),
-                                         "data": raw}
+            agent_disk_store[config_name] = {"type": config_type,
+                                             "modified": modified,
+                                             "data": raw}
 
         agent_disk_store.async_sync()
 
-        _log.debug("Agent {} config {} stored.".format(identity, config_name))
+        for _, config_name, _, _, _, _ in updates:
+            _log.debug("Agent {} config {} stored.".format(identity, config_name))
 
         if send_update:
+            calls = [("config.update", (action, config_name),
+                      {"contents": parsed, "trigger_callback": trigger_callback})
+                     for action, config_name, _, _, parsed, _ in updates]
             with agent_store_lock:
-                try:
-                    self.vip.rpc.call(identity, "config.update", action, config_name, contents=parsed, trigger_callback=trigger_callback).get(timeout=10.0)
-                except errors.Unreachable:
-                    _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
-                except RemoteError as e:
-                    _log.error("Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
-                except MethodNotFound as e:
-                    _log.error(
-                        "Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
+                results = self.vip.rpc.gather(identity, calls)
+                for result, (_, config_name, _, _, _, _) in zip(results, updates):
+                    try:
+                        result.get(timeout=10.0)
+                    except errors.Unreachable:
+                        _log.debug("Agent {} not currently running. Configuration update not sent.".format(identity))
+                        break
+                    except RemoteError as e:
+                        _log.error("Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
+                    except MethodNotFound as e:
+                        _log.error(
+                            "Agent {} failure when adding/updating configuration {}: {}".format(identity, config_name, e))
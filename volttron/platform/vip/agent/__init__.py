@@ -80,7 +80,8 @@ class Agent(object):
                  volttron_home=os.path.abspath(platform.get_home()),
                  agent_uuid=None, enable_store=True,
                  enable_web=False, enable_channel=False,
-                 reconnect_interval=None, version='0.1', enable_fncs=False):
+                 reconnect_interval=None, version='0.1', enable_fncs=False,
+                 serialization=None):
 
         self._version = version
 
@@ -95,7 +96,8 @@ class Agent(object):
                          secretkey=secretkey, serverkey=serverkey,
                          volttron_home=volttron_home, agent_uuid=agent_uuid,
                          reconnect_interval=reconnect_interval,
-                         version=version, enable_fncs=enable_fncs)
+                         version=version, enable_fncs=enable_fncs,
+                         serialization=serialization)
 
         self.vip = Agent.Subsystems(self, self.core, heartbeat_autostart,
                                     heartbeat_period, enable_store, enable_web,
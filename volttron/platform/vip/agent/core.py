@@ -41,8 +41,8 @@ from __future__ import absolute_import, print_function
 from contextlib import contextmanager
 from datetime import datetime
 from errno import ENOENT
-import heapq
 import inspect
+import itertools
 import logging
 import os
 import sys
@@ -54,6 +54,7 @@ import weakref
 import signal
 
 import gevent.event
+import gevent.pool
 from zmq import green as zmq
 from zmq.green import ZMQError, EAGAIN, ENOTSOCK, EADDRINUSE
 from volttron.platform.agent import json
@@ -65,6 +66,7 @@ from .dispatch import Signal
 from .errors import VIPError
 from .. import green as vip
 from .. import router
+from .. import serialization as vip_serialization
 from .... import platform
 from volttron.platform.keystore import KeyStore, KnownHostsStore
 from volttron.platform.agent import utils
@@ -131,10 +133,19 @@ class ScheduledEvent(object):
         self.kwargs = kwargs or {}
         self.canceled = False
         self.finished = False
+        # Set while the event is waiting in an EventQueue
+        self._queue = None
+        self._index = None
 
     def cancel(self):
-        '''Mark the timer as canceled to avoid a callback.'''
+        '''Mark the timer as canceled to avoid a callback.
+
+        The event is also removed from the schedule so that canceled
+        events do not accumulate until their deadline.
+        '''
         self.canceled = True
+        if self._queue is not None:
+            self._queue.remove(self)
 
     def __call__(self):
         if not self.canceled:
@@ -142,6 +153,85 @@ class ScheduledEvent(object):
         self.finished = True
 
 
+class EventQueue(object):
+    '''Binary heap of scheduled events ordered by deadline.
+
+    Each event records its position in the heap so that a canceled event
+    can be removed in O(log n) time rather than lingering until it expires.
+    Events with equal deadlines are returned in the order they were added.
+    '''
+
+    def __init__(self):
+        self._heap = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, deadline, event):
+        if event._queue is not None:
+            event._queue.remove(event)
+        event._queue = self
+        event._index = len(self._heap)
+        self._heap.append([deadline, next(self._counter), event])
+        self._sift_up(event._index)
+
+    def next_deadline(self):
+        '''Return the earliest deadline or None if the queue is empty.'''
+        return self._heap[0][0] if self._heap else None
+
+    def pop(self):
+        '''Remove and return the event with the earliest deadline.'''
+        event = self._heap[0][2]
+        self._remove_at(0)
+        return event
+
+    def remove(self, event):
+        if event._queue is self:
+            self._remove_at(event._index)
+
+    def _remove_at(self, index):
+        heap = self._heap
+        event = heap[index][2]
+        last = heap.pop()
+        if index < len(heap):
+            heap[index] = last
+            last[2]._index = index
+            self._sift_up(self._sift_down(index))
+        event._queue = event._index = None
+
+    def _swap(self, i, j):
+        heap = self._heap
+        heap[i], heap[j] = heap[j], heap[i]
+        heap[i][2]._index = i
+        heap[j][2]._index = j
+
+    def _sift_up(self, index):
+        heap = self._heap
+        while index > 0:
+            parent = (index - 1) >> 1
+            if heap[index] >= heap[parent]:
+                break
+            self._swap(index, parent)
+            index = parent
+        return index
+
+    def _sift_down(self, index):
+        heap = self._heap
+        size = len(heap)
+        while True:
+            child = 2 * index + 1
+            if child >= size:
+                break
+            if child + 1 < size and heap[child + 1] < heap[child]:
+                child += 1
+            if heap[index] <= heap[child]:
+                break
+            self._swap(index, child)
+            index = child
+        return index
+
+
 def findsignal(obj, owner, name):
     parts = name.split('.')
     if len(parts) == 1:
@@ -165,7 +255,7 @@ class BasicCore(object):
         self._async_calls = []
         self._stop_event = None
         self._schedule_event = None
-        self._schedule = []
+        self._schedule = EventQueue()
         self.onsetup = Signal()
         self.onstart = Signal()
         self.onstop = Signal()
@@ -191,15 +281,14 @@ class BasicCore(object):
             periodics.extend(
                 periodic.get(member) for periodic in annotations(
                     member, list, 'core.periodics'))
-            self._schedule.extend(
-                (deadline, ScheduledEvent(member, args, kwargs))
-                for deadline, args, kwargs in
-                annotations(member, list, 'core.schedule'))
+            for deadline, args, kwargs in annotations(member, list,
+                                                      'core.schedule'):
+                self._schedule.push(deadline,
+                                    ScheduledEvent(member, args, kwargs))
             for name in annotations(member, set, 'core.signals'):
                 findsignal(self, owner, name).connect(member, owner)
 
         inspect.getmembers(owner, setup)
-        heapq.heapify(self._schedule)
 
         def start_periodics(sender, **kwargs):  # pylint: disable=unused-argument
             for periodic in periodics:
@@ -245,23 +334,26 @@ class BasicCore(object):
                 self.spawned_greenlets.add(greenlet)
 
         def schedule_loop():
-            heap = self._schedule
+            queue = self._schedule
             event = self._schedule_event
-            cur = gevent.getcurrent()
+            # Callbacks are tracked by a pool, which forgets them as soon as
+            # they finish, so they can be killed with the scheduler.
+            pool = gevent.pool.Pool()
             now = time.time()
-            while True:
-                if heap:
-                    deadline = heap[0][0]
-                    timeout = min(5.0, max(0.0, deadline - now))
-                else:
-                    timeout = None
-                if event.wait(timeout):
-                    event.clear()
-                now = time.time()
-                while heap and now >= heap[0][0]:
-                    _, callback = heapq.heappop(heap)
-                    greenlet = gevent.spawn(callback)
-                    cur.link(lambda glt: greenlet.kill())
+            try:
+                while True:
+                    deadline = queue.next_deadline()
+                    if deadline is not None:
+                        timeout = min(5.0, max(0.0, deadline - now))
+                    else:
+                        timeout = None
+                    if event.wait(timeout):
+                        event.clear()
+                    now = time.time()
+                    while queue and now >= queue.next_deadline():
+                        pool.spawn(queue.pop())
+            finally:
+                pool.kill(block=False)
 
         self._stop_event = stop = gevent.event.Event()
         self._schedule_event = gevent.event.Event()
@@ -396,7 +488,7 @@ class BasicCore(object):
     def schedule(self, deadline, func, *args, **kwargs):
         deadline = utils.get_utc_seconds_from_epoch(deadline)
         event = ScheduledEvent(func, args, kwargs)
-        heapq.heappush(self._schedule, (deadline, event))
+        self._schedule.push(deadline, event)
         self._schedule_event.set()
         return event
 
@@ -427,7 +519,7 @@ class Core(BasicCore):
                  publickey=None, secretkey=None, serverkey=None,
                  volttron_home=os.path.abspath(platform.get_home()),
                  agent_uuid=None, reconnect_interval=None,
-                 version='0.1', enable_fncs=False):
+                 version='0.1', enable_fncs=False, serialization=None):
 
         self.volttron_home = volttron_home
 
@@ -459,6 +551,10 @@ class Core(BasicCore):
         self.__connected = False
         self._version = version
         self._fncs_enabled=enable_fncs
+        # Format offered to the router for RPC and pubsub payloads and the
+        # serializer it agreed to; JSON until the welcome says otherwise.
+        self.serialization = serialization
+        self.serializer = vip_serialization.JSON
 
     def version(self):
         return self._version
@@ -609,8 +705,10 @@ class Core(BasicCore):
             state.ident = ident = b'connect.hello.%d' % state.count
             state.count += 1
             self.spawn(connection_failed_check)
+            formats = b','.join(
+                vip_serialization.supported_formats(self.serialization))
             self.spawn(self.socket.send_vip,
-                       b'', b'hello', [b'hello'], msg_id=ident)
+                       b'', b'hello', [b'hello', formats], msg_id=ident)
 
         def hello_response(sender, version='',
                            router='', identity=''):
@@ -715,6 +813,13 @@ class Core(BasicCore):
                             bytes(message.args[0]) == b'welcome'):
                     version, server, identity = [
                         bytes(x) for x in message.args[1:4]]
+                    # Routers that predate serialization negotiation do not
+                    # name a format, which means JSON.
+                    try:
+                        self.serializer = vip_serialization.get_serializer(
+                            bytes(message.args[4]))
+                    except (IndexError, KeyError):
+                        self.serializer = vip_serialization.JSON
                     self.__connected = True
                     self.onconnected.send(self, version=version,
                                           router=server, identity=identity)
@@ -91,5 +91,7 @@ class Auth(SubsystemBase):
     def _update_capabilities(self, user_to_capabilities):
         identity = bytes(self._rpc().context.vip_message.peer)
         if identity == AUTH:
+            # The update is the complete mapping so there is no need to
+            # fetch it again.
             self._user_to_capabilities = user_to_capabilities
-            self._dirty = True
+            self._dirty = False
@@ -47,6 +47,7 @@ from .base import SubsystemBase
 from volttron.platform.storeutils import list_unique_links, check_for_config_link
 from volttron.platform.vip.agent import errors
 from volttron.platform.agent.known_identities import CONFIGURATION_STORE
+from volttron.platform.jsonrpc import MethodNotFound
 
 from collections import defaultdict
 from copy import deepcopy
@@ -63,6 +64,9 @@ _log = logging.getLogger(__name__)
 
 VALID_ACTIONS = set(["NEW", "UPDATE", "DELETE"])
 
+# Number of configurations requested from the platform per call.
+CONFIG_PAGE_SIZE = 100
+
 class ConfigStore(SubsystemBase):
     def __init__(self, owner, core, rpc):
         self._core = weakref.ref(core)
@@ -79,6 +83,13 @@ class ConfigStore(SubsystemBase):
         self._initialized = False
         self._initial_callbacks_called = False
 
+        # Content hashes of the configurations in _store as reported by the
+        # platform, used to only fetch configurations that changed.
+        self._hashes = {}
+        self._lazy_delivery = True
+        self._remote_hashes = None
+        self._touched = None
+
         self._process_callbacks_code_object = self._process_callbacks.__code__
 
         def sub_factory():
@@ -89,30 +100,119 @@ class ConfigStore(SubsystemBase):
         def onsetup(sender, **kwargs):
             rpc.export(self._update_config, 'config.update')
             rpc.export(self._initial_update, 'config.initial_update')
+            rpc.export(self._initial_hashes, 'config.initial_hashes')
 
         core.onsetup.connect(onsetup, self)
         core.configuration.connect(self._onconfig, self)
 
     def _onconfig(self, sender, **kwargs):
-        if not self._initialized:
+        try:
+            affected_configs = self._load_configs()
+        except errors.Unreachable as e:
+            _log.error("Connected platform does not support the Configuration Store feature.")
+            return
+        except errors.VIPError as e:
+            _log.error("Error retrieving agent configurations: {}".format(e))
+            return
+
+        if affected_configs is None or not self._initial_callbacks_called:
+            affected_configs = {}
+            for config_name in self._store:
+                affected_configs[config_name] = "NEW"
+            for config_name in self._default_store:
+                affected_configs[config_name] = "NEW"
+
+        self._process_callbacks(affected_configs)
+        self._initial_callbacks_called = True
+
+        for config_name, action in affected_configs.iteritems():
+            if action == "DELETE":
+                self._name_map.pop(config_name, None)
+
+    def _load_configs(self):
+        """Retrieves the agent's configurations from the platform.
+
+        Only configurations whose hash differs from the copy already held
+        are requested, in pages of CONFIG_PAGE_SIZE. Returns the changed
+        configurations mapped to their action or None if the platform can
+        only send every configuration at once.
+        """
+        if self._lazy_delivery:
             try:
-                self._rpc().call(CONFIGURATION_STORE, "get_configs").get()
-            except errors.Unreachable as e:
-                _log.error("Connected platform does not support the Configuration Store feature.")
-                return
-            except errors.VIPError as e:
-                _log.error("Error retrieving agent configurations: {}".format(e))
-                return
+                return self._load_changed_configs()
+            except MethodNotFound:
+                _log.debug("Platform does not support lazy configuration delivery.")
+                self._lazy_delivery = False
+        if not self._initialized:
+            self._rpc().call(CONFIGURATION_STORE, "get_configs").get()
+        return None
 
+    def _initial_hashes(self, hashes):
+        self._initialized = True
+        self._remote_hashes = hashes
+        # Track configurations changed by updates while the contents are
+        # fetched so they are not overwritten with older contents.
+        self._touched = set()
 
+    def _load_changed_configs(self):
+        try:
+            self._rpc().call(CONFIGURATION_STORE, "get_config_hashes").get()
+            remote_hashes = self._remote_hashes
+            if remote_hashes is None:
+                # The platform could not send us the hashes.
+                return {}
+
+            changed = [config_name for config_name, config_hash in remote_hashes.iteritems()
+                       if self._hashes.get(config_name.lower()) != config_hash]
+            fetched = {}
+            for i in xrange(0, len(changed), CONFIG_PAGE_SIZE):
+                fetched.update(self._rpc().call(CONFIGURATION_STORE, "get_config_contents",
+                                                changed[i:i + CONFIG_PAGE_SIZE]).get())
+            return self._apply_fetched_configs(remote_hashes, fetched, self._touched)
+        finally:
+            self._remote_hashes = None
+            self._touched = None
+
+    def _apply_fetched_configs(self, remote_hashes, fetched, touched):
         affected_configs = {}
-        for config_name in self._store:
-            affected_configs[config_name] = "NEW"
-        for config_name in self._default_store:
-            affected_configs[config_name] = "NEW"
+        remote_names = set(config_name.lower() for config_name in remote_hashes)
 
-        self._process_callbacks(affected_configs)
-        self._initial_callbacks_called = True
+        # Configurations deleted while we were not connected.
+        for config_name_lower in self._store.keys():
+            if config_name_lower in remote_names or config_name_lower in touched:
+                continue
+            del self._store[config_name_lower]
+            self._hashes.pop(config_name_lower, None)
+            if config_name_lower not in self._default_store:
+                affected_configs[config_name_lower] = "DELETE"
+                self._gather_affected(config_name_lower, affected_configs)
+                self._delete_refs(config_name_lower)
+            else:
+                del self._name_map[config_name_lower]
+                affected_configs[config_name_lower] = "UPDATE"
+                self._gather_affected(config_name_lower, affected_configs)
+                self._update_refs(config_name_lower, self._default_store[config_name_lower])
+
+        for config_name, (config_hash, contents) in fetched.iteritems():
+            config_name_lower = config_name.lower()
+            if config_name_lower in touched:
+                continue
+            if config_name_lower in self._store or config_name_lower in self._default_store:
+                action = "UPDATE"
+            else:
+                action = "NEW"
+            self._store[config_name_lower] = contents
+            self._name_map[config_name_lower] = config_name
+            self._hashes[config_name_lower] = config_hash
+            affected_configs[config_name_lower] = action
+            self._update_refs(config_name_lower, contents)
+            self._gather_affected(config_name_lower, affected_configs)
+
+        for config_name, config_contents in self._default_store.iteritems():
+            if config_name not in self._store and config_name not in self._ref_map:
+                self._add_refs(config_name, config_contents)
+
+        return affected_configs
 
     def _add_refs(self, config_name, contents):
         refs = list_unique_links(contents)
@@ -219,8 +319,16 @@ class ConfigStore(SubsystemBase):
 
         affected_configs = {}
 
+        if self._touched is not None:
+            if action == "DELETE_ALL":
+                self._touched.update(self._store)
+                self._touched.update(name.lower() for name in self._remote_hashes or ())
+            else:
+                self._touched.add(config_name.lower())
+
         #Update local store.
         if action == "DELETE":
+            self._hashes.pop(config_name.lower(), None)
             config_name_lower = config_name.lower()
             if config_name_lower in self._store:
                 del self._store[config_name_lower]
@@ -235,6 +343,7 @@ class ConfigStore(SubsystemBase):
                     self._update_refs(config_name_lower, self._default_store[config_name_lower])
 
         if action == "DELETE_ALL":
+            self._hashes.clear()
             for name in self._store:
                 affected_configs[name] = "DELETE"
             #Just assume all default stores updated.
@@ -246,6 +355,9 @@ class ConfigStore(SubsystemBase):
 
         if action in ("NEW", "UPDATE"):
             config_name_lower = config_name.lower()
+            # The platform does not send the new hash, so the contents will
+            # be fetched again after a reconnect.
+            self._hashes.pop(config_name_lower, None)
             self._store[config_name_lower] = contents
             self._name_map[config_name_lower] = config_name
             if config_name_lower in self._default_store:
@@ -310,7 +422,7 @@ class ConfigStore(SubsystemBase):
         # Handle case were we are called during "onstart".
         if not self._initialized:
             try:
-                self._rpc().call(CONFIGURATION_STORE, "get_configs").get()
+                self._load_configs()
             except errors.Unreachable as e:
                 _log.error("Connected platform does not support the Configuration Store feature.")
             except errors.VIPError as e:
@@ -342,7 +454,7 @@ class ConfigStore(SubsystemBase):
         #may be a default configuration to grab.
         if not self._initialized:
             try:
-                self._rpc().call(CONFIGURATION_STORE, "get_configs").get()
+                self._load_configs()
             except errors.Unreachable as e:
                 _log.error("Connected platform does not support the Configuration Store feature.")
             except errors.VIPError as e:
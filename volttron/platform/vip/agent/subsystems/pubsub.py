@@ -49,6 +49,7 @@ import gevent
 from zmq import green as zmq
 from zmq import SNDMORE
 from volttron.platform.agent import json as jsonapi
+from ... import serialization
 
 from .base import SubsystemBase
 from ..decorators import annotate, annotations, dualmethod, spawn
@@ -601,7 +602,8 @@ class PubSub(SubsystemBase):
                               headers=headers, message=message)
                 self._save_parameters(result.ident, **kwargs)
 
-            json_msg = jsonapi.dumps(dict(bus=bus, headers=headers, message=message))
+            json_msg = self.core().serializer.dumps(
+                dict(bus=bus, headers=headers, message=message))
             frames = [zmq.Frame(b'publish'), zmq.Frame(str(topic)), zmq.Frame(str(json_msg))]
             #<recipient, subsystem, args, msg_id, flags>
             self.vip_socket.send_vip(b'', 'pubsub', frames, result.ident, copy=False)
@@ -657,7 +659,7 @@ class PubSub(SubsystemBase):
             except IndexError:
                 return
             try:
-                msg = jsonapi.loads(data)
+                msg = serialization.loads(data)
                 headers = msg['headers']
                 message = msg['message']
                 sender = msg['sender']
@@ -910,10 +912,23 @@ class PubSubWithRPC(object):
             return
 
 class ProtectedPubSubTopics(object):
-    """Simple class to contain protected pubsub topics"""
+    """Simple class to contain protected pubsub topics
+
+    Regular expression topics are combined into expressions with one named
+    group per topic, so a lookup needs one dict lookup and one regex match
+    for every 99 regular expression topics rather than one per topic.
+    """
+    # Python 2's re module supports at most 100 named groups per expression.
+    _max_groups = 99
+
     def __init__(self):
         self._dict = {}
         self._re_list = []
+        self._combined = None
+        self._combined_stale = False
+
+    def __len__(self):
+        return len(self._dict) + len(self._re_list)
 
     def add(self, topic, capabilities):
         if isinstance(capabilities, basestring):
@@ -921,12 +936,44 @@ class ProtectedPubSubTopics(object):
         if len(topic) > 1 and topic[0] == topic[-1] == '/':
             regex = re.compile('^' + topic[1:-1] + '$')
             self._re_list.append((regex, capabilities))
+            self._combined_stale = True
         else:
             self._dict[topic] = capabilities
 
+    @classmethod
+    def _combine(cls, re_list):
+        # Patterns with their own groups could have back references that
+        # would no longer line up, so they are matched one at a time.
+        if any(regex.groups for regex, _ in re_list):
+            return None
+        combined = []
+        for start in xrange(0, len(re_list), cls._max_groups):
+            chunk = re_list[start:start + cls._max_groups]
+            pattern = '|'.join('(?P<_{}>{})'.format(index, regex.pattern)
+                               for index, (regex, _) in enumerate(chunk,
+                                                                  start))
+            try:
+                combined.append(re.compile(pattern))
+            except (re.error, AssertionError):
+                return None
+        return combined
+
     def get(self, topic):
         if topic in self._dict:
             return self._dict[topic]
+        return self._match(topic)
+
+    def _match(self, topic):
+        '''Return the capabilities of the first expression matching topic.'''
+        if self._combined_stale:
+            self._combined = self._combine(self._re_list)
+            self._combined_stale = False
+        if self._combined is not None:
+            for combined in self._combined:
+                match = combined.match(topic)
+                if match is not None:
+                    return self._re_list[int(match.lastgroup[1:])][1]
+            return None
         for regex, capabilities in self._re_list:
             if regex.match(topic):
                 return capabilities
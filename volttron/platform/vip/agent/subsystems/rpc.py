@@ -45,11 +45,13 @@ import sys
 import traceback
 import weakref
 
+import gevent
 import gevent.local
 from gevent.event import AsyncResult
 from volttron.platform.agent import json as jsonapi
 
 from .base import SubsystemBase
+from ... import serialization
 from ..errors import VIPError
 from ..results import counter, ResultsDictionary
 from ..decorators import annotate, annotations, dualmethod, spawn
@@ -75,11 +77,21 @@ class Dispatcher(jsonrpc.Dispatcher):
         self.local = local
         self._results = ResultsDictionary()
 
+        # Serializer for outgoing requests, set from the format the core
+        # negotiated with the router.
+        self.serializer = serialization.JSON
+
     def serialize(self, json_obj):
-        return jsonapi.dumps(json_obj)
+        # Responses use the format of the request being handled
+        serializer = getattr(self.local, 'serializer', None) or self.serializer
+        return serializer.dumps(json_obj)
 
     def deserialize(self, json_string):
-        return jsonapi.loads(json_string)
+        return serialization.loads(json_string)
+
+    def dispatch(self, json_string, context=None):
+        self.local.serializer = serialization.detect(json_string)
+        return super(Dispatcher, self).dispatch(json_string, context)
 
     def batch_call(self, requests):
         methods = []
@@ -92,7 +104,15 @@ class Dispatcher(jsonrpc.Dispatcher):
                 ident = result.ident
                 results.append(result)
             methods.append((ident, method, args, kwargs))
-        return super(Dispatcher, self).batch_call(methods), results
+        return self.batch_request(methods), results
+
+    def new_result(self):
+        '''Return a result for a call whose request is built later.'''
+        return next(self._results)
+
+    def batch_request(self, methods):
+        '''Build a batch request from (ident, method, args, kwargs).'''
+        return super(Dispatcher, self).batch_call(methods)
 
     def call(self, method, args=None, kwargs=None):
         # pylint: disable=arguments-differ
@@ -196,6 +216,11 @@ class RPC(SubsystemBase):
         self._dispatcher = None
         self._counter = counter()
         self._outstanding = weakref.WeakValueDictionary()
+        # When set, calls made to the same peer before the event loop runs
+        # again are sent together as a single batch request.
+        self.coalesce_calls = False
+        self._coalesced = {}
+        self._coalesce_scheduled = False
         core.register('RPC', self._handle_subsystem, self._handle_error)
         core.register('external_rpc', self._handle_external_rpc_subsystem, self._handle_error)
         self._isconnected = True
@@ -216,6 +241,8 @@ class RPC(SubsystemBase):
 
     def _connected(self, sender, **kwargs):
         self._isconnected =True
+        if self._dispatcher is not None:
+            self._dispatcher.serializer = self.core().serializer
 
     def _disconnected(self, sender, **kwargs):
         self._isconnected = False
@@ -330,6 +357,65 @@ class RPC(SubsystemBase):
 
     def batch(self, peer, requests):
         request, results = self._dispatcher.batch_call(requests)
+        self._send_batch(peer, request, results)
+        return results or None
+
+    def gather(self, peer, calls):
+        '''Call several methods of peer using a single batch request.
+
+        calls is an iterable whose items are either a method name or a
+        tuple of (method, args, kwargs) where args and kwargs are
+        optional. A list of AsyncResult objects is returned in the same
+        order as calls.
+
+        .. code-block:: python
+
+            results = self.vip.rpc.gather('config.store', [
+                ('manage_get', ('platform.driver', 'devices/a'),
+                 {'raw': False}),
+                ('manage_get', ('platform.driver', 'devices/b'),
+                 {'raw': False})])
+            configs = [result.get(timeout=5) for result in results]
+        '''
+        requests = []
+        for call in calls:
+            if isinstance(call, basestring):
+                call = (call,)
+            method = call[0]
+            args = call[1] if len(call) > 1 else ()
+            kwargs = call[2] if len(call) > 2 else {}
+            requests.append((False, method, args, kwargs))
+        if not requests:
+            return []
+        return self.batch(peer, requests)
+
+    def _call_coalesced(self, peer, method, args, kwargs):
+        result = self._dispatcher.new_result()
+        self._coalesced.setdefault(peer, []).append(
+            (result, method, args, kwargs))
+        if not self._coalesce_scheduled:
+            self._coalesce_scheduled = True
+            gevent.spawn(self._flush_coalesced)
+        return result
+
+    def _flush_coalesced(self):
+        self._coalesce_scheduled = False
+        coalesced, self._coalesced = self._coalesced, {}
+        for peer, calls in coalesced.iteritems():
+            results = [result for result, _, _, _ in calls]
+            try:
+                request = self._dispatcher.batch_request(
+                    [(result.ident, method, args, kwargs)
+                     for result, method, args, kwargs in calls])
+            except Exception as exc:
+                # No caller is waiting on the flush, so report the
+                # failure through each of the results.
+                for result in results:
+                    result.set_exception(exc)
+                continue
+            self._send_batch(peer, request, results)
+
+    def _send_batch(self, peer, request, results):
         if results:
             items = weakref.WeakSet(results)
             ident = '%s.%s' % (next(self._counter), id(items))
@@ -345,10 +431,11 @@ class RPC(SubsystemBase):
                 except ZMQError as exc:
                     if exc.errno == ENOTSOCK:
                         _log.debug("Socket send on non socket {}".format(self.core().identity))
-        return results or None
 
     def call(self, peer, method, *args, **kwargs):
         platform = kwargs.pop('external_platform', '')
+        if platform == '' and self.coalesce_calls:
+            return self._call_coalesced(peer, method, args, kwargs)
         request, result = self._dispatcher.call(method, args, kwargs)
         ident = '%s.%s' % (next(self._counter), hash(result))
         self._outstanding[ident] = result
@@ -365,7 +452,8 @@ class RPC(SubsystemBase):
             op = b'send_platform'
             frames.append(op)
             msg = jsonapi.dumps(dict(to_platform=platform, to_peer=peer,
-                                           from_platform='', from_peer='', args=[request]))
+                                     from_platform='', from_peer='',
+                                     args=[serialization.to_json(request)]))
             frames.append(msg)
             #_log.debug("RPC subsystem: External platform RPC msg: {}".format(frames))
             if self._isconnected:
@@ -392,7 +480,8 @@ class RPC(SubsystemBase):
             op = b'send_platform'
             frames.append(op)
             msg = jsonapi.dumps(dict(to_platform=platform_name, to_peer=peer,
-                                     from_platform='', from_peer='', args=[request]))
+                                     from_platform='', from_peer='',
+                                     args=[serialization.to_json(request)]))
             frames.append(msg)
             # _log.debug("RPC subsystem: External platform RPC msg: {}".format(frames))
             self.core().socket.send_vip('', 'external_rpc', frames, msg_id=ident)
@@ -416,7 +505,8 @@ class RPC(SubsystemBase):
             op = b'send_platform'
             frames.append(op)
             msg = jsonapi.dumps(dict(to_platform=platform, to_peer=peer,
-                                     from_platform='', from_peer='', args=[request]))
+                                     from_platform='', from_peer='',
+                                     args=[serialization.to_json(request)]))
             frames.append(msg)
             # _log.debug("RPC subsystem: External platform RPC msg: {}".format(frames))
             if self._isconnected:
@@ -42,6 +42,7 @@ import logging
 import logging.config
 import os
 import re
+import threading
 
 import zmq
 from zmq import SNDMORE, EHOSTUNREACH, ZMQError, EAGAIN, NOBLOCK
@@ -50,10 +51,17 @@ from collections import defaultdict
 
 # Create a context common to the green and non-green zmq modules.
 green.Context._instance = green.Context.shadow(zmq.Context.instance().underlying)
-from .agent.subsystems.pubsub import ProtectedPubSubTopics
+from .agent.subsystems.pubsub import ProtectedPubSubTopics as _ProtectedTopics
 from volttron.platform.jsonrpc import (INVALID_REQUEST, UNAUTHORIZED)
 from volttron.platform.vip.agent.errors import VIPError
 from volttron.platform.agent import json as jsonapi
+from . import serialization
+
+# Maximum number of cached protected topic decisions
+_PROTECTED_DECISIONS_SIZE = 10000
+
+# Messages queued between the router and a PubSubWorker
+_WORKER_HWM = 10000
 
 # Optimizing by pre-creating frames
 _ROUTE_ERRORS = {
@@ -64,7 +72,7 @@ _ROUTE_ERRORS = {
 
 
 class PubSubService(object):
-    def __init__(self, socket, protected_topics, routing_service, *args, **kwargs):
+    def __init__(self, socket, protected_topics, routing_service, peer_formats=None, *args, **kwargs):
         self._logger = logging.getLogger(__name__)
         # if self._logger.level == logging.NOTSET:
         #     self._logger.setLevel(logging.WARNING)
@@ -79,9 +87,15 @@ class PubSubService(object):
         self._vip_sock = socket
         self._user_capabilities = {}
         self._protected_topics = ProtectedPubSubTopics()
+        # Cached results of _check_if_protected_topic keyed by
+        # (user_id, topic), cleared when topics or capabilities change.
+        self._protected_decisions = {}
         self._load_protected_topics(protected_topics)
         self._ext_subscriptions = defaultdict(set)
         self._ext_router = routing_service
+        # Payload formats negotiated by peers, shared with the router. Peers
+        # not listed receive JSON.
+        self._peer_formats = peer_formats if peer_formats is not None else {}
         if self._ext_router is not None:
             self._ext_router.register('on_connect', self.external_platform_add)
             self._ext_router.register('on_disconnect', self.external_platform_drop)
@@ -290,12 +304,13 @@ class PubSubService(object):
         if len(frames) > 8:
             data = frames[8].bytes
             try:
-                msg = jsonapi.loads(data)
+                serializer = serialization.detect(data)
+                msg = serializer.loads(data)
                 headers = msg['headers']
                 message = msg['message']
                 peer = frames[0].bytes
                 bus = msg['bus']
-                pub_msg = jsonapi.dumps(
+                pub_msg = serializer.dumps(
                     dict(sender=peer, bus=bus, headers=headers, message=message)
                 )
                 frames[8] = zmq.Frame(str(pub_msg))
@@ -409,7 +424,7 @@ class PubSubService(object):
         topic = frames[7].bytes
         data = frames[8].bytes
         try:
-            msg = jsonapi.loads(data)
+            msg = serialization.loads(data)
             bus = msg['bus']
         except KeyError as exc:
             self._logger.error("Missing key in _peer_publish message {}".format(exc))
@@ -440,8 +455,17 @@ class PubSubService(object):
                 subscribers |= subscription
         if subscribers:
             #self._logger.debug("PUBSUBSERVICE: found subscribers: {}".format(subscribers))
+            original = frames[8]
+            payloads = {serialization.detect(data).name: original}
             for subscriber in subscribers:
                 frames[0] = zmq.Frame(subscriber)
+                # Encode the message once per format used by the subscribers
+                fmt = self._peer_formats.get(subscriber, serialization.JSON.name)
+                try:
+                    frames[8] = payloads[fmt]
+                except KeyError:
+                    frames[8] = payloads[fmt] = zmq.Frame(
+                        serialization.get_serializer(fmt).dumps(msg))
                 try:
                     # Send the message to the subscriber
                     for sub in self._send(frames, publisher):
@@ -449,6 +473,7 @@ class PubSubService(object):
                         self.peer_drop(sub)
                 except ZMQError:
                     raise
+            frames[8] = original
         return len(subscribers)
 
     def _distribute_external(self, frames):
@@ -466,6 +491,8 @@ class PubSubService(object):
                     external_subscribers.add(platform_id)
         ##self._logger.debug("PUBSUBSERVICE External subscriptions {0}".format(external_subscribers))
         if external_subscribers:
+            # External platforms may not understand other formats
+            data = serialization.to_json(bytes(data))
             frames[:] = []
             frames[0:7] = b'', proto, user_id, msg_id, subsystem, b'external_publish', topic, data
             for platform_id in external_subscribers:
@@ -551,6 +578,7 @@ class PubSubService(object):
             try:
                 msg = jsonapi.loads(data)
                 self._user_capabilities = msg['capabilities']
+                self._protected_decisions = {}
             except KeyError as exc:
                 self._logger.error("Missing key in update auth capabilities message {}".format(exc))
             except ValueError:
@@ -585,6 +613,7 @@ class PubSubService(object):
             self._logger.exception('invalid format for protected topics ')
         else:
             self._protected_topics = topics
+            self._protected_decisions = {}
             self._logger.info('protected-topics loaded')
 
 
@@ -667,6 +696,14 @@ class PubSubService(object):
         :Return Values:
         None or error message
         """
+        if not self._protected_topics:
+            return None
+        key = (peer, topic)
+        try:
+            return self._protected_decisions[key]
+        except KeyError:
+            pass
+
         msg = None
         required_caps = self._protected_topics.get(topic)
 
@@ -675,11 +712,16 @@ class PubSubService(object):
             try:
                 caps = self._user_capabilities[user]
             except KeyError:
-                return
-            if not set(required_caps) <= set(caps):
+                caps = None
+            if caps is not None and not set(required_caps) <= set(caps):
                 msg = ('to publish to topic "{}" requires capabilities {},'
                        ' but capability list {} was'
                        ' provided').format(topic, required_caps, caps)
+
+        decisions = self._protected_decisions
+        if len(decisions) >= _PROTECTED_DECISIONS_SIZE:
+            decisions.clear()
+        decisions[key] = msg
         return msg
 
     def _get_external_prefix_list(self):
@@ -797,36 +839,89 @@ class PubSubService(object):
                 topic = frames[8].bytes
                 #Remove subscriber for that topic
 
-class ProtectedPubSubTopics(object):
-    '''Simple class to contain protected pubsub topics'''
+class PubSubWorker(threading.Thread):
+    """Runs a PubSubService in a thread of its own.
+
+    The router forwards pubsub requests and peer changes over an inproc
+    PAIR socket and sends everything the service sends back on to the
+    peers. Matching subscriptions and encoding payloads for each publish
+    then happen outside of the router loop. Messages from the router are:
+
+        [b'handle', USER_ID, SENDER, RECIPIENT, PROTO, ..., SUBSYS, ...]
+        [b'add', PEER]
+        [b'drop', PEER]
+        [b'stop']
+
+    External platforms are not supported by a threaded service, as the
+    routing service sockets belong to the router thread.
+    """
+
+    address = 'inproc://vip.pubsub'
+
+    def __init__(self, context, protected_topics, peer_formats=None):
+        super(PubSubWorker, self).__init__(name='pubsub')
+        self.daemon = True
+        self._context = context
+        self._protected_topics = protected_topics
+        self._peer_formats = peer_formats
+        self._logger = logging.getLogger(__name__)
+
+    def run(self):
+        socket = self._context.socket(zmq.PAIR)
+        socket.set_hwm(_WORKER_HWM)
+        socket.connect(self.address)
+        service = PubSubService(socket, self._protected_topics, None,
+                                peer_formats=self._peer_formats)
+        try:
+            while True:
+                frames = socket.recv_multipart(copy=False)
+                op = frames[0].bytes
+                if op == b'stop':
+                    break
+                try:
+                    if op == b'handle':
+                        response = service.handle_subsystem(
+                            frames[2:], frames[1].bytes)
+                        if response:
+                            socket.send_multipart(response, flags=NOBLOCK,
+                                                  copy=False)
+                    elif op == b'add':
+                        service.peer_add(frames[1].bytes)
+                    elif op == b'drop':
+                        service.peer_drop(frames[1].bytes)
+                except ZMQError as exc:
+                    self._logger.debug("PUBSUBSERVICE dropped response: "
+                                       "{}".format(exc))
+                except Exception:
+                    self._logger.exception("PUBSUBSERVICE error handling "
+                                           "{} request".format(op))
+        finally:
+            socket.close()
+
+
+class ProtectedPubSubTopics(_ProtectedTopics):
+    '''Protected pubsub topics, where a topic also protects its subtopics
+
+    Topics are looked up by trying the prefixes of the topic that have
+    the same length as a protected topic, longest first, so the cost
+    depends on the number of distinct topic lengths rather than on the
+    number of protected topics.
+    '''
     def __init__(self):
-        self._dict = {}
-        self._re_list = []
+        super(ProtectedPubSubTopics, self).__init__()
+        self._lengths = []
 
     def add(self, topic, capabilities):
-        if isinstance(capabilities, basestring):
-            capabilities = [capabilities]
-        if len(topic) > 1 and topic[0] == topic[-1] == '/':
-            regex = re.compile('^' + topic[1:-1] + '$')
-            self._re_list.append((regex, capabilities))
-        else:
-            self._dict[topic] = capabilities
+        super(ProtectedPubSubTopics, self).add(topic, capabilities)
+        if topic in self._dict and len(topic) not in self._lengths:
+            self._lengths.append(len(topic))
+            self._lengths.sort(reverse=True)
 
     def get(self, topic):
-        if topic in self._dict:
-            return self._dict[topic]
-
-        prefix = self._isprefix(topic)
-        if prefix is not None:
-            return self._dict[prefix]
-        for regex, capabilities in self._re_list:
-            if regex.match(topic):
-                return capabilities
-        return None
-
-    def _isprefix(self, topic):
-        for prefix in self._dict:
-            if topic[:len(prefix)] == prefix:
-                return prefix
-        return None
-
+        size = len(topic)
+        for length in self._lengths:
+            if length <= size:
+                capabilities = self._dict.get(topic[:length])
+                if capabilities is not None:
+                    return capabilities
+        return self._match(topic)
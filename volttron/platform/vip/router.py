@@ -44,6 +44,7 @@ import logging
 import zmq
 from zmq import Frame, NOBLOCK, ZMQError, EINVAL, EHOSTUNREACH
 
+from . import serialization
 from .pubsubservice import PubSubService
 
 __all__ = ['BaseRouter', 'OUTGOING', 'INCOMING', 'UNROUTABLE', 'ERROR']
@@ -96,6 +97,8 @@ class BaseRouter(object):
         self.default_user_id = default_user_id
         self.socket = None
         self._peers = set()
+        # Payload format negotiated by each peer that chose other than JSON
+        self._peer_formats = {}
         self._poller = zmq.Poller()
         self._ext_sockets = []
         self._socket_id_mapping = {}
@@ -235,6 +238,7 @@ class BaseRouter(object):
             self._peers.remove(peer)
         except KeyError:
             return
+        self._peer_formats.pop(peer, None)
         self._distribute(b'peerlist', b'drop', peer)
         self._drop_pubsub_peers(peer)
 
@@ -279,8 +283,10 @@ class BaseRouter(object):
             # Handle requests directed at the router
             name = subsystem.bytes
             if name == b'hello':
+                fmt = self._negotiate_format(sender.bytes, frames[7:8])
                 frames = [sender, recipient, proto, user_id, msg_id,
-                          b'hello', b'welcome', b'1.0', socket.identity, sender]
+                          b'hello', b'welcome', b'1.0', socket.identity, sender,
+                          fmt]
             elif name == b'ping':
                 frames[:7] = [
                     sender, recipient, proto, user_id, msg_id, b'ping', b'pong']
@@ -314,10 +320,48 @@ class BaseRouter(object):
                     frames = response
         else:
             # Route all other requests to the recipient
+            if self._peer_formats:
+                self._convert_format(frames)
             frames[:4] = [recipient, sender, proto, user_id]
         for peer in self._send(frames):
             self._drop_peer(peer)
 
+    def _negotiate_format(self, peer, offered):
+        '''Choose the payload format for peer from the formats offered.
+
+        offered holds at most one frame with a comma-separated list of
+        format names. Peers that do not offer any are using JSON.
+        '''
+        if offered:
+            fmt = serialization.negotiate(offered[0].bytes.split(b',')).name
+        else:
+            fmt = serialization.JSON.name
+        if fmt == serialization.JSON.name:
+            self._peer_formats.pop(peer, None)
+        else:
+            self._peer_formats[peer] = fmt
+        return fmt
+
+    def _convert_format(self, frames):
+        '''Convert an RPC payload to JSON if the recipient needs it.
+
+        Agents always encode requests in their negotiated format but
+        answer in the format of the request, so only requests from a
+        peer using another format to a peer using JSON are converted.
+        '''
+        if frames[5].bytes != b'RPC':
+            return
+        formats = self._peer_formats
+        fmt = formats.get(frames[0].bytes)
+        if fmt is None or formats.get(frames[1].bytes) == fmt:
+            return
+        try:
+            frames[6:] = [serialization.to_json(frame.bytes)
+                          for frame in frames[6:]]
+        except ValueError as exc:
+            _log.error('Unable to convert RPC payload from %s to JSON: %s',
+                       fmt, exc)
+
     def _send(self, frames):
         issue = self.issue
         socket = self.socket
@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*- {{{
+# vim: set fenc=utf-8 ft=python sw=4 ts=4 sts=4 et:
+#
+# Copyright 2017, Battelle Memorial Institute.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+# http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+#
+# This material was prepared as an account of work sponsored by an agency of
+# the United States Government. Neither the United States Government nor the
+# United States Department of Energy, nor Battelle, nor any of their
+# employees, nor any jurisdiction or organization that has cooperated in the
+# development of these materials, makes any warranty, express or
+# implied, or assumes any legal liability or responsibility for the accuracy,
+# completeness, or usefulness or any information, apparatus, product,
+# software, or process disclosed, or represents that its use would not infringe
+# privately owned rights. Reference herein to any specific commercial product,
+# process, or service by trade name, trademark, manufacturer, or otherwise
+# does not necessarily constitute or imply its endorsement, recommendation, or
+# favoring by the United States Government or any agency thereof, or
+# Battelle Memorial Institute. The views and opinions of authors expressed
+# herein do not necessarily state or reflect those of the
+# United States Government or any agency thereof.
+#
+# PACIFIC NORTHWEST NATIONAL LABORATORY operated by
+# BATTELLE for the UNITED STATES DEPARTMENT OF ENERGY
+# under Contract DE-AC05-76RL01830
+# }}}
+
+
+'''Serialization of VIP RPC and pubsub payloads.
+
+JSON is always available and is the default. MessagePack is offered
+when the msgpack package is installed. Formats are negotiated with the
+router during the hello handshake: the agent lists the formats it
+accepts, in order of preference, and the router replies with the one
+it chose. Payloads are tagged implicitly by their first byte, which is
+printable ASCII for JSON text and 0x80 or above for the MessagePack
+maps and arrays used by RPC and pubsub, so receivers can always decode
+either format and peers that never negotiated keep using JSON.
+'''
+
+from __future__ import absolute_import
+
+from volttron.platform.agent import json as jsonapi
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+__all__ = ['JSON', 'MSGPACK', 'get_serializer', 'supported_formats',
+           'negotiate', 'detect', 'loads', 'to_json']
+
+
+class JSONSerializer(object):
+    name = b'json'
+
+    @staticmethod
+    def dumps(obj):
+        return jsonapi.dumps(obj)
+
+    @staticmethod
+    def loads(data):
+        return jsonapi.loads(data)
+
+
+class MsgPackSerializer(object):
+    name = b'msgpack'
+
+    @staticmethod
+    def dumps(obj):
+        return msgpack.packb(obj, use_bin_type=False)
+
+    @staticmethod
+    def loads(data):
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except ValueError:
+            raise
+        except Exception as exc:
+            # Report corrupt data the same way the JSON decoder does.
+            raise ValueError(str(exc))
+
+
+JSON = JSONSerializer()
+MSGPACK = MsgPackSerializer() if msgpack is not None else None
+
+_SERIALIZERS = {JSON.name: JSON}
+if MSGPACK is not None:
+    _SERIALIZERS[MSGPACK.name] = MSGPACK
+
+
+def get_serializer(name):
+    '''Return the serializer for format name or raise KeyError.'''
+    return _SERIALIZERS[name]
+
+
+def supported_formats(preferred=None):
+    '''Return the names of the formats this process can use.
+
+    The preferred format, if given and available, is listed first and
+    JSON is always included.
+    '''
+    names = [JSON.name]
+    if preferred and preferred in _SERIALIZERS and preferred != JSON.name:
+        names.insert(0, preferred)
+    return names
+
+
+def negotiate(offered):
+    '''Return the first serializer in offered that is available.
+
+    Falls back to JSON, which every peer understands.
+    '''
+    for name in offered:
+        try:
+            return _SERIALIZERS[name]
+        except KeyError:
+            pass
+    return JSON
+
+
+def detect(data):
+    '''Return the serializer that produced data.'''
+    if MSGPACK is not None and data and ord(data[0]) >= 0x80:
+        return MSGPACK
+    return JSON
+
+
+def loads(data):
+    '''Deserialize data in whichever supported format it is encoded.'''
+    return detect(data).loads(data)
+
+
+def to_json(data):
+    '''Return data encoded as JSON, re-encoding it only if necessary.'''
+    serializer = detect(data)
+    if serializer is JSON:
+        return data
+    return JSON.dumps(serializer.loads(data))
@@ -45,11 +45,17 @@
 
 from __future__ import absolute_import, print_function
 
+import time
+
 import gevent
 
 from .router import UNROUTABLE, ERROR, INCOMING
 
-__all__ = ['Tracker']
+__all__ = ['Tracker', 'Metrics']
+
+# Upper bounds, in microseconds, of the routing latency histogram buckets.
+# The last bucket also counts everything slower.
+LATENCY_BUCKETS = [1 << exp for exp in range(21)]
 
 
 def pick(frames, index):
@@ -119,3 +125,87 @@ class Tracker(object):
         if self.enabled:
             self.enabled = False
             self.stats['end'] = gevent.get_hub().loop.now()
+
+
+class Metrics(object):
+    '''Always-on router counters and routing latency histogram.
+
+    Unlike Tracker, which keeps detailed per-peer and per-user counts
+    while explicitly enabled, Metrics keeps only a handful of counters
+    per subsystem so it can stay enabled without slowing routing. It is
+    only updated from the router thread; readers get copies from
+    snapshot().
+    '''
+
+    def __init__(self):
+        # Current values, such as the number of connected peers, set by
+        # the router and not affected by reset().
+        self.gauges = {}
+        self.reset()
+
+    def reset(self):
+        '''Reset all counters and set start time.'''
+        # subsystem: [messages in, bytes in, messages out, bytes out]
+        self.subsystems = {}
+        self.errors = {}
+        self.unroutable = {}
+        self.latency = [0] * len(LATENCY_BUCKETS)
+        self.start = time.time()
+
+    def incoming(self, frames):
+        '''Count a message received by the router.'''
+        try:
+            counts = self.subsystems[bytes(frames[5])]
+        except IndexError:
+            return
+        except KeyError:
+            counts = self.subsystems[bytes(frames[5])] = [0, 0, 0, 0]
+        counts[0] += 1
+        counts[1] += sum(len(frame) for frame in frames)
+
+    def outgoing(self, frames):
+        '''Count a message sent by the router.'''
+        try:
+            counts = self.subsystems[bytes(frames[5])]
+        except IndexError:
+            return
+        except KeyError:
+            counts = self.subsystems[bytes(frames[5])] = [0, 0, 0, 0]
+        counts[2] += 1
+        counts[3] += sum(len(frame) for frame in frames)
+
+    def error(self, errnum):
+        '''Count a routing error, such as a message dropped on EAGAIN.'''
+        increment(self.errors, bytes(errnum))
+
+    def unroutable_message(self, reason):
+        '''Count a message the router could not route.'''
+        increment(self.unroutable, reason)
+
+    def routed(self, elapsed):
+        '''Add the time, in seconds, taken to route one message.'''
+        index = int(elapsed * 1000000).bit_length()
+        if index >= len(self.latency):
+            index = -1
+        self.latency[index] += 1
+
+    def snapshot(self, **extra):
+        '''Return a JSON serializable copy of the current metrics.'''
+        now = time.time()
+        subsystems = {}
+        for subsystem, counts in self.subsystems.items():
+            subsystems[subsystem] = dict(zip(
+                ('messages_in', 'bytes_in', 'messages_out', 'bytes_out'),
+                counts))
+        result = {
+            'start': self.start,
+            'time': now,
+            'subsystems': subsystems,
+            'errors': dict(self.errors),
+            'unroutable': dict(self.unroutable),
+            'gauges': dict(self.gauges),
+            'latency': {'buckets_us': LATENCY_BUCKETS,
+                        'counts': list(self.latency)},
+        }
+        result.update(extra)
+        return result
@@ -1,7 +1,7 @@
 # Module copied from
 # http://code.activestate.com/recipes/576642-persistent-dict-with-multiple-standard-file-format/
-import pickle, json, csv, os, shutil, shelve, logging
-from threading import Thread
+import pickle, json, csv, os, shutil, shelve, logging, hashlib
+from threading import Thread, Lock
 from Queue import Queue
 from copy import deepcopy
 
@@ -51,9 +51,11 @@ class PersistentDict(dict):
     @staticmethod
     def _process_loop():
         while True:
-            filename, contents, format, mode = PersistentDict._event_queue.get()
-
-            PersistentDict._update_file(filename, contents, format, mode)
+            func, args = PersistentDict._event_queue.get()
+            try:
+                func(*args)
+            except Exception:
+                _log.exception("Error writing persistent store")
 
 
     def sync(self):
@@ -66,7 +68,9 @@ class PersistentDict(dict):
         """Write dict to disk via worker thread. Don't mix with sync if it can be helped"""
         if self.flag == 'r':
             return
-        PersistentDict._event_queue.put((self.filename, deepcopy(self), self.format, self.mode))
+        PersistentDict._event_queue.put(
+            (PersistentDict._update_file,
+             (self.filename, deepcopy(self), self.format, self.mode)))
 
     @staticmethod
     def _update_file(filename, contents, format, mode):
@@ -123,6 +127,197 @@ class PersistentDict(dict):
         raise ValueError('File not in a supported format')
 
 
+class JournaledDict(PersistentDict):
+    """ PersistentDict that records changes in an append-only journal.
+
+    The dict is stored as a json snapshot in filename plus a journal in
+    filename + '.journal' holding one json line per changed key. async_sync
+    only appends the keys changed since the previous call, so the cost of a
+    change no longer depends on the size of the dict. The journal is folded
+    into a new snapshot (compacted) once it holds more entries than the dict
+    has keys, which keeps the total amount written linear in the number of
+    changes. sync always compacts.
+
+    The first line of the journal records a digest of the snapshot it
+    applies to. A journal left behind by a crash after a newer snapshot was
+    written (or the snapshot removed) no longer matches and is discarded
+    instead of being replayed over the newer snapshot.
+
+    Snapshots written by PersistentDict in json format are read as is.
+    """
+
+    journal_ext = '.journal'
+
+    def __init__(self, filename, flag='c', mode=None, compact_min=100,
+                 *args, **kwds):
+        self._dirty = set()
+        self._compact = False
+        self._lock = Lock()
+        self._generation = 0
+        self.compact_min = compact_min
+        self.journal_filename = filename + self.journal_ext
+        self._journal_length = 0
+        super(JournaledDict, self).__init__(filename, flag, mode, 'json',
+                                            *args, **kwds)
+        self._has_snapshot = bool(self) or os.access(filename, os.R_OK)
+        self._digest = self._file_digest(filename)
+        if flag != 'n' and os.access(self.journal_filename, os.R_OK):
+            with open(self.journal_filename, 'r') as fileobj:
+                stale = not self._replay(fileobj)
+            if stale and flag != 'r':
+                os.remove(self.journal_filename)
+        self._dirty.clear()
+
+    @staticmethod
+    def _file_digest(filename):
+        try:
+            with open(filename, 'rb') as fileobj:
+                return hashlib.md5(fileobj.read()).hexdigest()
+        except IOError:
+            return None
+
+    def _replay(self, fileobj):
+        """ Apply the journal to the dict. Returns False without applying
+        anything if the journal belongs to a different snapshot. """
+        for line in fileobj:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # A partially written final entry from an interrupted write.
+                _log.warning("Ignoring corrupt journal entry in {}".format(
+                    self.journal_filename))
+                break
+            if 'key' not in entry:
+                if entry.get('snapshot') != self._digest:
+                    _log.warning("Ignoring stale journal {}".format(
+                        self.journal_filename))
+                    return False
+                continue
+            key = entry['key']
+            if 'value' in entry:
+                dict.__setitem__(self, key, entry['value'])
+            else:
+                dict.pop(self, key, None)
+            self._journal_length += 1
+        return True
+
+    def __setitem__(self, key, value):
+        self._dirty.add(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self._dirty.add(key)
+
+    def pop(self, key, *args):
+        self._dirty.add(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        key, value = dict.popitem(self)
+        self._dirty.add(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        self._dirty.add(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwds):
+        for key, value in dict(*args, **kwds).iteritems():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        self._dirty.clear()
+        self._compact = True
+
+    def sync(self):
+        """ Write a full snapshot to disk and truncate the journal """
+        if self.flag == 'r':
+            return
+        self._dirty.clear()
+        self._compact = False
+        generation = self._start_snapshot()
+        self._write_snapshot(generation, json.dumps(self, separators=(',', ':'))
+                             if self else None)
+
+    def async_sync(self):
+        """Write changes to disk via worker thread. Don't mix with sync if it can be helped"""
+        if self.flag == 'r':
+            return
+        if (self._compact or not self._has_snapshot or not self or
+                self._journal_length + len(self._dirty) >
+                max(self.compact_min, len(self))):
+            self._dirty.clear()
+            self._compact = False
+            generation = self._start_snapshot()
+            contents = json.dumps(self, separators=(',', ':')) if self else None
+            PersistentDict._event_queue.put(
+                (self._write_snapshot, (generation, contents)))
+            return
+        if not self._dirty:
+            return
+        lines = []
+        for key in self._dirty:
+            if key in self:
+                entry = {'key': key, 'value': self[key]}
+            else:
+                entry = {'key': key}
+            lines.append(json.dumps(entry, separators=(',', ':')) + '\n')
+        self._dirty.clear()
+        self._journal_length += len(lines)
+        PersistentDict._event_queue.put(
+            (self._append_journal, (self._generation, ''.join(lines))))
+
+    def _start_snapshot(self):
+        with self._lock:
+            self._generation += 1
+            self._journal_length = 0
+            self._has_snapshot = bool(self)
+            return self._generation
+
+    def _write_snapshot(self, generation, contents):
+        with self._lock:
+            # A newer snapshot has already been started.
+            if generation < self._generation:
+                return
+            # The journal is removed after the snapshot is replaced; if that
+            # does not happen its digest no longer matches and it is ignored.
+            if contents is None:
+                self._digest = None
+                for filename in (self.filename, self.journal_filename):
+                    try:
+                        os.remove(filename)
+                    except OSError:
+                        pass
+                return
+            tempname = self.filename + '.tmp'
+            with open(tempname, 'w') as fileobj:
+                fileobj.write(contents)
+            shutil.move(tempname, self.filename)  # atomic commit
+            self._digest = hashlib.md5(contents).hexdigest()
+            if self.mode is not None:
+                os.chmod(self.filename, self.mode)
+            try:
+                os.remove(self.journal_filename)
+            except OSError:
+                pass
+
+    def _append_journal(self, generation, lines):
+        with self._lock:
+            # Changes queued before a snapshot are already part of it.
+            if generation < self._generation:
+                return
+            new_journal = not os.path.exists(self.journal_filename)
+            with open(self.journal_filename, 'a') as fileobj:
+                if new_journal:
+                    fileobj.write(json.dumps({'snapshot': self._digest}) +
+                                  '\n')
+                fileobj.write(lines)
+            if self.mode is not None:
+                os.chmod(self.journal_filename, self.mode)
+
+
 if __name__ == '__main__':
     import random
 
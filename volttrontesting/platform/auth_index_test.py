@@ -0,0 +1,63 @@
+import pytest
+
+from volttron.platform.auth import AuthEntry, AuthEntryIndex, dump_user
+
+KEY1 = 'A' * 43
+KEY2 = 'B' * 43
+
+
+def linear_find(entries, domain, address, mechanism, credentials):
+    for entry in entries:
+        if entry.match(domain, address, mechanism, credentials):
+            return entry
+
+
+@pytest.fixture
+def entries():
+    entries = [
+        AuthEntry(credentials=KEY1, user_id='exact', capabilities=['a']),
+        AuthEntry(credentials=KEY1, address='10.0.0.2', user_id='other'),
+        AuthEntry(credentials='/B+/', user_id='regex', capabilities=['b']),
+        AuthEntry(mechanism='PLAIN', credentials=['pass', '/p.*/'],
+                  user_id='list'),
+        AuthEntry(mechanism='PLAIN', credentials='pass', user_id='plain'),
+        AuthEntry(mechanism='NULL', address='/127\\..*/', user_id='null'),
+        AuthEntry(domain='vip', credentials=KEY2, user_id='domain'),
+    ]
+    entries.sort()
+    return entries
+
+
+@pytest.mark.auth
+def test_find_matches_linear_search(entries):
+    index = AuthEntryIndex(entries)
+    for args in [('vip', '10.0.0.1', 'CURVE', [KEY1]),
+                 ('vip', '10.0.0.2', 'CURVE', [KEY1]),
+                 ('vip', '10.0.0.1', 'CURVE', [KEY2]),
+                 ('other', '10.0.0.1', 'CURVE', [KEY2]),
+                 ('vip', '10.0.0.1', 'PLAIN', ['pass']),
+                 ('vip', '10.0.0.1', 'PLAIN', ['past']),
+                 ('vip', '127.0.0.1', 'NULL', []),
+                 ('vip', '10.0.0.1', 'NULL', []),
+                 ('vip', '10.0.0.1', 'CURVE', ['D' * 43])]:
+        expected = linear_find(entries, *args)
+        assert index.find(*args) is expected
+        # and again from the cache
+        assert index.find(*args) is expected
+
+
+@pytest.mark.auth
+def test_cache_is_bounded(entries):
+    index = AuthEntryIndex(entries, cache_size=2)
+    for i in range(5):
+        index.find('vip', '10.0.0.%d' % i, 'CURVE', [KEY1])
+    assert len(index._cache) == 2
+
+
+@pytest.mark.auth
+def test_find_authorizations(entries):
+    index = AuthEntryIndex(entries)
+    assert index.find_authorizations('exact') == [['a'], [], []]
+    user_id = dump_user('other', '10.0.0.1', 'CURVE', KEY2)
+    assert index.find_authorizations(user_id) == (['b'], [], [])
+    assert index.find_authorizations('unknown') is None
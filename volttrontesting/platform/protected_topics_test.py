@@ -0,0 +1,58 @@
+from volttron.platform.vip.agent.subsystems.pubsub import \
+    ProtectedPubSubTopics
+
+
+def test_exact_and_regex_topics():
+    topics = ProtectedPubSubTopics()
+    assert not topics
+    topics.add('devices/actuators/schedule/request', 'can_schedule')
+    topics.add('/devices/.*/a/.*/', ['can_a'])
+    topics.add('/devices/.*/', ['can_devices'])
+    assert len(topics) == 3
+
+    assert topics.get('devices/actuators/schedule/request') == \
+        ['can_schedule']
+    # the first matching expression wins, as with a linear scan
+    assert topics.get('devices/campus/a/point') == ['can_a']
+    assert topics.get('devices/campus/b/point') == ['can_devices']
+    assert topics.get('analysis/campus') is None
+
+
+def test_regex_topics_with_groups():
+    topics = ProtectedPubSubTopics()
+    topics.add('/(devices|analysis)/(.*)/\\2/', ['can_repeat'])
+    topics.add('/devices/.*/', ['can_devices'])
+    assert topics.get('analysis/x/x') == ['can_repeat']
+    assert topics.get('devices/x/y') == ['can_devices']
+    assert topics.get('record/x') is None
+
+
+def test_more_regex_topics_than_named_groups():
+    topics = ProtectedPubSubTopics()
+    for index in range(250):
+        topics.add('/devices/x{}/.*/'.format(index), ['can_{}'.format(index)])
+    topics.add('/devices/.*/', ['can_devices'])
+
+    assert topics.get('devices/x0/point') == ['can_0']
+    assert topics.get('devices/x98/point') == ['can_98']
+    assert topics.get('devices/x99/point') == ['can_99']
+    assert topics.get('devices/x249/point') == ['can_249']
+    assert topics.get('devices/y/point') == ['can_devices']
+    assert topics.get('analysis/x0/point') is None
+
+
+def test_service_topics_protect_subtopics():
+    from volttron.platform.vip.pubsubservice import \
+        ProtectedPubSubTopics as ServiceTopics
+    topics = ServiceTopics()
+    topics.add('devices', ['can_devices'])
+    topics.add('devices/campus/building', ['can_building'])
+    topics.add('/analysis/.*/', ['can_analysis'])
+
+    assert topics.get('devices') == ['can_devices']
+    assert topics.get('devices/campus/other') == ['can_devices']
+    # the longest protected prefix wins
+    assert topics.get('devices/campus/building/rtu') == ['can_building']
+    assert topics.get('analysis/campus') == ['can_analysis']
+    assert topics.get('record/campus') is None
+    assert topics.get('dev') is None
@@ -0,0 +1,72 @@
+import random
+from datetime import timedelta
+
+import gevent
+import pytest
+
+from volttron.platform.agent.utils import get_aware_utc_now
+from volttron.platform.vip.agent.core import (BasicCore, EventQueue,
+                                              ScheduledEvent)
+
+
+def noop():
+    pass
+
+
+def test_event_queue_order_and_cancel():
+    queue = EventQueue()
+    events = [ScheduledEvent(noop) for _ in range(200)]
+    deadlines = {}
+    for event in events:
+        deadlines[event] = random.randint(0, 50)
+        queue.push(deadlines[event], event)
+
+    canceled = set(random.sample(events, 80))
+    for event in canceled:
+        event.cancel()
+        # canceling twice is harmless
+        event.cancel()
+    assert len(queue) == 120
+
+    popped = []
+    while queue:
+        popped.append(queue.pop())
+    assert not canceled.intersection(popped)
+    expected = sorted((e for e in events if e not in canceled),
+                      key=lambda e: (deadlines[e], events.index(e)))
+    assert popped == expected
+    assert queue.next_deadline() is None
+
+
+def test_event_queue_reschedule():
+    queue = EventQueue()
+    first, second = ScheduledEvent(noop), ScheduledEvent(noop)
+    queue.push(10, first)
+    queue.push(20, second)
+    queue.push(30, first)
+    assert len(queue) == 2
+    assert queue.next_deadline() == 20
+    assert queue.pop() is second
+    assert queue.pop() is first
+
+
+@pytest.mark.timeout(10)
+def test_schedule_runs_callbacks():
+    core = BasicCore(None)
+    calls = []
+    greenlet = gevent.spawn(core.run)
+    gevent.sleep(0.01)
+
+    now = get_aware_utc_now()
+    core.schedule(now + timedelta(seconds=0.05), calls.append, 'first')
+    canceled = core.schedule(now + timedelta(seconds=0.05), calls.append,
+                             'canceled')
+    core.schedule(now + timedelta(seconds=0.1), calls.append, 'second')
+    canceled.cancel()
+    assert len(core._schedule) == 2
+
+    gevent.sleep(0.3)
+    core.stop()
+    greenlet.join()
+    assert calls == ['first', 'second']
+    assert len(core._schedule) == 0
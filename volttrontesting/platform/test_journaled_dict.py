@@ -0,0 +1,116 @@
+import json
+import os
+import time
+
+from volttron.utils.persistance import JournaledDict, PersistentDict
+
+
+def wait_for_writes():
+    done = []
+    PersistentDict._event_queue.put((done.append, (True,)))
+    for _ in range(500):
+        if done:
+            return
+        time.sleep(0.01)
+    raise AssertionError('persistent store writes did not finish')
+
+
+def test_changes_are_journaled(tmpdir):
+    filename = str(tmpdir.join('agent.store'))
+    store = JournaledDict(filename, compact_min=10)
+    store['a'] = {'data': 1}
+    store.async_sync()
+    wait_for_writes()
+    # The first change creates the snapshot
+    assert os.path.exists(filename)
+    assert not os.path.exists(store.journal_filename)
+
+    store['b'] = {'data': 2}
+    store['a'] = {'data': 3}
+    store.async_sync()
+    store.pop('b')
+    store.async_sync()
+    wait_for_writes()
+    with open(store.journal_filename) as f:
+        # a header naming the snapshot, then one line per change
+        assert len(f.readlines()) == 4
+    with open(filename) as f:
+        assert json.load(f) == {'a': {'data': 1}}
+
+    assert JournaledDict(filename) == {'a': {'data': 3}}
+
+
+def test_compaction(tmpdir):
+    filename = str(tmpdir.join('agent.store'))
+    store = JournaledDict(filename, compact_min=10)
+    for i in range(5):
+        store[str(i)] = i
+        store.async_sync()
+    # Once the journal holds more entries than the store it is compacted
+    for i in range(30):
+        store['0'] = i
+        store.async_sync()
+    wait_for_writes()
+    with open(store.journal_filename) as f:
+        assert len(f.readlines()) <= 10
+    assert JournaledDict(filename) == dict(
+        [(str(i), i) for i in range(1, 5)] + [('0', 29)])
+
+    store.sync()
+    assert not os.path.exists(store.journal_filename)
+    with open(filename) as f:
+        assert json.load(f) == store
+
+
+def test_empty_store_removes_files(tmpdir):
+    filename = str(tmpdir.join('agent.store'))
+    store = JournaledDict(filename)
+    store['a'] = 1
+    store.async_sync()
+    store['b'] = 2
+    store.async_sync()
+    store.clear()
+    store.async_sync()
+    wait_for_writes()
+    assert not os.path.exists(filename)
+    assert not os.path.exists(store.journal_filename)
+
+
+def test_truncated_journal_entry_is_ignored(tmpdir):
+    filename = str(tmpdir.join('agent.store'))
+    with open(filename, 'w') as f:
+        json.dump({'a': 1}, f)
+    with open(filename + JournaledDict.journal_ext, 'w') as f:
+        f.write('{"key":"b","value":2}\n{"key":"a"}\n{"key":"c","va')
+    assert JournaledDict(filename) == {'b': 2}
+
+
+def test_stale_journal_is_not_replayed(tmpdir):
+    filename = str(tmpdir.join('agent.store'))
+    store = JournaledDict(filename)
+    store['a'] = 1
+    store['b'] = 2
+    store.async_sync()
+    store['a'] = 3
+    store.async_sync()
+    wait_for_writes()
+    with open(store.journal_filename) as f:
+        stale_journal = f.read()
+
+    # Simulate a crash after the new snapshot was committed but before the
+    # journal was removed.
+    store.pop('b')
+    store['a'] = 4
+    store.sync()
+    with open(store.journal_filename, 'w') as f:
+        f.write(stale_journal)
+    assert JournaledDict(filename) == {'a': 4}
+    # The stale journal is discarded so new changes are not appended to it.
+    assert not os.path.exists(store.journal_filename)
+
+    # The same crash while removing the files of an emptied store.
+    store.clear()
+    store.sync()
+    with open(store.journal_filename, 'w') as f:
+        f.write(stale_journal)
+    assert JournaledDict(filename) == {}
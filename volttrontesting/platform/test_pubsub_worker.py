@@ -0,0 +1,50 @@
+import json
+
+import pytest
+import zmq
+
+from volttron.platform.vip.pubsubservice import PubSubWorker
+
+
+def request(socket, sender, op, msg, user_id=b''):
+    frames = [sender, b'', b'VIP1', user_id, b'1', b'pubsub', op]
+    frames.extend(msg)
+    socket.send_multipart([b'handle', user_id] + frames)
+
+
+@pytest.mark.timeout(10)
+def test_worker_handles_pubsub_requests():
+    context = zmq.Context.instance()
+    socket = context.socket(zmq.PAIR)
+    socket.bind(PubSubWorker.address)
+    socket.rcvtimeo = 5000
+    PubSubWorker(context, {}).start()
+    try:
+        request(socket, b'subscriber', b'subscribe',
+                [json.dumps({'prefix': 'devices', 'bus': ''})])
+        response = socket.recv_multipart()
+        assert response[0] == b'subscriber'
+        assert response[6:] == [b'request_response', b'True']
+
+        request(socket, b'publisher', b'publish',
+                [b'devices/rtu', json.dumps({'bus': '', 'headers': {},
+                                            'message': 42})])
+        frames = socket.recv_multipart()
+        assert frames[0] == b'subscriber'
+        assert frames[7] == b'devices/rtu'
+        assert json.loads(frames[8])['sender'] == 'publisher'
+        response = socket.recv_multipart()
+        assert response[0] == b'publisher'
+        assert response[6:] == [b'request_response', b'1']
+
+        # dropped peers lose their subscriptions
+        socket.send_multipart([b'drop', b'subscriber'])
+        request(socket, b'publisher', b'publish',
+                [b'devices/rtu', json.dumps({'bus': '', 'headers': {},
+                                            'message': 42})])
+        response = socket.recv_multipart()
+        assert response[0] == b'publisher'
+        assert response[6:] == [b'request_response', b'0']
+    finally:
+        socket.send_multipart([b'stop'])
+        socket.close(linger=0)
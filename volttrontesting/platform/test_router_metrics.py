@@ -0,0 +1,41 @@
+import zmq
+
+from volttron.platform.vip.tracking import LATENCY_BUCKETS, Metrics
+
+
+def test_metrics_counts_and_latency():
+    metrics = Metrics()
+    frames = [zmq.Frame(b'sender'), b'', b'VIP1', b'', b'1', b'pubsub',
+              b'publish']
+    metrics.incoming(frames)
+    metrics.incoming(frames)
+    metrics.outgoing(frames)
+    # router probes have no subsystem
+    metrics.incoming([b'peer', b''])
+    metrics.error(zmq.Frame(b'11'))
+    metrics.unroutable_message('too few frames')
+    metrics.routed(0.0000005)
+    metrics.routed(0.003)
+    metrics.routed(100)
+    metrics.gauges['peers'] = 3
+
+    snapshot = metrics.snapshot()
+    size = sum(len(frame) for frame in frames)
+    assert snapshot['subsystems'] == {
+        'pubsub': {'messages_in': 2, 'bytes_in': 2 * size,
+                   'messages_out': 1, 'bytes_out': size}}
+    assert snapshot['errors'] == {'11': 1}
+    assert snapshot['unroutable'] == {'too few frames': 1}
+    assert snapshot['gauges'] == {'peers': 3}
+    counts = snapshot['latency']['counts']
+    assert len(counts) == len(LATENCY_BUCKETS)
+    assert sum(counts) == 3
+    assert counts[0] == 1 and counts[-1] == 1
+    # 3000us falls in the bucket bounded by 4096us
+    assert counts[LATENCY_BUCKETS.index(4096)] == 1
+
+    metrics.reset()
+    snapshot = metrics.snapshot()
+    assert snapshot['subsystems'] == {}
+    assert sum(snapshot['latency']['counts']) == 0
+    assert snapshot['gauges'] == {'peers': 3}
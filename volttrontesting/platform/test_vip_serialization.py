@@ -0,0 +1,40 @@
+import pytest
+
+from volttron.platform.vip import serialization
+from volttron.platform.vip.serialization import JSON, MSGPACK
+
+requires_msgpack = pytest.mark.skipif(MSGPACK is None,
+                                      reason='msgpack is not installed')
+
+PAYLOAD = {'bus': '', 'headers': {'Date': '2018-01-01T00:00:00'},
+           'message': [{'temp': 72.5, 'on': True, 'count': 3}, None]}
+
+
+def test_negotiate_falls_back_to_json():
+    assert serialization.negotiate([b'bogus']) is JSON
+    assert serialization.negotiate([]) is JSON
+    assert serialization.negotiate([b'bogus', b'json']) is JSON
+    assert serialization.supported_formats() == [b'json']
+    assert serialization.supported_formats(b'json') == [b'json']
+
+
+def test_json_round_trip():
+    data = JSON.dumps(PAYLOAD)
+    assert serialization.detect(data) is JSON
+    assert serialization.loads(data) == PAYLOAD
+    assert serialization.to_json(data) is data
+
+
+@requires_msgpack
+def test_msgpack_round_trip():
+    assert serialization.supported_formats(b'msgpack') == [b'msgpack',
+                                                           b'json']
+    assert serialization.negotiate([b'msgpack', b'json']) is MSGPACK
+    data = MSGPACK.dumps(PAYLOAD)
+    assert serialization.detect(data) is MSGPACK
+    assert serialization.loads(data) == PAYLOAD
+    assert JSON.loads(serialization.to_json(data)) == PAYLOAD
+    # JSON-RPC batches are arrays
+    assert serialization.loads(MSGPACK.dumps([PAYLOAD])) == [PAYLOAD]
+    with pytest.raises(ValueError):
+        MSGPACK.loads(data[:-3])
@@ -1,5 +1,10 @@
+import json
+
 import pytz
-from volttron.platform.agent.base_aggregate_historian import AggregateHistorian
+from volttron.platform.agent import utils
+from volttron.platform.agent.base_aggregate_historian import (
+    AggregateHistorian, RunningAggregate, _StreamingGroup)
+from volttron.platform.messaging import headers as headers_mod
 import pytest
 from datetime import datetime, timedelta
 
@@ -191,3 +196,224 @@ def test_compute_next_collection_time():
     assert next2 == datetime.strptime(
         '2016-04-30T01:15:23.123456',
         '%Y-%m-%dT%H:%M:%S.%f').replace(tzinfo=pytz.utc)
+
+
+@pytest.mark.aggregator
+def test_running_aggregate():
+    running = RunningAggregate()
+    for value in [3, 1.5, 7, -2]:
+        running.add(value)
+    assert running.value('count') == 4
+    assert running.value('sum') == 9.5
+    assert running.value('AVG') == 2.375
+    assert running.value('min') == -2
+    assert running.value('max') == 7
+    with pytest.raises(ValueError):
+        running.value('stddev')
+
+
+@pytest.mark.aggregator
+def test_streaming_window_end():
+    """
+    Values are assigned to the aggregation window that will be recorded at
+    the next collection or the following ones. Values older than the next
+    window are dropped.
+    """
+    collection_time = datetime.strptime(
+        '2016-03-01T01:15:23.123456',
+        '%Y-%m-%dT%H:%M:%S.%f').replace(tzinfo=pytz.utc)
+    group = _StreamingGroup('1h', True, [], collection_time)
+    group.set_next_collection(collection_time)
+    assert group.window_start == datetime(2016, 3, 1, 0, tzinfo=pytz.utc)
+    assert group.window_end == datetime(2016, 3, 1, 1, tzinfo=pytz.utc)
+
+    assert group.get_window_end(datetime(
+        2016, 2, 29, 23, 59, tzinfo=pytz.utc)) is None
+    assert group.get_window_end(datetime(
+        2016, 3, 1, 0, 30, tzinfo=pytz.utc)) == group.window_end
+    assert group.get_window_end(datetime(
+        2016, 3, 1, 1, 30, tzinfo=pytz.utc)) == \
+        datetime(2016, 3, 1, 2, tzinfo=pytz.utc)
+    assert group.get_window_end(datetime(
+        2016, 3, 1, 5, tzinfo=pytz.utc)) is None
+
+
+class RecordingAggregateHistorian(AggregateHistorian):
+    """
+    Aggregate historian that records the aggregates it collects from the
+    data store and the ones it inserts instead of using a database.
+    """
+    def __init__(self, config_path, **kwargs):
+        super(RecordingAggregateHistorian, self).__init__(config_path,
+                                                          **kwargs)
+        self.collected = []
+        self.inserted = []
+        self.scheduled = []
+        # The agent is not running; record the flushes it schedules.
+        self.core.schedule = lambda deadline, func, *args: \
+            self.scheduled.append(deadline)
+
+    def get_topic_map(self):
+        return {}, {}
+
+    def get_agg_topic_map(self):
+        return {}
+
+    def initialize_aggregate_store(self, aggregation_topic_name, agg_type,
+                                   agg_time_period, topics_meta):
+        pass
+
+    def update_aggregate_metadata(self, agg_id, aggregation_topic_name,
+                                  topic_meta):
+        pass
+
+    def collect_aggregate(self, topic_ids, agg_type, start_time, end_time):
+        self.collected.append((topic_ids, agg_type, start_time, end_time))
+        return 10.0, 3
+
+    def insert_aggregate(self, agg_topic_id, agg_type, agg_time_period,
+                         end_time, value, topic_ids):
+        pass
+
+    def insert_aggregates(self, agg_type, agg_time_period, end_time, rows):
+        self.inserted.append((agg_type, end_time, sorted(rows)))
+
+    def get_aggregation_list(self):
+        return ['AVG', 'MIN', 'MAX', 'COUNT', 'SUM']
+
+
+def utc(hour, minute=0):
+    return datetime(2016, 3, 1, hour, minute, tzinfo=pytz.utc)
+
+
+def publish(historian, timestamp, values):
+    historian._capture_streaming_data(
+        'pubsub', 'platform.driver', '',
+        'devices/Campus/Building/Device/all',
+        {headers_mod.DATE: timestamp.isoformat()},
+        [values, {}])
+
+
+@pytest.fixture
+def streaming_historian(tmpdir, monkeypatch):
+    """
+    Historian streaming hourly aggregates of a device's points since 01:15.
+    """
+    config_path = tmpdir.join('config')
+    config_path.write(json.dumps({}))
+    historian = RecordingAggregateHistorian(str(config_path))
+    points = [
+        {'topic_names': ['Campus/Building/Device/Temp'],
+         'topic_ids': [1],
+         'aggregation_type': 'avg',
+         'aggregation_topic_name': 'Campus/Building/Device/Temp',
+         'min_count': 2},
+        {'topic_names': ['Campus/Building/Device/Humidity'],
+         'topic_ids': [2],
+         'aggregation_type': 'max',
+         'aggregation_topic_name': 'Campus/Building/Device/Humidity'},
+        {'topic_names': ['Campus/Building/Device/Flag',
+                         'Campus/Building/Device/Mode'],
+         'topic_ids': [3, 4],
+         'aggregation_type': 'count',
+         'aggregation_topic_name': 'Campus/Building/Device/Status'}]
+    historian.agg_topic_id_map = {
+        ('campus/building/device/temp', 'avg', '1h'): 11,
+        ('campus/building/device/humidity', 'max', '1h'): 12,
+        ('campus/building/device/status', 'count', '1h'): 13}
+    monkeypatch.setattr(utils, 'get_aware_utc_now', lambda: utc(1, 15))
+    assert historian._init_streaming_group(utc(1, 15), '1h', True,
+                                           points) == []
+    return historian
+
+
+@pytest.mark.aggregator
+def test_streaming_falls_back_before_subscription(streaming_historian):
+    """
+    Periods that started before the agent subscribed to device publishes
+    are collected from the data store.
+    """
+    historian = streaming_historian
+    group = historian._streaming_groups[0]
+    assert set((tuple(topic_ids), start_time, end_time)
+               for topic_ids, _, start_time, end_time
+               in historian.collected) == {
+        ((1,), utc(0), utc(1)),
+        ((2,), utc(0), utc(1)),
+        ((3, 4), utc(0), utc(1))}
+    assert sorted(historian.inserted) == [
+        ('avg', utc(1), [(11, 10.0, [1])]),
+        ('count', utc(1), [(13, 10.0, [3, 4])]),
+        ('max', utc(1), [(12, 10.0, [2])])]
+    assert historian.scheduled == [utc(2, 15)]
+    assert group.window_end == utc(2)
+
+    # The period 01:00-02:00 started before the subscription too; what was
+    # streamed for it is dropped.
+    publish(historian, utc(1, 20), {'Temp': 70, 'Humidity': 40})
+    publish(historian, utc(2, 10), {'Temp': 72, 'Humidity': 42})
+    del historian.collected[:], historian.inserted[:]
+    historian.flush_streaming_aggregate_data(group, utc(2, 15))
+    assert historian.collected
+    assert all(end_time == utc(2)
+               for _, _, _, end_time in historian.collected)
+    points = group.points
+    assert [sorted(point.windows) for point in points] == \
+        [[utc(3)], [utc(3)], []]
+    assert historian.scheduled == [utc(2, 15), utc(3, 15)]
+
+
+@pytest.mark.aggregator
+def test_streaming_aggregates_recorded_at_flush(streaming_historian):
+    historian = streaming_historian
+    group = historian._streaming_groups[0]
+    historian.flush_streaming_aggregate_data(group, utc(2, 15))
+    del historian.collected[:], historian.inserted[:]
+
+    # Booleans and non numeric values are not aggregated. Values from a
+    # period already recorded or too far ahead are dropped.
+    publish(historian, utc(2, 10), {'Temp': 70, 'Humidity': 40.5,
+                                    'Flag': True, 'Mode': 'auto'})
+    publish(historian, utc(2, 40), {'Temp': 74, 'Humidity': 45,
+                                    'Other': 1})
+    publish(historian, utc(1, 50), {'Temp': 100, 'Humidity': 100})
+    publish(historian, utc(5, 10), {'Temp': 100, 'Humidity': 100})
+    # Routed to the following period.
+    publish(historian, utc(3, 10), {'Temp': 80, 'Humidity': 50})
+    historian._capture_streaming_data(
+        'pubsub', 'platform.driver', '',
+        'devices/Campus/Building/Device/Temp', {}, [75, {}])
+
+    historian.flush_streaming_aggregate_data(group, utc(3, 15))
+    assert historian.collected == []
+    assert sorted(historian.inserted) == [
+        ('avg', utc(3), [(11, 72.0, [1])]),
+        ('max', utc(3), [(12, 45, [2])])]
+    assert historian.scheduled[-1] == utc(4, 15)
+
+    # Temp has fewer values than its min_count.
+    del historian.inserted[:]
+    historian.flush_streaming_aggregate_data(group, utc(4, 15))
+    assert historian.inserted == [('max', utc(4), [(12, 50, [2])])]
+    assert [point.windows for point in group.points] == [{}, {}, {}]
+
+
+@pytest.mark.aggregator
+def test_streaming_flush_rescheduled_after_failure(streaming_historian):
+    historian = streaming_historian
+    group = historian._streaming_groups[0]
+    historian.flush_streaming_aggregate_data(group, utc(2, 15))
+    publish(historian, utc(2, 10), {'Humidity': 40})
+
+    def fail(agg_type, agg_time_period, end_time, rows):
+        raise RuntimeError('database is unavailable')
+    historian.insert_aggregates = fail
+    with pytest.raises(RuntimeError):
+        historian.flush_streaming_aggregate_data(group, utc(3, 15))
+    assert historian.scheduled[-1] == utc(4, 15)
+    assert group.next_collection_time == utc(4, 15)
+
+    # A group removed by a reconfiguration is no longer flushed.
+    historian._streaming_groups = []
+    historian.flush_streaming_aggregate_data(group, utc(4, 15))
+    assert historian.scheduled[-1] == utc(4, 15)
@@ -46,7 +46,8 @@ from volttron.platform.agent.base_historian import (BaseHistorian,
                                                     STATUS_KEY_BACKLOGGED,
                                                     STATUS_KEY_CACHE_COUNT,
                                                     STATUS_KEY_PUBLISHING,
-                                                    STATUS_KEY_CACHE_FULL)
+                                                    STATUS_KEY_CACHE_FULL,
+                                                    TopicRegistry)
 import pytest
 
 from volttron.platform.agent import utils
@@ -299,3 +300,27 @@ def test_health_stuff(request, historian, client_agent):
     assert not status["context"][STATUS_KEY_BACKLOGGED]
     assert not status["context"][STATUS_KEY_CACHE_FULL]
     assert not bool(status["context"][STATUS_KEY_CACHE_COUNT])
+
+
+def test_topic_registry():
+    registry = TopicRegistry()
+    registry.load({'a/b': 1}, {'a/b': 'A/b'}, {1: {'type': 'float'}})
+    assert registry.get_id('a/B') == 1
+    assert registry.get_name('a/b') == 'A/b'
+    assert not registry.update_meta(1, {'type': 'float'})
+    assert registry.pop_pending_meta() == []
+
+    registry.add('c/d', 2)
+    assert registry.update_meta(2, {'units': 'F', 'tags': ['x']})
+    assert registry.update_meta(1, {'type': 'integer'})
+    assert not registry.update_meta(2, {'tags': ['x'], 'units': 'F'})
+    pending = registry.pop_pending_meta()
+    assert sorted(pending) == [(1, {'type': 'integer'}),
+                               (2, {'units': 'F', 'tags': ['x']})]
+    assert registry.pop_pending_meta() == []
+
+    # metadata that failed to be written is queued again
+    registry.discard_pending_meta(pending)
+    assert registry.update_meta(1, {'type': 'integer'})
+    assert registry.get_meta(1) == {'type': 'integer'}
+    assert sorted(registry.topic_names()) == ['A/b', 'c/d']
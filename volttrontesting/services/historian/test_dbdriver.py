@@ -138,6 +138,18 @@ class Suite(object):
                          second=0, microsecond=0, tzinfo=pytz.UTC)
         assert driver.query(id_name_map.keys(), id_name_map, start, end) == values
 
+    def test_topic_map_and_meta(self, driver):
+        with_meta = driver.insert_topic('Building/LAB/Device/WithMeta')
+        without_meta = driver.insert_topic('Building/LAB/Device/WithoutMeta')
+        driver.insert_meta_many([(with_meta, {'units': 'X', 'type': 'float'})])
+        driver.commit()
+        id_map, name_map, meta_map = driver.get_topic_map_and_meta()
+        assert id_map['building/lab/device/withmeta'] == with_meta
+        assert name_map['building/lab/device/withoutmeta'] == \
+            'Building/LAB/Device/WithoutMeta'
+        assert meta_map[with_meta] == {'units': 'X', 'type': 'float'}
+        assert without_meta not in meta_map
+
     def test_topic_name_case_change(self, driver):
         topic_id = driver.insert_topic('This/is/some/Topic')
         assert topic_id
@@ -206,6 +218,34 @@ class AggregationSuite(Suite):
         driver.insert_agg_meta(topic_id, {'units': 'X', 'tz': 'UTC', 'type': 'float'})
         driver.insert_aggregate(topic_id, 'max', '1m', ts, '12.345', [1, 2, 3])
 
+    @pytest.mark.aggregator
+    @drop_tables(['avg_1h'])
+    def test_batched_aggregation(self, driver):
+        ts = start = datetime(year=2015, month=5, day=14, hour=9, minute=0,
+                              second=0, microsecond=0, tzinfo=pytz.UTC)
+        delta = timedelta(seconds=1)
+        for i in range(100):
+            for topic_id in range(1, 4):
+                driver.insert_data(ts, topic_id, float(i * topic_id))
+            ts += delta
+        driver.commit()
+        results = driver.collect_aggregates([1, 2, 3, 6], ['avg', 'sum'],
+                                            start, ts)
+        assert results == {
+            1: {'count': 100, 'avg': 49.5, 'sum': 4950.0},
+            2: {'count': 100, 'avg': 99.0, 'sum': 9900.0},
+            3: {'count': 100, 'avg': 148.5, 'sum': 14850.0}}
+        with pytest.raises(ValueError):
+            driver.collect_aggregates([1], ['bogus'], start, ts)
+
+        driver.create_aggregate_store('avg', '1h')
+        assert driver.get_last_aggregate_time('avg', '1h', [1, 2]) is None
+        driver.insert_aggregates('avg', '1h', ts, [
+            (topic_id, results[topic_id]['avg'], [topic_id])
+            for topic_id in results])
+        assert driver.get_last_aggregate_time('avg', '1h', [1, 2]) == ts
+        assert driver.get_last_aggregate_time('avg', '1h', [6]) is None
+
 
 class TestSqlite(AggregationSuite):
     @contextlib.contextmanager
@@ -234,6 +274,88 @@ class TestSqlite(AggregationSuite):
             shutil.rmtree(tmpdir, True)
 
 
+class TestSqlitePartitioned(TestSqlite):
+    @contextlib.contextmanager
+    def transact(self, truncate_tables, drop_tables):
+        with super(TestSqlitePartitioned, self).transact(
+                truncate_tables, drop_tables) as (cls, params):
+            params = dict(params, partition_period='month')
+            yield cls, params
+
+    @drop_tables(['data_201601', 'data_201602', 'data_201603'])
+    def test_partitions(self, driver):
+        topic_id = driver.insert_topic('Building/LAB/Device/Partitioned')
+        values = []
+        for month in (1, 2, 3):
+            ts = datetime(year=2016, month=month, day=28, microsecond=59,
+                          tzinfo=pytz.UTC)
+            driver.insert_data(ts, topic_id, float(month))
+            values.append((ts.isoformat(), float(month)))
+        driver.commit()
+        partitions = [p[2] for p in driver._get_partitions()]
+        assert {'data_201601', 'data_201602', 'data_201603'} <= set(partitions)
+        id_name_map = {topic_id: 'Building/LAB/Device/Partitioned'}
+        assert driver.query([topic_id], id_name_map) == {
+            'Building/LAB/Device/Partitioned': values}
+        start = datetime(year=2016, month=2, day=1, tzinfo=pytz.UTC)
+        assert driver.query([topic_id], id_name_map, start=start) == {
+            'Building/LAB/Device/Partitioned': values[1:]}
+        assert driver.query([topic_id], id_name_map, order='LAST_TO_FIRST',
+                            count=1) == {
+            'Building/LAB/Device/Partitioned': values[2:]}
+        assert driver.collect_aggregate([topic_id], 'sum', start) == (5.0, 2)
+
+        limit = datetime(year=2016, month=3, day=1, tzinfo=pytz.UTC)
+        driver.manage_db_size(limit, None)
+        partitions = [p[2] for p in driver._get_partitions()]
+        assert partitions == ['data_201603']
+        assert driver.query([topic_id], id_name_map) == {
+            'Building/LAB/Device/Partitioned': values[2:]}
+
+
+class TestSqliteTyped(TestSqlite):
+    @contextlib.contextmanager
+    def transact(self, truncate_tables, drop_tables):
+        with super(TestSqliteTyped, self).transact(
+                truncate_tables, drop_tables) as (cls, params):
+            params = dict(params, typed_values=True)
+            yield cls, params
+
+    def test_typed_values(self, driver):
+        float_id = driver.insert_topic('Building/LAB/Device/Typed')
+        driver.insert_meta(float_id, {'units': 'X', 'tz': 'UTC',
+                                      'type': 'float'})
+        other_id = driver.insert_topic('Building/LAB/Device/Untyped')
+        driver.insert_meta(other_id, {'units': 'X', 'tz': 'UTC',
+                                      'type': 'integer'})
+        ts = datetime(year=2017, month=1, day=1, microsecond=59,
+                      tzinfo=pytz.UTC)
+        values = [1.5, 2, None, [1, 2]]
+        for i, value in enumerate(values):
+            driver.insert_data(ts + timedelta(seconds=i), float_id, value)
+            driver.insert_data(ts + timedelta(seconds=i), other_id, value)
+        driver.commit()
+
+        rows = driver.select('SELECT value_string, value_real FROM data '
+                             'WHERE topic_id = ? ORDER BY ts', [float_id])
+        assert rows[:2] == [('', 1.5), ('', 2.0)]
+        assert all(row[1] is None for row in rows[2:])
+        rows = driver.select('SELECT value_real FROM data '
+                             'WHERE topic_id = ?', [other_id])
+        assert all(row[0] is None for row in rows)
+
+        id_name_map = {float_id: 'typed', other_id: 'untyped'}
+        results = driver.query([float_id, other_id], id_name_map)
+        typed = [value for _, value in results['typed']]
+        assert typed[:2] == [1.5, 2.0]
+        assert typed[2:] == [None, [1, 2]]
+        assert [value for _, value in results['untyped']][:2] == [1.5, 2]
+        end = ts + timedelta(seconds=2)
+        assert driver.collect_aggregate([float_id], 'sum', ts, end) == (3.5, 2)
+        assert driver.collect_aggregates([float_id], ['max'], ts, end) == {
+            float_id: {'count': 2, 'max': 2.0}}
+
+
 class FauxConnection:
     def __init__(self, exc_class):
         self.exc_class = exc_class
@@ -45,6 +45,7 @@ import gevent
 import pytest
 from volttron.platform.vip.agent import Agent
 from volttron.platform.agent.known_identities import CONFIGURATION_STORE
+from volttron.platform.jsonrpc import RemoteError
 
 class _config_test_agent(Agent):
     def __init__(self, **kwargs):
@@ -146,6 +147,57 @@ def test_manage_store_raw(default_config_test_agent, rpc_agent):
     first = results[0]
     assert first == ("config", "NEW", raw_config)
 
+@pytest.mark.config_store
+def test_manage_store_many(default_config_test_agent, rpc_agent):
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store_many',
+                           "config_test_agent",
+                           [["config", """{"value":1}""", "json"],
+                            ["other", "value\n1", "csv"],
+                            ["raw", "test_config_stuff"]]).get()
+
+    results = default_config_test_agent.callback_results
+    assert results == [("config", "NEW", {"value": 1}),
+                       ("other", "NEW", [{"value": "1"}]),
+                       ("raw", "NEW", "test_config_stuff")]
+
+    # Nothing is stored if any configuration is invalid
+    with pytest.raises(RemoteError):
+        rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store_many',
+                               "config_test_agent",
+                               [["config", """{"value":2}""", "json"],
+                                ["bad", "[1, 2", "json"]]).get()
+    assert len(results) == 3
+    config_list = rpc_agent.vip.rpc.call(CONFIGURATION_STORE,
+                                         'manage_list_configs',
+                                         'config_test_agent').get()
+    assert "bad" not in config_list
+
+@pytest.mark.config_store
+def test_lazy_config_reload(default_config_test_agent, rpc_agent):
+    json_config = """{"value":1}"""
+    rpc_agent.vip.rpc.call(CONFIGURATION_STORE, 'manage_store',
+                           "config_test_agent", "config", json_config, config_type="json").get()
+
+    config = default_config_test_agent.vip.config
+    # Updates do not carry a hash so the config is fetched once more.
+    assert config._load_configs() == {"config": "UPDATE"}
+    # Unchanged configurations are skipped.
+    assert config._load_configs() == {}
+    assert config.get("config") == {"value": 1}
+
+    hashes = []
+    default_config_test_agent.vip.rpc.export(hashes.append, 'config.initial_hashes')
+    try:
+        default_config_test_agent.vip.rpc.call(CONFIGURATION_STORE,
+                                               'get_config_hashes').get()
+    finally:
+        default_config_test_agent.vip.rpc.export(config._initial_hashes,
+                                                 'config.initial_hashes')
+    assert hashes[0].keys() == ["config"]
+    contents = default_config_test_agent.vip.rpc.call(
+        CONFIGURATION_STORE, 'get_config_contents', ["CONFIG", "missing"]).get()
+    assert contents == {"config": [hashes[0]["config"], {"value": 1}]}
+
 @pytest.mark.config_store
 def test_manage_update_config(default_config_test_agent, rpc_agent):
     json_config = """{"value":1}"""
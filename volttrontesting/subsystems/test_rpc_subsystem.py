@@ -0,0 +1,73 @@
+import gevent
+import pytest
+
+from volttron.platform.vip.agent import Agent, RPC
+
+
+class EchoAgent(Agent):
+    def __init__(self, **kwargs):
+        super(EchoAgent, self).__init__(**kwargs)
+        self.batches = 0
+
+    @RPC.export
+    def echo(self, value, suffix=''):
+        if self.vip.rpc.context.batch is not None:
+            self.batches += 1
+        return '{}{}'.format(value, suffix)
+
+    @RPC.export
+    def fail(self):
+        raise ValueError('failed')
+
+
+@pytest.fixture(scope="module")
+def echo_agent(request, volttron_instance):
+    agent = volttron_instance.build_agent(identity='echo_agent',
+                                          agent_class=EchoAgent)
+    gevent.sleep(1)
+
+    def stop():
+        agent.core.stop()
+    request.addfinalizer(stop)
+    return agent
+
+
+@pytest.mark.subsystems
+def test_gather(volttron_instance, echo_agent):
+    caller = volttron_instance.build_agent()
+    results = caller.vip.rpc.gather('echo_agent', [
+        ('echo', ('a',)),
+        ('echo', ('b',), {'suffix': '!'}),
+        'fail'])
+    assert [result.get(timeout=5) for result in results[:2]] == ['a', 'b!']
+    with pytest.raises(Exception):
+        results[2].get(timeout=5)
+    assert caller.vip.rpc.gather('echo_agent', []) == []
+    caller.core.stop()
+
+
+@pytest.mark.subsystems
+def test_coalesced_calls(volttron_instance, echo_agent):
+    caller = volttron_instance.build_agent()
+    caller.vip.rpc.coalesce_calls = True
+    batches = echo_agent.batches
+    results = [caller.vip.rpc.call('echo_agent', 'echo', i)
+               for i in range(10)]
+    assert [result.get(timeout=5) for result in results] == \
+        [str(i) for i in range(10)]
+    # all ten calls were delivered in the same batch
+    assert echo_agent.batches == batches + 10
+    caller.core.stop()
+
+
+@pytest.mark.subsystems
+def test_coalesced_calls_failing_batch(volttron_instance, echo_agent):
+    caller = volttron_instance.build_agent()
+    caller.vip.rpc.coalesce_calls = True
+    # The batch cannot be serialized, so every call in it fails.
+    results = [caller.vip.rpc.call('echo_agent', 'echo', 1),
+               caller.vip.rpc.call('echo_agent', 'echo', object())]
+    for result in results:
+        with pytest.raises(TypeError):
+            result.get(timeout=5)
+    caller.core.stop()